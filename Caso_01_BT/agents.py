@@ -1,6 +1,6 @@
 import uuid
 import json
-import pandas as pd
+import numpy as np
 from contracts import ContractTemplate, CoalitionContract, log_event
 
 class PAS:
@@ -20,15 +20,24 @@ class Broker:
 class YPA:
     """Yellow Pages Agent (YPA) - Agente que armazena as requisições."""
     def __init__(self):
-        # Usando DataFrame do pandas para ser didático, mas em produção seria um banco de dados
-        self.database = pd.DataFrame(columns=["Contract_ID", "Required_Skills"])
+        # Registros em lista (anexação O(1)); o DataFrame didático é montado só quando consultado,
+        # para que execuções headless não precisem importar o pandas
+        self.records = []
         log_event("YPA inicializado.")
 
+    @property
+    def database(self):
+        """Requisições armazenadas como DataFrame do pandas (importado sob demanda)."""
+        import pandas as pd
+        return pd.DataFrame(self.records, columns=["Contract_ID", "Required_Skills"])
+
+    def reset(self):
+        self.records.clear()
+
     def store_request_json(self, json_data):
         data = json.loads(json_data)
         row = {"Contract_ID": data["id"], "Required_Skills": data["required_skills"]}
-        # O uso de pd.concat em um loop é ineficiente, mas mantido para didática
-        self.database = pd.concat([self.database, pd.DataFrame([row])], ignore_index=True)
+        self.records.append(row)
         log_event(f"YPA armazenou requisição: {row}")
 
 class MRA:
@@ -38,12 +47,23 @@ class MRA:
         log_event(f"MRA encontrou {len(candidates)} candidatos com habilidades compatíveis.")
         return candidates
 
+    def identify_nearest_candidates(self, resource_pool, required_skills, spatial_index, point, k=1):
+        """Identifica os k candidatos compatíveis mais próximos de um ponto (ex.: POI) via índice espacial."""
+        by_id = {r.id: r for r in self.identify_candidates(resource_pool, required_skills)}
+        nearest = spatial_index.k_nearest(point, k, predicate=lambda did: did in by_id)
+        candidates = [by_id[did] for did, _ in nearest]
+        log_event(f"MRA selecionou {[c.id for c in candidates]} como candidatos mais próximos de {point}.")
+        return candidates
+
 class CLA:
     """Coalition and Logistics Agent (CLA) - Agente que forma a coalizão."""
     def __init__(self): 
         self.coalitions = []
         log_event("CLA inicializado.")
 
+    def reset(self):
+        self.coalitions.clear()
+
     def create_coalition_contract(self, required_skills):
         c = CoalitionContract(id=str(uuid.uuid4())[:4], required_skills=required_skills)
         log_event(f"CLA criou contrato de coalizão {c.id}")
@@ -69,3 +89,18 @@ class CLA:
         
         self.coalitions.append(contract)
 
+    def suggest_splits(self, drone_ids, overlap_fraction, min_fraction=50.0, max_pairs=5):
+        """
+        Pares de drones que mais duplicam a patrulha um do outro (sobreposição em % da cobertura
+        do menor, ex.: `CoverageBitsets.overlap_fraction`), candidatos a separar em rotas ou
+        coalizões distintas. Retorna [(drone_a, drone_b, fração)] em ordem decrescente.
+        """
+        i, j = np.triu_indices(len(drone_ids), k=1)
+        fraction = np.asarray(overlap_fraction)[i, j]
+        keep = np.flatnonzero(fraction >= min_fraction)
+        keep = keep[np.argsort(-fraction[keep], kind="stable")][:max_pairs]
+        pairs = [(drone_ids[i[k]], drone_ids[j[k]], float(fraction[k])) for k in keep]
+        for a, b, f in pairs:
+            log_event(f"CLA sugere separar {a} e {b}: {f:.1f}% da cobertura compartilhada.")
+        return pairs
+
@@ -0,0 +1,246 @@
+# src/core/aggregation.py
+
+import math
+import numbers
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Rótulos usados no relatório; métricas sem rótulo aparecem com o próprio nome
+METRIC_LABELS = {
+    "area_coverage": "Cobertura Média da Área (%)",
+    "route_redundancy": "Redundância de Rota (%)",
+    "recharge_count_total": "Recargas (Total por Simulação)",
+    "recharge_count_per_drone": "Recargas (por Drone)",
+    "separation_conflicts": "Conflitos de Separação",
+    "geofence_violations": "Violações de Geofence",
+}
+
+# Chaves que identificam a execução e não devem ser agregadas
+ID_KEYS = {"batch_id"}
+
+# Semi-amplitudes-alvo padrão do modo sequencial do batch (mesmas unidades das métricas)
+DEFAULT_CI_TARGETS = {
+    "area_coverage": 1.0,
+    "route_redundancy": 2.0,
+    "recharge_count_total": 0.5,
+}
+
+
+def t_quantile(p: float, df: int) -> float:
+    """
+    Quantil da t de Student pela expansão de Cornish-Fisher em torno da normal
+    (erro < 1% para df >= 3; dispensa o scipy).
+    """
+    z = NormalDist().inv_cdf(p)
+    if df <= 0 or math.isinf(df):
+        return z
+    z3, z5, z7 = z ** 3, z ** 5, z ** 7
+    return (z + (z3 + z) / (4 * df)
+            + (5 * z5 + 16 * z3 + 3 * z) / (96 * df ** 2)
+            + (3 * z7 + 19 * z5 + 17 * z3 - 15 * z) / (384 * df ** 3))
+
+
+class P2Quantile:
+    """
+    Estimador de quantil P² (Jain & Chlamtac, 1985): memória constante (5 marcadores),
+    atualizado a cada nova observação, sem guardar a amostra.
+    """
+    def __init__(self, p: float):
+        self.p = p
+        self.n = 0
+        self.q: List[float] = []
+        self.pos = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increment = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x: float):
+        self.n += 1
+        q = self.q
+        if self.n <= 5:
+            q.append(x)
+            if self.n == 5:
+                q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(1, 5) if x < q[i]) - 1
+        for i in range(k + 1, 5):
+            self.pos[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increment[i]
+
+        for i in range(1, 4):
+            d = self.desired[i] - self.pos[i]
+            if (d >= 1 and self.pos[i + 1] - self.pos[i] > 1) or (d <= -1 and self.pos[i - 1] - self.pos[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if q[i - 1] < candidate < q[i + 1]:
+                    q[i] = candidate
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (self.pos[i + d] - self.pos[i])
+                self.pos[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.q, self.pos
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> float:
+        if self.n == 0:
+            return math.nan
+        if self.n < 5:
+            ordered = sorted(self.q)
+            return ordered[min(len(ordered) - 1, int(round(self.p * (len(ordered) - 1))))]
+        return self.q[2]
+
+
+class RunningStats:
+    """Estatísticas incrementais de uma métrica: média/variância de Welford, mínimo, máximo e quantis P²."""
+    def __init__(self, quantiles: Sequence[float] = (0.5, 0.95)):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketches = {p: P2Quantile(p) for p in quantiles}
+
+    def add(self, x: float):
+        x = float(x)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        for sketch in self.sketches.values():
+            sketch.add(x)
+
+    @property
+    def variance(self) -> float:
+        """Variância amostral (n - 1), como no `describe()` do pandas."""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance) if self.count > 1 else math.nan
+
+    def quantile(self, p: float) -> float:
+        return self.sketches[p].value()
+
+    def ci_half_width(self, confidence: float = 0.95) -> float:
+        """Semi-amplitude do intervalo de confiança da média (t de Student; NaN com menos de 2 amostras)."""
+        if self.count < 2:
+            return math.nan
+        return t_quantile(0.5 + confidence / 2, self.count - 1) * self.std / math.sqrt(self.count)
+
+    def as_dict(self) -> Dict[str, float]:
+        out = {"count": self.count, "mean": self.mean, "std": self.std, "min": self.min, "max": self.max}
+        out.update({f"p{int(round(p * 100))}": s.value() for p, s in self.sketches.items()})
+        return out
+
+
+class BatchAggregator:
+    """
+    Agregador de resultados de batch independente do tamanho da frota.
+
+    Cada execução finalizada atualiza estatísticas incrementais de todas as métricas numéricas,
+    de modo que a memória não cresce com o número de simulações. Métricas por drone (prefixos
+    em `group_prefixes`, ex.: `recharge_count_D17`) também geram um total por execução
+    (`recharge_count_total`) e uma estatística combinada sobre todos os drones
+    (`recharge_count_per_drone`). As linhas individuais só são guardadas com `keep_rows=True`.
+    """
+    def __init__(self, keep_rows: bool = False, quantiles: Sequence[float] = (0.5, 0.95),
+                 group_prefixes: Iterable[str] = ("recharge_count_",)):
+        self.quantiles = tuple(quantiles)
+        self.group_prefixes = tuple(group_prefixes)
+        self.stats: Dict[str, RunningStats] = {}
+        self.rows: Optional[List[Dict]] = [] if keep_rows else None
+        self.num_runs = 0
+        # Resultado do critério de parada sequencial (None fora do modo sequencial)
+        self.converged: Optional[bool] = None
+
+    def _stat(self, key: str) -> RunningStats:
+        stat = self.stats.get(key)
+        if stat is None:
+            stat = self.stats[key] = RunningStats(self.quantiles)
+        return stat
+
+    def add(self, metrics: Dict):
+        """Incorpora as métricas de uma execução."""
+        self.num_runs += 1
+        group_totals = {prefix: 0.0 for prefix in self.group_prefixes}
+        for key, value in metrics.items():
+            if key in ID_KEYS or isinstance(value, bool) or not isinstance(value, numbers.Real):
+                continue
+            self._stat(key).add(value)
+            for prefix in self.group_prefixes:
+                if key.startswith(prefix):
+                    group_totals[prefix] += value
+                    self._stat(f"{prefix}per_drone").add(value)
+        for prefix, total in group_totals.items():
+            self._stat(f"{prefix}total").add(total)
+        if self.rows is not None:
+            self.rows.append(dict(metrics))
+
+    def ci_half_widths(self, keys: Iterable[str], confidence: float = 0.95) -> Dict[str, float]:
+        return {key: self.stats[key].ci_half_width(confidence) if key in self.stats else math.nan for key in keys}
+
+    def meets_targets(self, targets: Dict[str, float], confidence: float = 0.95) -> bool:
+        """True quando todas as métricas têm semi-amplitude do IC menor ou igual ao alvo."""
+        widths = self.ci_half_widths(targets, confidence)
+        return all(not math.isnan(widths[k]) and widths[k] <= target for k, target in targets.items())
+
+    def ci_markdown(self, targets: Dict[str, float], confidence: float = 0.95) -> str:
+        """Tabela markdown com a média, a semi-amplitude do IC e o alvo de cada métrica."""
+        headers = ["Métrica", "Média", f"± IC {int(round(confidence * 100))}%", "Alvo", "Atingido"]
+        widths = self.ci_half_widths(targets, confidence)
+        rows = []
+        for key, target in targets.items():
+            mean = self.stats[key].mean if key in self.stats else math.nan
+            met = not math.isnan(widths[key]) and widths[key] <= target
+            rows.append([f"**{METRIC_LABELS.get(key, key)}**", mean, widths[key], float(target), "sim" if met else "não"])
+        return markdown_table(headers, rows)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {key: stat.as_dict() for key, stat in self.stats.items()}
+
+    def report_keys(self, include_per_drone: bool = False) -> List[str]:
+        """Métricas do relatório: as rotuladas primeiro, depois as demais (sem colunas por drone)."""
+        per_drone = [k for k in self.stats
+                     if any(k.startswith(p) and k not in (f"{p}total", f"{p}per_drone") for p in self.group_prefixes)]
+        keys = [k for k in METRIC_LABELS if k in self.stats]
+        keys += sorted(k for k in self.stats if k not in keys and k not in per_drone and not k.startswith("time_"))
+        if include_per_drone:
+            keys += sorted(per_drone)
+        return keys
+
+    def summary_markdown(self, include_per_drone: bool = False) -> str:
+        """Tabela markdown das estatísticas agregadas."""
+        headers = ["Métrica", "Média", "Desvio Padrão", "Mínimo", "Máximo"]
+        headers += [f"P{int(round(p * 100))}" for p in self.quantiles]
+        rows = []
+        for key in self.report_keys(include_per_drone):
+            s = self.stats[key]
+            rows.append([f"**{METRIC_LABELS.get(key, key)}**", s.mean, s.std, s.min, s.max]
+                        + [s.quantile(p) for p in self.quantiles])
+        return markdown_table(headers, rows)
+
+
+def markdown_table(headers: Sequence[str], rows: Iterable[Sequence], float_format: str = "{:.2f}") -> str:
+    """Monta uma tabela markdown simples (substitui o `to_markdown`, que depende do tabulate)."""
+    def fmt(value):
+        if isinstance(value, float):
+            return "-" if math.isnan(value) else float_format.format(value)
+        return str(value)
+
+    lines = ["| " + " | ".join(headers) + " |", "| " + " | ".join(":---" for _ in headers) + " |"]
+    lines += ["| " + " | ".join(fmt(v) for v in row) + " |" for row in rows]
+    return "\n".join(lines)
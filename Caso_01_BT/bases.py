@@ -0,0 +1,177 @@
+# src/core/bases.py
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from contracts import log_event
+from spatial_index import SpatialHashIndex
+
+Point = Tuple[float, float]
+
+
+@dataclass
+class ChargingBase:
+    """Base de recarga com `slots` vagas simultâneas (None: ilimitadas) e fila de espera."""
+    id: str
+    position: Point
+    slots: Optional[int] = None
+    charging: Set[str] = field(default_factory=set)
+    queue: Deque[str] = field(default_factory=deque)
+    inbound: Set[str] = field(default_factory=set)
+    charges: int = 0
+
+    def load(self) -> int:
+        """Drones recarregando, na fila ou a caminho."""
+        return len(self.charging) + len(self.queue) + len(self.inbound)
+
+    def has_room(self) -> bool:
+        return self.slots is None or self.load() < self.slots
+
+
+class BaseNetwork:
+    """
+    Conjunto de bases de recarga, com consulta da base mais próxima por índice espacial
+    (`SpatialHashIndex`) e vagas de recarga limitadas com fila FIFO por base.
+
+    Ciclo de um retorno: `assign` escolhe a base (a mais próxima com vaga livre que a bateria
+    alcança; senão a mais próxima, onde o drone entra na fila), `arrive` ocupa uma vaga ou entra
+    na fila ao pousar e `release` libera a vaga ao fim da recarga, promovendo o próximo da fila.
+    Cada passo gera um evento ({tick, kind, drone, base, ...}) em `events`; as durações de
+    espera e de reabastecimento (pouso até a bateria cheia) alimentam `summary()`.
+    """
+    def __init__(self, bases: Sequence[ChargingBase], cell_size: float = 2.0):
+        if not bases:
+            raise ValueError("A rede de bases precisa de ao menos uma base")
+        self.bases: Dict[str, ChargingBase] = {b.id: b for b in bases}
+        if len(self.bases) != len(bases):
+            raise ValueError("IDs de base repetidos")
+        self.index = SpatialHashIndex(cell_size=cell_size)
+        for base in bases:
+            self.index.update(base.id, base.position)
+        self.positions = np.array([b.position for b in bases], dtype=np.float64)
+        self.tick = 0
+        # {drone: base} do retorno em andamento e {drone: tick do pouso}
+        self.assigned: Dict[str, str] = {}
+        self.landed_at: Dict[str, int] = {}
+        self.events: List[Dict] = []
+        self.waits: List[int] = []
+        self.durations: List[int] = []
+
+    @classmethod
+    def from_config(cls, conf: Optional[Sequence[Dict]], default_base: Point = (0.0, 0.0),
+                    cell_size: float = 2.0) -> "BaseNetwork":
+        """
+        Bases da lista de configuração, ex.: `[{"id": "B1", "position": [0, 0], "slots": 2}]`.
+        Sem lista: uma única base em `default_base`, com vagas ilimitadas.
+        """
+        if not conf:
+            return cls([ChargingBase("BASE", (float(default_base[0]), float(default_base[1])))])
+        bases = [ChargingBase(b.get("id", f"B{k + 1}"), (float(b["position"][0]), float(b["position"][1])), b.get("slots"))
+                 for k, b in enumerate(conf)]
+        return cls(bases, cell_size=cell_size)
+
+    def nearest(self, point: Point, available: bool = False) -> Optional[Tuple[ChargingBase, float]]:
+        """Base mais próxima (com `available`, só entre as que têm vaga livre) e sua distância."""
+        predicate = (lambda b: self.bases[b].has_room()) if available else None
+        found = self.index.k_nearest(point, 1, predicate=predicate)
+        if not found:
+            return None
+        base_id, distance = found[0]
+        return self.bases[base_id], distance
+
+    def nearest_distances(self, points: np.ndarray) -> np.ndarray:
+        """Distância de cada ponto (N, 2) até a base mais próxima (tabelas de energia de retorno)."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return np.hypot(points[:, None, 0] - self.positions[None, :, 0],
+                        points[:, None, 1] - self.positions[None, :, 1]).min(axis=1)
+
+    def _event(self, kind: str, drone_id: str, base: ChargingBase, **data):
+        self.events.append({"tick": self.tick, "kind": kind, "drone": drone_id, "base": base.id, **data})
+
+    def assign(self, drone_id: str, position: Point, reachable: float = float("inf")) -> ChargingBase:
+        """Escolhe a base do retorno: a mais próxima com vaga a até `reachable`; senão, a mais próxima."""
+        choice = self.nearest(position, available=True)
+        if choice is None or choice[1] > reachable:
+            choice = self.nearest(position)
+        base = choice[0]
+        base.inbound.add(drone_id)
+        self.assigned[drone_id] = base.id
+        self._event("assign", drone_id, base, distance=round(choice[1], 3))
+        return base
+
+    def base_of(self, drone_id: str) -> Optional[ChargingBase]:
+        base_id = self.assigned.get(drone_id)
+        return self.bases[base_id] if base_id is not None else None
+
+    def arrive(self, drone_id: str) -> bool:
+        """Pouso na base atribuída: ocupa uma vaga (True) ou entra na fila (False)."""
+        base = self.bases[self.assigned[drone_id]]
+        base.inbound.discard(drone_id)
+        self.landed_at[drone_id] = self.tick
+        if base.slots is None or len(base.charging) < base.slots:
+            base.charging.add(drone_id)
+            self._event("charge_start", drone_id, base, wait=0)
+            self.waits.append(0)
+            return True
+        base.queue.append(drone_id)
+        self._event("queued", drone_id, base, position=len(base.queue))
+        log_event(f"BASE: Drone {drone_id} na fila da base {base.id} (posição {len(base.queue)}, vagas ocupadas: {base.slots}).")
+        return False
+
+    def is_charging(self, drone_id: str) -> bool:
+        base = self.base_of(drone_id)
+        return base is not None and drone_id in base.charging
+
+    def release(self, drone_id: str):
+        """Fim da recarga: libera a vaga e promove o primeiro da fila."""
+        base = self.bases[self.assigned.pop(drone_id)]
+        base.charging.discard(drone_id)
+        base.charges += 1
+        duration = self.tick - self.landed_at.pop(drone_id)
+        self.durations.append(duration)
+        self._event("charge_end", drone_id, base, duration=duration)
+        self._promote(base)
+
+    def leave(self, drone_id: str):
+        """Drone abandona o retorno (ex.: falha): sai da vaga, da fila ou da lista de chegada."""
+        base = self.base_of(drone_id)
+        if base is None:
+            return
+        del self.assigned[drone_id]
+        self.landed_at.pop(drone_id, None)
+        base.inbound.discard(drone_id)
+        if drone_id in base.queue:
+            base.queue.remove(drone_id)
+        if drone_id in base.charging:
+            base.charging.discard(drone_id)
+            self._promote(base)
+        self._event("leave", drone_id, base)
+
+    def _promote(self, base: ChargingBase):
+        while base.queue and (base.slots is None or len(base.charging) < base.slots):
+            next_id = base.queue.popleft()
+            base.charging.add(next_id)
+            wait = self.tick - self.landed_at[next_id]
+            self.waits.append(wait)
+            self._event("charge_start", next_id, base, wait=wait)
+            log_event(f"BASE: Drone {next_id} começa a recarregar na base {base.id} após {wait} ticks na fila.")
+
+    def pop_events(self) -> List[Dict]:
+        """Eventos desde a última chamada (ex.: para a telemetria)."""
+        events, self.events = self.events, []
+        return events
+
+    def summary(self) -> Dict[str, float]:
+        waits = np.asarray(self.waits, dtype=np.float64)
+        durations = np.asarray(self.durations, dtype=np.float64)
+        metrics = {
+            "base_charges_total": sum(b.charges for b in self.bases.values()),
+            "base_queue_wait_mean": float(waits.mean()) if len(waits) else 0.0,
+            "base_queue_wait_max": float(waits.max()) if len(waits) else 0.0,
+            "refuel_duration_mean": float(durations.mean()) if len(durations) else 0.0,
+        }
+        metrics.update({f"base_throughput_{b.id}": b.charges for b in self.bases.values()})
+        return metrics
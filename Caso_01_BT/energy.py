@@ -0,0 +1,80 @@
+# src/core/energy.py
+
+import math
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bases import BaseNetwork
+from contracts import log_event
+
+# Parâmetros de voo da patrulha (os mesmos de behaviors.py)
+STEP_SIZE = 0.25
+BATTERY_DRAIN = 0.3
+
+
+class EnergyModel:
+    """
+    Modelo de energia para o retorno à base preditivo.
+
+    A energia de um voo é o número de passos da patrulha (`step_size` por tick) vezes o consumo
+    por passo. Quando uma rota é atribuída, a interface guarda a energia de retorno à base a
+    partir de cada ponto (`return_table`); a verificação por tick é então O(1): energia para
+    terminar a perna corrente mais o retorno a partir do alvo da perna, mais a reserva. O
+    reabastecimento deixa de ser instantâneo: o drone voa até a base (RETURNING) e recarrega
+    `charge_rate` por tick (REFUELING) até `capacity`.
+
+    Com `bases`, há várias bases com vagas de recarga limitadas (`BaseNetwork`): o retorno é
+    tabelado até a base mais próxima e o drone é encaminhado à mais próxima com vaga livre.
+    """
+    def __init__(self, base: Tuple[float, float] = (0.0, 0.0), step_size: float = STEP_SIZE,
+                 drain: float = BATTERY_DRAIN, reserve: float = 2.0, charge_rate: float = 10.0,
+                 capacity: float = 100.0, bases: Optional[Sequence[Dict]] = None):
+        if step_size <= 0 or charge_rate <= 0:
+            raise ValueError("step_size e charge_rate do modelo de energia devem ser positivos")
+        self.network = BaseNetwork.from_config(bases, base)
+        self.base = next(iter(self.network.bases.values())).position
+        self.step_size = step_size
+        self.drain = drain
+        self.reserve = reserve
+        self.charge_rate = charge_rate
+        self.capacity = capacity
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional["EnergyModel"]:
+        """
+        Criado a partir da chave `energy_model` (None se ausente: limiar fixo de 30% e recarga
+        instantânea), ex.: `{"base": [0, 0], "reserve": 2.0, "charge_rate": 10.0}`.
+        """
+        conf = config.get("energy_model")
+        if not conf:
+            return None
+        conf = conf if isinstance(conf, dict) else {}
+        model = cls(
+            base=tuple(conf.get("base", (0.0, 0.0))),
+            step_size=conf.get("step_size", STEP_SIZE),
+            drain=conf.get("drain", BATTERY_DRAIN),
+            reserve=conf.get("reserve", 2.0),
+            charge_rate=conf.get("charge_rate", 10.0),
+            capacity=conf.get("capacity", 100.0),
+            bases=conf.get("bases"),
+        )
+        bases = ", ".join(f"{b.id} {b.position}" + (f" ({b.slots} vagas)" if b.slots is not None else "")
+                          for b in model.network.bases.values())
+        log_event(f"ENERGIA: retorno preditivo às bases {bases} (reserva {model.reserve}%, "
+                  f"recarga {model.charge_rate}%/tick).")
+        return model
+
+    def flight_cost(self, distance):
+        """Energia (em % de bateria) para voar `distance` (escalar ou array)."""
+        return np.ceil(np.asarray(distance) / self.step_size) * self.drain
+
+    def return_table(self, route: Sequence[Tuple[float, float]]) -> np.ndarray:
+        """Energia de retorno à base mais próxima a partir de cada ponto da rota."""
+        if not route:
+            return np.zeros(0)
+        return self.flight_cost(self.network.nearest_distances(route))
+
+    def energy_needed(self, position: Tuple[float, float], target: Tuple[float, float], return_from_target: float) -> float:
+        """Energia para concluir a perna até `target` e voltar à base a partir dele."""
+        return float(self.flight_cost(math.hypot(target[0] - position[0], target[1] - position[1]))) + return_from_target
@@ -5,13 +5,29 @@ class DroneMissionInterface:
     Interface Compartilhada para comunicação entre o MAS/BT e os drones.
     Isso simula um barramento de dados ou uma base de dados centralizada.
     """
-    def __init__(self):
+    def __init__(self, spatial_index=None, shared_state=None, energy_model=None):
         # {drone_id: [ponto1, ponto2, ...]}
         self.routes = {} 
         # {drone_id: {'battery': 100, 'position': (x, y), 'status': 'IDLE'}}
         self.states = {} 
-        # {drone_id: {"route": [ponto1, ...], "type": "patrol"}}
+        # {drone_id: {"route": [ponto1, ...], "type": "patrol", "approach": [ponto1, ...] (opcional)}}
         self.missions = {} 
+        # Índice espacial opcional (ex.: SpatialHashIndex), atualizado a cada mudança de posição
+        self.spatial_index = spatial_index
+        # Espelho opcional em memória compartilhada (SharedFleetState) para leitores em outros processos
+        self.shared_state = shared_state
+        # Modelo de energia opcional (EnergyModel): energia de retorno à base por ponto de cada rota
+        self.energy_model = energy_model
+        self.return_energy = {}
+
+    def reset(self):
+        """Limpa rotas, estados e missões (e o índice espacial) para reutilizar a interface."""
+        self.routes.clear()
+        self.states.clear()
+        self.missions.clear()
+        self.return_energy.clear()
+        if self.spatial_index is not None:
+            self.spatial_index.clear()
 
     def set_mission(self, drone_id, mission):
         """Define a missão atual para um drone."""
@@ -27,6 +43,11 @@ class DroneMissionInterface:
             self.states[drone_id] = {'battery': 100, 'position': position, 'status': 'IDLE'}
         else:
             self.states[drone_id]['position'] = position
+        if self.spatial_index is not None:
+            self.spatial_index.update(drone_id, position)
+        if self.shared_state is not None:
+            s = self.states[drone_id]
+            self.shared_state.write(drone_id, s['battery'], position, s['status'])
 
     def get_position(self, drone_id):
         """Retorna a posição (x, y) do drone."""
@@ -35,15 +56,44 @@ class DroneMissionInterface:
     def update_drone_state(self, drone_id, battery, position, status='RUNNING'):
         """Atualiza o estado completo do drone."""
         self.states[drone_id] = {'battery': battery, 'position': position, 'status': status}
+        if self.spatial_index is not None:
+            self.spatial_index.update(drone_id, position)
+        if self.shared_state is not None:
+            self.shared_state.write(drone_id, battery, position, status)
 
     def get_state(self, drone_id):
         """Retorna o estado completo do drone."""
         return self.states.get(drone_id, {'battery': 100, 'position': (0, 0), 'status': 'IDLE'})
 
-    def assign_route(self, drone_id, route):
-        """Atribui uma rota e define a missão de patrulha."""
+    def assign_route(self, drone_id, route, approach=None):
+        """
+        Atribui uma rota e define a missão de patrulha. `approach` são waypoints percorridos uma
+        única vez antes do primeiro ponto da rota (ex.: trânsito até o POI); a patrulha repete só `route`.
+        """
         self.routes[drone_id] = route
-        self.set_mission(drone_id, {"route": route, "type": "patrol"})
+        mission = {"route": route, "type": "patrol"}
+        if approach:
+            mission["approach"] = list(approach)
+        self.set_mission(drone_id, mission)
+        if self.energy_model is not None:
+            self.return_energy[drone_id] = self.energy_model.return_table(route)
+
+    def energy_to_return(self, drone_id, index):
+        """
+        Energia para concluir a perna corrente da patrulha (até o ponto `index`) e voltar à base
+        a partir dele, pela tabela calculada em `assign_route` (O(1)). None sem rota ou sem modelo.
+        Durante a aproximação, a perna corrente é a do próximo waypoint de aproximação.
+        """
+        route = self.routes.get(drone_id)
+        if not route or self.energy_model is None:
+            return None
+        approach = (self.get_mission(drone_id) or {}).get("approach")
+        if approach:
+            target = approach[0]
+            return self.energy_model.energy_needed(self.get_position(drone_id), target,
+                                                   float(self.energy_model.return_table([target])[0]))
+        k = index % len(route)
+        return self.energy_model.energy_needed(self.get_position(drone_id), route[k], self.return_energy[drone_id][k])
         
     def get_next_point(self, drone_id):
         """Retorna o próximo ponto da rota mais próximo (lógica de seleção de nó da BT)."""
@@ -1,7 +1,9 @@
 # src/core/metrics.py
 
+import math
+
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
 def calculate_area_coverage_and_redundancy(
     trajectory_data: Dict[str, List[Tuple[float, float]]], 
@@ -62,6 +64,322 @@ def calculate_area_coverage_and_redundancy(
         
     return area_coverage, route_redundancy
 
+def grid_cells(positions: np.ndarray, area_bounds: Tuple[float, float, float, float], grid_size: int = 50) -> np.ndarray:
+    """Célula da grade (índice linear i * grid_size + j) de cada posição (..., 2), como na cobertura."""
+    min_x, max_x, min_y, max_y = area_bounds
+    i = np.clip(((positions[..., 0] - min_x) * (grid_size / (max_x - min_x))).astype(np.int64), 0, grid_size - 1)
+    j = np.clip(((positions[..., 1] - min_y) * (grid_size / (max_y - min_y))).astype(np.int64), 0, grid_size - 1)
+    return i * grid_size + j
+
+
+class RevisitTracker:
+    """
+    Latência de revisita por célula da grade, atualizada incrementalmente a cada tick.
+
+    Guarda o último tick em que cada célula foi observada (por qualquer drone). Quando uma
+    célula volta a ser observada depois de ao menos um tick sem observação, o intervalo
+    (tick atual - última visita) entra no histograma de revisitas e no máximo da célula. Ao
+    final, células que ficaram sem nova visita contam como intervalos em aberto (o tempo desde
+    a última observação), usados no máximo e no mapa de calor. Suporta `runs` execuções
+    independentes de uma vez (motor vetorizado): as células são indexadas por execução.
+    """
+    def __init__(self, area_bounds: Tuple[float, float, float, float], grid_size: int = 50, runs: int = 1):
+        self.area_bounds = tuple(area_bounds)
+        self.grid_size = grid_size
+        self.runs = runs
+        cells = grid_size * grid_size
+        self.last_visit = np.full(runs * cells, -1, dtype=np.int64)
+        self.max_gap_cell = np.zeros(runs * cells, dtype=np.int64)
+        self.gap_count = np.zeros(runs, dtype=np.int64)
+        self.gap_sum = np.zeros(runs, dtype=np.int64)
+        # Contagens [execução, intervalo], alargadas quando aparece um intervalo maior
+        self.gap_counts = np.zeros((runs, 1), dtype=np.int64)
+        self.gap_width = 1
+        self.tick = 0
+
+    def update(self, tick: int, positions: np.ndarray, run_index: Optional[np.ndarray] = None):
+        """Registra as observações do tick: `positions` (N, 2) e, com várias execuções, a execução de cada uma."""
+        cells = grid_cells(np.asarray(positions, dtype=np.float64).reshape(-1, 2), self.area_bounds, self.grid_size)
+        if run_index is not None:
+            cells = cells + np.asarray(run_index) * (self.grid_size * self.grid_size)
+        self.update_cells(tick, cells)
+
+    def update_cells(self, tick: int, cells: np.ndarray):
+        """Mesmo que `update`, a partir dos índices de célula (já deslocados por execução)."""
+        previous = self.last_visit[cells]
+        revisit = (previous >= 0) & (previous < tick - 1)
+        if revisit.any():
+            # Só as revisitas (poucas por tick) precisam de deduplicação; depois dela, as
+            # atualizações usam indexação direta, sem ufunc.at
+            revisited = np.unique(cells[revisit])
+            gaps = tick - self.last_visit[revisited]
+            self.max_gap_cell[revisited] = np.maximum(self.max_gap_cell[revisited], gaps)
+            run = revisited // (self.grid_size * self.grid_size)
+            self.gap_count += np.bincount(run, minlength=self.runs)
+            self.gap_sum += np.bincount(run, weights=gaps, minlength=self.runs).astype(np.int64)
+            width = int(gaps.max()) + 1
+            if width > self.gap_counts.shape[1]:
+                grown = np.zeros((self.runs, max(width, 2 * self.gap_counts.shape[1])), dtype=np.int64)
+                grown[:, :self.gap_counts.shape[1]] = self.gap_counts
+                self.gap_counts = grown
+            self.gap_width = max(self.gap_width, width)
+            columns = self.gap_counts.shape[1]
+            self.gap_counts += np.bincount(run * columns + gaps,
+                                           minlength=self.runs * columns).reshape(self.runs, columns)
+        self.last_visit[cells] = tick
+        self.tick = max(self.tick, tick)
+
+    @property
+    def histogram(self) -> np.ndarray:
+        """Histograma dos intervalos de revisita: contagens [execução, intervalo em ticks]."""
+        return self.gap_counts[:, :self.gap_width].copy()
+
+    def open_gaps(self, tick: Optional[int] = None) -> np.ndarray:
+        """Tempo desde a última observação de cada célula já visitada (0 nas nunca visitadas)."""
+        tick = self.tick if tick is None else tick
+        return np.where(self.last_visit >= 0, tick - self.last_visit, 0)
+
+    def heatmap(self, run: int = 0, tick: Optional[int] = None) -> np.ndarray:
+        """Maior intervalo sem observação de cada célula (grid_size, grid_size), incluindo o intervalo em aberto."""
+        cells = self.grid_size * self.grid_size
+        worst = np.maximum(self.max_gap_cell, self.open_gaps(tick))[run * cells:(run + 1) * cells]
+        return worst.reshape(self.grid_size, self.grid_size)
+
+    def summary(self, tick: Optional[int] = None) -> List[Dict[str, float]]:
+        """Por execução: intervalo médio de revisita (intervalos fechados) e maior intervalo (incluindo os em aberto)."""
+        cells = self.grid_size * self.grid_size
+        worst = np.maximum(self.max_gap_cell, self.open_gaps(tick)).reshape(self.runs, cells).max(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(self.gap_count > 0, self.gap_sum / self.gap_count, 0.0)
+        return [{"revisit_gap_mean": float(mean[b]), "revisit_gap_max": int(worst[b])} for b in range(self.runs)]
+
+    def export_heatmap(self, path: str, run: int = 0, tick: Optional[int] = None):
+        """Exporta o mapa de calor de `heatmap()`: .npy, .csv ou imagem (.png etc., via matplotlib)."""
+        grid = self.heatmap(run, tick)
+        if path.endswith(".npy"):
+            np.save(path, grid)
+        elif path.endswith(".csv"):
+            np.savetxt(path, grid, fmt="%d", delimiter=",")
+        else:
+            import matplotlib.pyplot as plt
+            min_x, max_x, min_y, max_y = self.area_bounds
+            fig, ax = plt.subplots(figsize=(6, 5))
+            image = ax.imshow(grid.T, origin="lower", extent=(min_x, max_x, min_y, max_y), cmap="magma")
+            fig.colorbar(image, ax=ax, label="Maior intervalo sem observação (ticks)")
+            ax.set_title("Latência de Revisita por Célula")
+            fig.savefig(path)
+            plt.close(fig)
+
+
+class SparseCoverageGrid:
+    """
+    Grade de cobertura esparsa e em blocos (tiles), para áreas grandes em alta resolução.
+
+    Só aloca os blocos `tile_size` x `tile_size` que algum drone já tocou; a memória cresce com
+    a área efetivamente voada, não com o retângulo da operação. Cada célula guarda o primeiro
+    drone que a visitou e se outro drone distinto também passou por ela, o que basta para a
+    cobertura e a redundância de `calculate_area_coverage_and_redundancy` (com `grid_size`
+    igual, os números são idênticos). Os contadores de células visitadas/redundantes são
+    mantidos incrementalmente.
+
+    `levels` são fatores de agregação mantidos ao mesmo tempo: 1 é a resolução da grade, 4
+    agrupa 4x4 células, e assim por diante.
+    """
+    def __init__(self, area_bounds: Tuple[float, float, float, float], grid_size: Optional[int] = None,
+                 cell_size: Optional[float] = None, tile_size: int = 64, levels: Sequence[int] = (1,)):
+        min_x, max_x, min_y, max_y = area_bounds
+        self.area_bounds = tuple(area_bounds)
+        if grid_size is None and cell_size is None:
+            grid_size = 50
+        if grid_size is not None:
+            self.shape = (grid_size, grid_size)
+        else:
+            self.shape = (math.ceil((max_x - min_x) / cell_size), math.ceil((max_y - min_y) / cell_size))
+        self.x_scale = self.shape[0] / (max_x - min_x)
+        self.y_scale = self.shape[1] / (max_y - min_y)
+        self.tile_size = tile_size
+        self.levels = tuple(sorted(set(levels) | {1}))
+        # Por nível: {bloco: posição no pool} e pools (blocos, T, T) do primeiro drone e da marca de multi
+        self.tiles: Dict[int, Dict[int, int]] = {f: {} for f in self.levels}
+        self.first = {f: np.full((0, tile_size, tile_size), -1, dtype=np.int32) for f in self.levels}
+        self.multi = {f: np.zeros((0, tile_size, tile_size), dtype=bool) for f in self.levels}
+        self.visited = {f: 0 for f in self.levels}
+        self.redundant = {f: 0 for f in self.levels}
+
+    @classmethod
+    def from_config(cls, config: Dict, area_bounds) -> Optional["SparseCoverageGrid"]:
+        """
+        Grade esparsa da chave `coverage` da configuração, ex.: `{"store": "sparse",
+        "cell_size": 1.0, "tile_size": 64, "levels": [1, 8]}` (None para a grade densa padrão).
+        """
+        conf = config.get("coverage", {})
+        if conf.get("store", "dense") != "sparse":
+            return None
+        return cls(area_bounds, grid_size=conf.get("grid_size"), cell_size=conf.get("cell_size"),
+                   tile_size=conf.get("tile_size", 64), levels=conf.get("levels", (1,)))
+
+    def level_shape(self, level: int) -> Tuple[int, int]:
+        return -(-self.shape[0] // level), -(-self.shape[1] // level)
+
+    def update(self, positions, drones):
+        """Registra as posições (N, 2) observadas e o índice inteiro do drone de cada uma."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if not len(positions):
+            return
+        min_x, _, min_y, _ = self.area_bounds
+        i = np.clip(((positions[:, 0] - min_x) * self.x_scale).astype(np.int64), 0, self.shape[0] - 1)
+        j = np.clip(((positions[:, 1] - min_y) * self.y_scale).astype(np.int64), 0, self.shape[1] - 1)
+        drones = np.asarray(drones, dtype=np.int64)
+        for level in self.levels:
+            self._update_level(level, i // level, j // level, drones)
+
+    def _update_level(self, level: int, i: np.ndarray, j: np.ndarray, drones: np.ndarray):
+        T = self.tile_size
+        ny = self.level_shape(level)[1]
+        # Menor e maior drone de cada célula tocada neste passo
+        key = i * ny + j
+        order = np.lexsort((drones, key))
+        key, drones = key[order], drones[order]
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        cells = key[starts]
+        lowest = drones[starts]
+        highest = np.maximum.reduceat(drones, starts)
+        ci, cj = cells // ny, cells % ny
+        tile_keys, inverse = np.unique((ci // T) * (-(-ny // T)) + cj // T, return_inverse=True)
+        slots = self._slots(level, tile_keys)[inverse]
+        li, lj = ci % T, cj % T
+        first, multi = self.first[level], self.multi[level]
+        previous = first[slots, li, lj]
+        new = previous < 0
+        becomes_multi = ~multi[slots, li, lj] & ((highest != lowest) | (~new & ((lowest != previous) | (highest != previous))))
+        first[slots[new], li[new], lj[new]] = lowest[new]
+        multi[slots[becomes_multi], li[becomes_multi], lj[becomes_multi]] = True
+        self.visited[level] += int(new.sum())
+        self.redundant[level] += int(becomes_multi.sum())
+
+    def _slots(self, level: int, tile_keys: np.ndarray) -> np.ndarray:
+        """Posição no pool de cada bloco; blocos novos são alocados (o pool dobra quando enche)."""
+        directory = self.tiles[level]
+        slots = np.empty(len(tile_keys), dtype=np.int64)
+        for k, key in enumerate(tile_keys.tolist()):
+            slot = directory.get(key)
+            if slot is None:
+                slot = directory[key] = len(directory)
+            slots[k] = slot
+        needed = len(directory)
+        if needed > len(self.first[level]):
+            capacity = max(needed, 2 * len(self.first[level]))
+            T = self.tile_size
+            first = np.full((capacity, T, T), -1, dtype=np.int32)
+            multi = np.zeros((capacity, T, T), dtype=bool)
+            first[:len(self.first[level])] = self.first[level]
+            multi[:len(self.multi[level])] = self.multi[level]
+            self.first[level], self.multi[level] = first, multi
+        return slots
+
+    def coverage_and_redundancy(self, level: int = 1) -> Tuple[float, float]:
+        """Cobertura (%) e redundância (%) no nível `level`, como em `calculate_area_coverage_and_redundancy`."""
+        nx, ny = self.level_shape(level)
+        visited = self.visited[level]
+        coverage = (visited / (nx * ny)) * 100.0
+        redundancy = (self.redundant[level] / visited) * 100.0 if visited else 0.0
+        return coverage, redundancy
+
+    def metrics(self) -> Dict[str, float]:
+        """Cobertura/redundância da grade (nível 1) e de cada nível grosso (sufixo `_x<fator>`)."""
+        result = {}
+        for level in self.levels:
+            coverage, redundancy = self.coverage_and_redundancy(level)
+            suffix = "" if level == 1 else f"_x{level}"
+            result[f"area_coverage{suffix}"] = coverage
+            result[f"route_redundancy{suffix}"] = redundancy
+        return result
+
+    def memory_bytes(self) -> int:
+        """Memória alocada pelos pools de blocos (todos os níveis)."""
+        return sum(self.first[f].nbytes + self.multi[f].nbytes for f in self.levels)
+
+
+# Contagem de bits por byte (fallback de np.bitwise_count, disponível a partir do NumPy 2.0)
+_POPCOUNT8 = np.array([bin(k).count("1") for k in range(256)], dtype=np.uint8)
+
+
+def _popcount_sum(words: np.ndarray) -> np.ndarray:
+    """Número de bits 1 ao longo do último eixo."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return _POPCOUNT8[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def pairwise_overlap(bits: np.ndarray, chunk_bytes: int = 1 << 26) -> np.ndarray:
+    """
+    Matriz de sobreposição drone x drone a partir de bitsets empacotados (..., D, bytes):
+    O[i, j] = células visitadas por i E por j (a diagonal é a cobertura de cada drone).
+    AND + popcount vetorizados, em blocos de linhas para limitar a memória temporária.
+    """
+    bits = np.ascontiguousarray(bits)
+    n_bytes = bits.shape[-1]
+    if n_bytes % 8 == 0:
+        words = bits.view(np.uint64)  # 8 bytes por palavra: menos operações de AND/popcount
+    else:
+        words = bits
+    D = words.shape[-2]
+    result = np.empty(words.shape[:-2] + (D, D), dtype=np.int64)
+    rows = max(1, chunk_bytes // max(1, D * words.shape[-1] * words.itemsize * max(1, int(np.prod(words.shape[:-2])))))
+    for start in range(0, D, rows):
+        block = words[..., start:start + rows, None, :] & words[..., None, :, :]
+        result[..., start:start + rows, :] = _popcount_sum(block)
+    return result
+
+
+class CoverageBitsets:
+    """
+    Cobertura de cada drone como bitset empacotado (um bit por célula por drone, no layout de
+    `np.packbits`), atualizada a cada tick com as posições da frota.
+
+    `overlap()` devolve a matriz drone x drone de células compartilhadas, que mostra quais
+    pares estão duplicando a patrulha um do outro (a redundância agregada só diz quantas
+    células têm mais de um drone).
+    """
+    def __init__(self, num_drones: int, area_bounds: Tuple[float, float, float, float], grid_size: int = 50):
+        self.area_bounds = tuple(area_bounds)
+        self.grid_size = grid_size
+        # Bytes por drone arredondados a múltiplos de 8 para o AND/popcount em palavras de 64 bits
+        n_bytes = -(-grid_size * grid_size // 64) * 8
+        self.bits = np.zeros((num_drones, n_bytes), dtype=np.uint8)
+
+    def update(self, positions, drones: Optional[np.ndarray] = None):
+        """Marca as células das posições (N, 2); `drones` é o índice do drone de cada posição (padrão: 0..N-1)."""
+        cells = grid_cells(np.asarray(positions, dtype=np.float64).reshape(-1, 2), self.area_bounds, self.grid_size)
+        drones = np.arange(len(cells)) if drones is None else np.asarray(drones)
+        np.bitwise_or.at(self.bits, (drones, cells >> 3), (128 >> (cells & 7)).astype(np.uint8))
+
+    def visited(self) -> np.ndarray:
+        """Grade booleana (D, grid_size, grid_size) de células visitadas por drone."""
+        cells = self.grid_size * self.grid_size
+        return np.unpackbits(self.bits, axis=1)[:, :cells].reshape(-1, self.grid_size, self.grid_size).astype(bool)
+
+    def overlap(self) -> np.ndarray:
+        return pairwise_overlap(self.bits)
+
+    @staticmethod
+    def overlap_fraction(overlap: np.ndarray) -> np.ndarray:
+        """Fração (%) da cobertura do menor dos dois drones que é compartilhada com o outro (diagonal zerada)."""
+        counts = np.diagonal(overlap, axis1=-2, axis2=-1)
+        smaller = np.minimum(counts[..., :, None], counts[..., None, :])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(smaller > 0, overlap / smaller * 100.0, 0.0)
+        D = overlap.shape[-1]
+        fraction[..., np.arange(D), np.arange(D)] = 0.0
+        return fraction
+
+    def max_overlap(self) -> float:
+        """Maior sobreposição entre dois drones (% da cobertura do menor), 0 com menos de dois drones."""
+        if self.bits.shape[0] < 2:
+            return 0.0
+        return float(self.overlap_fraction(self.overlap()).max())
+
+
 def calculate_individual_autonomy(log_events: List[str], drone_ids: List[str]) -> Dict[str, int]:
     """
     Calcula o número de eventos de recarga (Refuel) por drone.
@@ -0,0 +1,286 @@
+# src/core/results_store.py
+
+import glob
+import math
+import numbers
+import os
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from aggregation import BatchAggregator
+from contracts import log_event
+
+PER_DRONE_PREFIX = "recharge_count_"
+
+# Colunas fixas do esquema de resultados; as demais métricas escalares entram como float64
+# (NaN quando ausentes numa execução) à medida que aparecem
+CORE_COLUMNS = {
+    "batch_id": "int64",
+    "area_coverage": "float64",
+    "route_redundancy": "float64",
+    "recharge_count_total": "int64",
+}
+
+# Esquema da tabela de série temporal (um registro por drone por passo)
+TIME_SERIES_COLUMNS = {
+    "batch_id": "int64",
+    "step": "int32",
+    "drone_id": "str",
+    "x": "float64",
+    "y": "float64",
+    "battery": "float64",
+}
+
+
+def _pyarrow():
+    """Importa o pyarrow sob demanda; retorna None quando não está instalado."""
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def split_metrics(metrics: Dict) -> Dict:
+    """
+    Separa o dicionário de métricas de uma execução em colunas escalares e listas por drone
+    (`drone_ids`, `recharge_counts`), evitando uma coluna larga por drone.
+    """
+    row = {"drone_ids": [], "recharge_counts": []}
+    for key, value in metrics.items():
+        if key.startswith(PER_DRONE_PREFIX) and key != f"{PER_DRONE_PREFIX}total":
+            row["drone_ids"].append(key[len(PER_DRONE_PREFIX):])
+            row["recharge_counts"].append(int(value))
+        elif isinstance(value, numbers.Real) and not isinstance(value, bool):
+            row[key] = value
+    row[f"{PER_DRONE_PREFIX}total"] = int(sum(row["recharge_counts"]))
+    return row
+
+
+def join_metrics(row: Dict) -> Dict:
+    """
+    Operação inversa de `split_metrics`: reconstrói o dicionário plano de métricas (sem as
+    métricas ausentes na execução, gravadas como NaN).
+    """
+    metrics = {k: v for k, v in row.items()
+               if k not in ("drone_ids", "recharge_counts", f"{PER_DRONE_PREFIX}total")
+               and v is not None and not (isinstance(v, float) and math.isnan(v))}
+    metrics.update({f"{PER_DRONE_PREFIX}{d}": int(c) for d, c in zip(row["drone_ids"], row["recharge_counts"])})
+    return metrics
+
+
+def build_time_series(batch_id: int, trajectory_data: Dict[str, List], battery_data: Dict[str, List]) -> Dict[str, np.ndarray]:
+    """Converte trajetórias/baterias por drone em colunas (passo 0 = estado inicial)."""
+    ids, steps, xs, ys, batteries = [], [], [], [], []
+    for drone_id, trajectory in trajectory_data.items():
+        n = len(trajectory)
+        positions = np.asarray(trajectory, dtype=float).reshape(n, 2)
+        ids.extend([drone_id] * n)
+        steps.append(np.arange(n, dtype=np.int32))
+        xs.append(positions[:, 0])
+        ys.append(positions[:, 1])
+        batteries.append(np.asarray(battery_data.get(drone_id, [np.nan] * n), dtype=float))
+    return {
+        "batch_id": np.full(len(ids), batch_id, dtype=np.int64),
+        "step": np.concatenate(steps) if steps else np.zeros(0, dtype=np.int32),
+        "drone_id": np.asarray(ids, dtype=str),
+        "x": np.concatenate(xs) if xs else np.zeros(0),
+        "y": np.concatenate(ys) if ys else np.zeros(0),
+        "battery": np.concatenate(batteries) if batteries else np.zeros(0),
+    }
+
+
+class ResultsSink:
+    """
+    Gravação colunar e incremental dos resultados de batch.
+
+    Cada execução finalizada é anexada imediatamente: no backend `arrow` como um record batch
+    num arquivo Arrow IPC em fluxo (`.arrows`, legível mesmo se o processo morrer no meio), e no
+    backend `npz` (fallback sem pyarrow) como um arquivo-parte `.npz` num diretório. A série
+    temporal por tick, quando fornecida, vai para uma segunda tabela (`<nome>_ticks`).
+
+    Métricas que aparecem depois da primeira execução ampliam o esquema: no backend `arrow` um
+    novo fluxo, com o esquema ampliado, começa no mesmo arquivo; as execuções anteriores ficam
+    com NaN nessas colunas na leitura.
+    """
+    def __init__(self, base_path: str = "batch_results", backend: str = "auto"):
+        pa = _pyarrow()
+        if backend == "auto":
+            backend = "arrow" if pa is not None else "npz"
+        if backend == "arrow" and pa is None:
+            raise ImportError("O backend 'arrow' requer o pacote pyarrow")
+        self.backend = backend
+        self.path = results_path(base_path, backend)
+        self.series_path = results_path(f"{base_path}_ticks", backend)
+        self.schema_columns: Optional[Dict[str, str]] = None
+        self._writers = {}
+        self._parts = 0
+        for p in (self.path, self.series_path):
+            if backend == "npz":
+                os.makedirs(p, exist_ok=True)
+                for old in glob.glob(os.path.join(p, "part-*.npz")):
+                    os.remove(old)
+            elif os.path.exists(p):
+                os.remove(p)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _extend_schema(self, row: Dict) -> bool:
+        """Acrescenta ao esquema as métricas ainda desconhecidas; True se ele mudou."""
+        first = self.schema_columns is None
+        if first:
+            self.schema_columns = dict(CORE_COLUMNS)
+        new = [key for key in row if key not in self.schema_columns and key not in ("drone_ids", "recharge_counts")]
+        self.schema_columns.update((key, "float64") for key in new)
+        if new and not first:
+            log_event(f"RESULTADOS: novas métricas a partir da execução {self._parts + 1}: {new}")
+        return first or bool(new)
+
+    def _columns(self, row: Dict) -> Dict[str, np.ndarray]:
+        cols = {}
+        for key, dtype in self.schema_columns.items():
+            value = row.get(key)
+            if dtype == "int64":
+                cols[key] = np.array([value], dtype=np.int64)
+            else:
+                cols[key] = np.array([np.nan if value is None else value], dtype=np.float64)
+        return cols
+
+    def append(self, metrics: Dict, time_series: Optional[Dict[str, np.ndarray]] = None):
+        """Anexa uma execução (e opcionalmente sua série temporal) e persiste imediatamente."""
+        row = split_metrics(metrics)
+        if self._extend_schema(row) and self.backend == "arrow":
+            self._close_writer("runs")
+        cols = self._columns(row)
+        self._parts += 1
+        if self.backend == "arrow":
+            pa = _pyarrow()
+            arrays = {k: pa.array(v) for k, v in cols.items()}
+            arrays["drone_ids"] = pa.array([row["drone_ids"]], type=pa.list_(pa.string()))
+            arrays["recharge_counts"] = pa.array([row["recharge_counts"]], type=pa.list_(pa.int64()))
+            self._write_arrow("runs", self.path, pa.record_batch(list(arrays.values()), names=list(arrays)))
+            if time_series is not None:
+                batch = pa.record_batch([pa.array(time_series[k]) for k in TIME_SERIES_COLUMNS],
+                                        names=list(TIME_SERIES_COLUMNS))
+                self._write_arrow("ticks", self.series_path, batch)
+        else:
+            cols["drone_ids"] = np.asarray(row["drone_ids"], dtype=str)
+            cols["recharge_counts"] = np.asarray(row["recharge_counts"], dtype=np.int64)
+            self._write_npz(self.path, cols)
+            if time_series is not None:
+                self._write_npz(self.series_path, time_series)
+
+    def _write_arrow(self, name, path, batch):
+        pa = _pyarrow()
+        writer = self._writers.get(name)
+        if writer is None:
+            # Um esquema novo continua o mesmo arquivo com outro fluxo
+            sink = pa.OSFile(path, "ab")
+            writer = self._writers[name] = (sink, pa.ipc.new_stream(sink, batch.schema))
+        writer[1].write_batch(batch)
+        writer[0].flush()
+
+    def _close_writer(self, name):
+        writer = self._writers.pop(name, None)
+        if writer is not None:
+            writer[1].close()
+            writer[0].close()
+
+    def _write_npz(self, directory, arrays):
+        final = os.path.join(directory, f"part-{self._parts:06d}.npz")
+        tmp = final + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, final)
+
+    def close(self):
+        for name in list(self._writers):
+            self._close_writer(name)
+
+
+def results_path(base_path: str, backend: str) -> str:
+    return f"{base_path}.arrows" if backend == "arrow" else f"{base_path}.npz.d"
+
+
+def _arrow_batches(path: str) -> Iterator:
+    """Record batches dos fluxos Arrow IPC consecutivos do arquivo (tolera um registro final truncado)."""
+    pa = _pyarrow()
+    with pa.OSFile(path, "rb") as source:
+        while True:
+            try:
+                reader = pa.ipc.open_stream(source)
+            except (pa.ArrowInvalid, OSError):
+                return
+            while True:
+                try:
+                    yield reader.read_next_batch()
+                except StopIteration:
+                    break
+                except (pa.ArrowInvalid, OSError):
+                    return
+
+
+def iter_rows(path: str) -> Iterator[Dict]:
+    """Itera sobre as execuções armazenadas (tolera um registro final truncado)."""
+    if not os.path.exists(path):
+        return
+    if path.endswith(".arrows"):
+        for batch in _arrow_batches(path):
+            yield from batch.to_pylist()
+    else:
+        for part in sorted(glob.glob(os.path.join(path, "part-*.npz"))):
+            with np.load(part) as data:
+                row = {k: data[k].item() for k in data.files if k not in ("drone_ids", "recharge_counts")}
+                row["drone_ids"] = data["drone_ids"].tolist()
+                row["recharge_counts"] = data["recharge_counts"].tolist()
+            yield row
+
+
+def load_time_series(path: str) -> Dict[str, np.ndarray]:
+    """Carrega a tabela de série temporal inteira como colunas numpy."""
+    chunks: Dict[str, List[np.ndarray]] = {k: [] for k in TIME_SERIES_COLUMNS}
+    if path.endswith(".arrows"):
+        for batch in _arrow_batches(path):
+            for k in TIME_SERIES_COLUMNS:
+                chunks[k].append(batch.column(k).to_numpy(zero_copy_only=False))
+    else:
+        for part in sorted(glob.glob(os.path.join(path, "part-*.npz"))):
+            with np.load(part) as data:
+                for k in TIME_SERIES_COLUMNS:
+                    chunks[k].append(data[k])
+    return {k: np.concatenate(v) if v else np.zeros(0) for k, v in chunks.items()}
+
+
+def aggregate_results(path: str, keep_rows: bool = False) -> BatchAggregator:
+    """Recalcula as estatísticas agregadas a partir dos dados armazenados."""
+    aggregator = BatchAggregator(keep_rows=keep_rows)
+    for row in iter_rows(path):
+        aggregator.add(join_metrics(row))
+    return aggregator
+
+
+def export_parquet(path: str, parquet_path: str):
+    """
+    Compacta o arquivo Arrow em fluxo num Parquet (um row group por execução). O esquema é o do
+    último fluxo (o mais amplo); colunas ausentes nas execuções anteriores ficam com NaN.
+    """
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+    schema = None
+    for batch in _arrow_batches(path):
+        schema = batch.schema
+    if schema is None:
+        return
+    with pq.ParquetWriter(parquet_path, schema) as writer:
+        for batch in _arrow_batches(path):
+            if batch.schema != schema:
+                batch = pa.record_batch(
+                    [batch.column(f.name) if f.name in batch.schema.names
+                     else pa.array(np.full(batch.num_rows, np.nan)) for f in schema], schema=schema)
+            writer.write_batch(batch)
@@ -0,0 +1,465 @@
+# src/core/sharding.py
+
+import json
+import math
+import multiprocessing
+import os
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from agents import PAS, Broker, YPA, CLA
+from contracts import log_event
+from metrics import grid_cells, RevisitTracker
+from spatial_index import pairs_within_arrays
+from vectorized import GRID_SIZE, STEP_SIZE, PatrolState, VectorizedPatrolBatch, base_metrics
+
+
+class ShardLayout:
+    """
+    Partição da área em `nx` x `ny` regiões retangulares alinhadas às células da grade de
+    cobertura: cada célula tem um único dono, e o dono de um drone é o dono da célula em que ele
+    está (posições fora da área caem nas células da borda, como em `grid_cells`). As regiões
+    da borda se estendem até o infinito.
+    """
+    def __init__(self, area_bounds: Tuple[float, float, float, float], shards: int, grid_size: int = GRID_SIZE):
+        shards = max(1, min(shards, grid_size * grid_size))
+        ny = int(math.sqrt(shards))
+        while shards % ny:
+            ny -= 1
+        nx = shards // ny
+        if nx > grid_size:
+            nx, ny = grid_size, min(grid_size, shards // grid_size)
+        self.area_bounds = tuple(area_bounds)
+        self.grid_size = grid_size
+        self.nx, self.ny = nx, ny
+        self.count = nx * ny
+        columns = np.array_split(np.arange(grid_size), nx)
+        rows = np.array_split(np.arange(grid_size), ny)
+        block_x = np.repeat(np.arange(nx), [len(c) for c in columns])
+        block_y = np.repeat(np.arange(ny), [len(r) for r in rows])
+        # Célula linear i * grid_size + j (i no eixo x), como em `grid_cells`
+        self.cell_owner = (block_x[:, None] * ny + block_y[None, :]).reshape(-1)
+        min_x, max_x, min_y, max_y = self.area_bounds
+        x_edges = min_x + np.array([c[0] for c in columns] + [grid_size]) * ((max_x - min_x) / grid_size)
+        y_edges = min_y + np.array([r[0] for r in rows] + [grid_size]) * ((max_y - min_y) / grid_size)
+        x_edges[0], x_edges[-1] = -np.inf, np.inf
+        y_edges[0], y_edges[-1] = -np.inf, np.inf
+        bx, by = np.divmod(np.arange(self.count), ny)
+        # (xmin, xmax, ymin, ymax) de cada região
+        self.rects = np.stack([x_edges[bx], x_edges[bx + 1], y_edges[by], y_edges[by + 1]], axis=1)
+
+    def cells(self, positions: np.ndarray) -> np.ndarray:
+        return grid_cells(np.asarray(positions, dtype=np.float64), self.area_bounds, self.grid_size)
+
+    def owner(self, positions: np.ndarray) -> np.ndarray:
+        """Região dona de cada posição (N, 2)."""
+        return self.cell_owner[self.cells(positions)]
+
+    def near(self, positions: np.ndarray, halo: float) -> np.ndarray:
+        """Máscara (N, regiões) das posições a até `halo` de cada região."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        x, y = positions[:, 0:1], positions[:, 1:2]
+        r = self.rects
+        dx = np.maximum(np.maximum(r[None, :, 0] - x, x - r[None, :, 1]), 0.0)
+        dy = np.maximum(np.maximum(r[None, :, 2] - y, y - r[None, :, 3]), 0.0)
+        # Margem para as arestas das regiões, calculadas de forma diferente das células
+        return np.hypot(dx, dy) <= halo + 1e-9
+
+
+class _ShardState(PatrolState):
+    """Estado da patrulha de uma região, com o índice global de cada drone e o estado do geofence."""
+    FIELDS = PatrolState.FIELDS + ("gidx", "active_out", "active_zone")
+
+    @classmethod
+    def empty(cls, template: Dict[str, np.ndarray], energy, zones: int) -> "_ShardState":
+        """Região sem drones, com os mesmos formatos de `template` (saída de `take`)."""
+        routes = template["routes"][:, :0]
+        state = cls(routes, template["route_len"][:, :0], template["exists"][:, :0],
+                    template["pos"][:, :0], template["battery"][:, :0], energy)
+        state.gidx = np.zeros((1, 0), dtype=np.int64)
+        state.active_out = np.zeros((1, 0), dtype=bool)
+        state.active_zone = np.zeros((1, 0, zones), dtype=bool)
+        return state
+
+
+def _split_by(owner: np.ndarray, count: int) -> List[np.ndarray]:
+    """Índices agrupados por região: [índices com owner == k para cada k]."""
+    order = np.argsort(owner, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(owner, minlength=count))[:-1])
+
+
+def _outbox(state: _ShardState, me: int, layout: ShardLayout, halo: float):
+    """
+    Drones a transferir na barreira: {região: drones que passam a pertencer a ela} e
+    {região: cópias-fantasma dos drones a até `halo` dela}. Retorna também as colunas que
+    continuam com a região `me` (-1 no coordenador: todos são transferidos).
+    """
+    positions = state.pos[0]
+    owners = layout.owner(positions)
+    handoffs, ghosts = {}, {}
+    for k, cols in enumerate(_split_by(owners, layout.count)):
+        if k != me and len(cols):
+            handoffs[k] = state.take(cols)
+    near = layout.near(positions, halo)
+    near[np.arange(len(owners)), owners] = False
+    for k in np.flatnonzero(near.any(axis=0)):
+        ghosts[int(k)] = state.take(np.flatnonzero(near[:, k]))
+    return handoffs, ghosts, np.flatnonzero(owners == me), owners
+
+
+class _Shard:
+    """Processo de uma região: drones próprios, fantasmas dos vizinhos e as células da grade que possui."""
+    def __init__(self, setup: Dict):
+        self.me = setup["shard"]
+        self.layout: ShardLayout = setup["layout"]
+        self.halo = setup["halo"]
+        self.separation = setup["separation"]
+        self.geofence = setup["geofence"]
+        self.total = setup["total"]
+        self.skills = setup["skills"]          # (habilidades, N) bool
+        self.static_score = setup["static_score"]
+        self.state = _ShardState.empty(setup["template"], setup["energy"], len(self.geofence.zones))
+        self.revisit = RevisitTracker(self.layout.area_bounds, self.layout.grid_size)
+        self.visit_keys = np.zeros(0, dtype=np.int64)   # célula * N + drone, das células próprias
+        self.pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self.active_pairs = np.zeros(0, dtype=np.int64)
+        self.conflicts = 0
+        self.violations = 0
+        self.ghosts = 0
+
+    def _apply_observations(self, inbound: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]]):
+        """Observações (tick, célula, drone) das células próprias, aplicadas em ordem de tick."""
+        parts = self.pending + list(inbound)
+        self.pending = []
+        if not parts:
+            return
+        ticks, cells, drones = (np.concatenate([p[k] for p in parts]) for k in range(3))
+        if not len(ticks):
+            return
+        self.visit_keys = np.union1d(self.visit_keys, np.unique(cells * self.total + drones))
+        order = np.argsort(ticks, kind="stable")
+        ticks, cells = ticks[order], cells[order]
+        unique, start = np.unique(ticks, return_index=True)
+        for t, group in zip(unique, np.split(cells, start[1:])):
+            self.revisit.update_cells(int(t), group)
+
+    def window(self, msg: Dict) -> Dict:
+        state = self.state
+        self._apply_observations(msg["obs"])
+        state.extend(msg["handoffs"])
+        if len(msg["pairs"]):
+            self.active_pairs = np.union1d(self.active_pairs, msg["pairs"])
+        owned = state.exists.shape[1]
+        state.extend(msg["ghosts"])
+        self.ghosts += state.exists.shape[1] - owned
+        is_owned = np.arange(state.exists.shape[1]) < owned
+        shortlist = self._shortlist(msg["skills"], owned) if msg["skills"] is not None else None
+
+        local: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        for t in range(msg["start"], msg["end"]):
+            state.tick()
+            pos = state.pos[0]
+            gidx = state.gidx[0]
+            local.append((np.full(owned, t + 1, dtype=np.int64), self.layout.cells(pos[:owned]), gidx[:owned]))
+
+            # Separação: conta o par a região dona do drone de menor índice global
+            flying = np.flatnonzero(state.patrolling[0])
+            i, j = pairs_within_arrays(pos[flying], self.separation)
+            i, j = flying[i], flying[j]
+            lo_owned = np.where(gidx[i] < gidx[j], is_owned[i], is_owned[j])
+            i, j = i[lo_owned], j[lo_owned]
+            keys = np.unique(np.minimum(gidx[i], gidx[j]) * self.total + np.maximum(gidx[i], gidx[j]))
+            self.conflicts += len(np.setdiff1d(keys, self.active_pairs, assume_unique=True))
+            self.active_pairs = keys
+
+            # Geofence por posição dos drones próprios, contada no início
+            out, point_idx, zone_idx = self.geofence.position_violations(pos[:owned])
+            self.violations += int((out & ~state.active_out[0, :owned]).sum())
+            state.active_out[0, :owned] = out
+            if state.active_zone.shape[2]:
+                current_zone = np.zeros((owned, state.active_zone.shape[2]), dtype=bool)
+                current_zone[point_idx, zone_idx] = True
+                self.violations += int((current_zone & ~state.active_zone[0, :owned]).sum())
+                state.active_zone[0, :owned] = current_zone
+
+        state.keep(np.arange(owned))
+        handoffs, ghosts, stay, owners = _outbox(state, self.me, self.layout, self.halo)
+        # Conflitos ativos acompanham o drone de menor índice global
+        lo = self.active_pairs // self.total
+        pair_owner = np.full(len(lo), self.me, dtype=np.int64)
+        if len(lo):
+            column = np.full(self.total, -1, dtype=np.int64)
+            column[state.gidx[0]] = np.arange(owned)
+            pair_owner = owners[column[lo]]
+        pairs = {int(k): self.active_pairs[pair_owner == k] for k in np.unique(pair_owner) if k != self.me}
+        self.active_pairs = self.active_pairs[pair_owner == self.me]
+        # Observações de células de outras regiões vão para os donos
+        obs = {}
+        if local:
+            ticks, cells, drones = (np.concatenate([p[k] for p in local]) for k in range(3))
+            cell_owner = self.layout.cell_owner[cells]
+            for k, idx in enumerate(_split_by(cell_owner, self.layout.count)):
+                if len(idx):
+                    if k == self.me:
+                        self.pending.append((ticks[idx], cells[idx], drones[idx]))
+                    else:
+                        obs[k] = (ticks[idx], cells[idx], drones[idx])
+        state.keep(stay)
+        return {"handoffs": handoffs, "ghosts": ghosts, "pairs": pairs, "obs": obs, "shortlist": shortlist}
+
+    def _shortlist(self, skills: Sequence[int], owned: int) -> Dict:
+        """
+        Parte local do MRA/CLA: candidatos disponíveis e, por habilidade requerida, os melhores
+        (custo do CLA, índice global) entre os drones próprios.
+        """
+        state = self.state
+        gidx = state.gidx[0, :owned]
+        available = ~state.in_refuel[0, :owned]
+        score = self.static_score[gidx] - state.battery[0, :owned] * 0.2
+        has = self.skills[:, gidx]
+        candidate = available & has[list(skills)].any(axis=0)
+        best = {}
+        for s in skills:
+            idx = np.flatnonzero(candidate & has[s])
+            idx = idx[np.lexsort((gidx[idx], score[idx]))][:len(skills)]
+            best[int(s)] = list(zip(score[idx].tolist(), gidx[idx].tolist()))
+        return {"candidates": int(candidate.sum()), "best": best}
+
+    def finish(self, msg: Dict) -> Dict:
+        """Recebe os drones e observações da última barreira e devolve os totais da região."""
+        self._apply_observations(msg["obs"])
+        state = self.state
+        state.extend(msg["handoffs"])
+        cells, per_cell = np.unique(self.visit_keys // self.total, return_counts=True)
+        worst = self.revisit.summary(tick=msg["ticks"])[0]["revisit_gap_max"]
+        return {
+            "visited": len(cells),
+            "redundant": int((per_cell > 1).sum()),
+            "gap_count": int(self.revisit.gap_count[0]),
+            "gap_sum": int(self.revisit.gap_sum[0]),
+            "gap_max": worst,
+            "conflicts": self.conflicts,
+            "violations": self.violations,
+            "gidx": state.gidx[0],
+            "recharges": state.recharges[0],
+            "refuel_ticks": int(state.refuel_ticks.sum()),
+            "ghosts": self.ghosts,
+        }
+
+
+def _shard_worker(conn, setup: Dict):
+    """Laço do processo de uma região: responde às mensagens do coordenador até "close"."""
+    shard = None
+    while True:
+        msg = conn.recv()
+        if msg["op"] == "close":
+            break
+        try:
+            if shard is None:
+                shard = _Shard(setup)
+            payload = ("ok", shard.window(msg) if msg["op"] == "window" else shard.finish(msg))
+        except Exception as e:
+            payload = ("error", repr(e))
+        conn.send(payload)
+    conn.close()
+
+
+class ShardedSimulation:
+    """
+    Uma missão do modelo de patrulha do Case 1 dividida por área entre processos (decomposição
+    de domínio), para frotas grandes demais para um único processo.
+
+    A área é dividida em regiões (`ShardLayout`); cada processo avança os drones da sua região
+    com o motor em arrays de `vectorized.py` e guarda as células da grade de cobertura que
+    possui. O coordenador só troca mensagens nas barreiras, a cada `barrier_ticks` ticks: os
+    drones que cruzaram a fronteira passam à nova região, as observações de células alheias vão
+    para os donos (aplicadas em ordem de tick) e cada região recebe cópias-fantasma dos drones
+    vizinhos a até separação + 2 * barrier_ticks * passo, que ela avança junto com os seus. Como
+    o modelo é determinístico, os fantasmas reproduzem exatamente os originais e os conflitos de
+    separação entre regiões são contados sem comunicação a cada tick (cada par pela região do
+    drone de menor índice). Nos ticks de contrato, cada região envia ao coordenador os seus
+    melhores candidatos por habilidade e o coordenador forma a coalizão com o PAS/Broker/YPA/CLA.
+
+    As métricas são as de `run_vectorized` para a mesma configuração, exceto
+    `pairwise_overlap_max` (matriz N x N), mais `shard_handoffs` e `shard_ghosts_mean`. Sem
+    `energy_model`, o reabastecimento teleporta o drone à base e as barreiras são a cada tick.
+    """
+    def __init__(self, config: Dict, workers: Optional[int] = None, barrier_ticks: Optional[int] = None):
+        conf = config.get("sharding") or {}
+        conf = conf if isinstance(conf, dict) else {}
+        workers = workers or conf.get("workers") or os.cpu_count() or 1
+        barrier_ticks = barrier_ticks or conf.get("barrier_ticks", 1)
+        self.batch = VectorizedPatrolBatch([config])
+        self.config = config
+        self.energy = self.batch.energy
+        if self.energy is None and barrier_ticks > 1:
+            # O teleporte para a base não respeita o alcance do halo entre barreiras
+            barrier_ticks = 1
+        self.barrier_ticks = barrier_ticks
+        self.layout = ShardLayout(self.batch.area_bounds, workers)
+        step = max(STEP_SIZE, self.energy.step_size if self.energy is not None else 0.0)
+        self.halo = self.batch.separation + 2 * barrier_ticks * step
+        self.ids = self.batch.drone_ids[0]
+        self.handoffs = 0
+        mas = config.get("mas_config", {})
+        self.contract_frequency = mas.get("contract_frequency", 1)
+        self.contract_skills = list(mas.get("contract_skills", []))
+        self.coalitions: List = []
+
+    def _windows(self):
+        t, ticks = 0, self.batch.ticks
+        while t < ticks:
+            end = min(t + self.barrier_ticks, ticks)
+            # Barreira em todo tick de contrato: o MAS usa o estado do início do tick
+            end = min(end, (t // self.contract_frequency + 1) * self.contract_frequency)
+            yield t, end
+            t = end
+
+    def _static_mas(self) -> Tuple[np.ndarray, np.ndarray]:
+        drones = self.config.get("drones", [])
+        skills = np.array([[s in d.get("skills", []) for d in drones] for s in self.contract_skills], dtype=bool)
+        static = np.array([d.get("cost", 1) * 0.3 + d.get("time", 1) * 0.3 - d.get("quality", 1) * 0.2 for d in drones])
+        return skills.reshape(len(self.contract_skills), len(drones)), static
+
+    def _contract(self, t: int, shortlists: Sequence[Dict]):
+        """Forma a coalizão a partir dos candidatos enviados pelas regiões (mesma escolha do CLA)."""
+        template = self.pas.create_contract_template(self.contract_skills)
+        self.broker.transmit_request(template, self.ypa)
+        log_event(f"MRA encontrou {sum(s['candidates'] for s in shortlists)} candidatos com habilidades compatíveis.")
+        contract = self.cla.create_coalition_contract(template.required_skills)
+        taken = set()
+        for k, skill in enumerate(self.contract_skills):
+            suitable = sorted(c for s in shortlists for c in s["best"][k] if c[1] not in taken)
+            if not suitable:
+                log_event(f"Nenhum candidato com habilidade {skill}")
+                continue
+            best = suitable[0][1]
+            taken.add(best)
+            contract.members.append(self.ids[best])
+            log_event(f"CLA recrutou {self.ids[best]} para habilidade {skill}. Critério de otimização aplicado.")
+        self.cla.coalitions.append(contract)
+
+    def run(self) -> Dict:
+        batch, layout = self.batch, self.layout
+        total = len(self.ids)
+        log_event(f"SHARDING: {total} drones em {layout.count} regiões ({layout.nx} x {layout.ny}), "
+                  f"barreira a cada {self.barrier_ticks} tick(s), halo {self.halo:.2f}.")
+        self.pas, self.broker, self.ypa, self.cla = PAS(), Broker(), YPA(), CLA()
+        state = _ShardState(batch.routes, batch.route_len, batch.exists, batch.pos, batch.battery, self.energy)
+        zones = len(batch.geofence.zones)
+        state.gidx = np.arange(batch.D)[None, :]
+        state.active_out = np.zeros((1, batch.D), dtype=bool)
+        state.active_zone = np.zeros((1, batch.D, zones), dtype=bool)
+        state.keep(np.flatnonzero(batch.exists[0]))
+        skills, static = self._static_mas()
+
+        ctx = multiprocessing.get_context()
+        workers = []
+        template = state.take(np.zeros(0, dtype=np.int64))
+        for k in range(layout.count):
+            parent, child = ctx.Pipe()
+            setup = {"shard": k, "layout": layout, "halo": self.halo, "separation": batch.separation,
+                     "geofence": batch.geofence, "total": total, "skills": skills, "static_score": static,
+                     "template": template, "energy": self.energy}
+            process = ctx.Process(target=_shard_worker, args=(child, setup), daemon=True)
+            process.start()
+            child.close()
+            workers.append((process, parent))
+
+        # Distribuição inicial: todos os drones saem do coordenador
+        handoffs, ghosts, _, owners = _outbox(state, -1, layout, self.halo)
+        cells = layout.cells(state.pos[0])
+        inbox = [{"handoffs": [], "ghosts": [], "pairs": [], "obs": []} for _ in range(layout.count)]
+        for k, part in handoffs.items():
+            inbox[k]["handoffs"].append(part)
+        for k, part in ghosts.items():
+            inbox[k]["ghosts"].append(part)
+        for k, idx in enumerate(_split_by(layout.cell_owner[cells], layout.count)):
+            if len(idx):
+                inbox[k]["obs"].append((np.zeros(len(idx), dtype=np.int64), cells[idx], state.gidx[0, idx]))
+        try:
+            for start, end in self._windows():
+                contract = start % self.contract_frequency == 0
+                replies = self._exchange(workers, [
+                    {"op": "window", "start": start, "end": end, "handoffs": box["handoffs"], "ghosts": box["ghosts"],
+                     "pairs": np.concatenate(box["pairs"]) if box["pairs"] else np.zeros(0, dtype=np.int64),
+                     "obs": box["obs"], "skills": list(range(len(self.contract_skills))) if contract else None}
+                    for box in inbox])
+                if contract:
+                    self._contract(start, [r["shortlist"] for r in replies])
+                inbox = [{"handoffs": [], "ghosts": [], "pairs": [], "obs": []} for _ in range(layout.count)]
+                for reply in replies:
+                    for k, part in reply["handoffs"].items():
+                        inbox[k]["handoffs"].append(part)
+                        self.handoffs += part["gidx"].shape[1]
+                    for k, part in reply["ghosts"].items():
+                        inbox[k]["ghosts"].append(part)
+                    for k, keys in reply["pairs"].items():
+                        inbox[k]["pairs"].append(keys)
+                    for k, obs in reply["obs"].items():
+                        inbox[k]["obs"].append(obs)
+            finals = self._exchange(workers, [{"op": "finish", "handoffs": box["handoffs"], "obs": box["obs"],
+                                               "ticks": batch.ticks} for box in inbox])
+        finally:
+            for process, conn in workers:
+                try:
+                    conn.send({"op": "close"})
+                except (BrokenPipeError, OSError):
+                    pass
+                conn.close()
+                process.join()
+        return self._metrics(finals)
+
+    @staticmethod
+    def _exchange(workers, messages: Sequence[Dict]) -> List[Dict]:
+        """Barreira: envia uma mensagem a cada região e espera todas as respostas."""
+        for (_, conn), msg in zip(workers, messages):
+            conn.send(msg)
+        replies = []
+        for k, (_, conn) in enumerate(workers):
+            status, value = conn.recv()
+            if status != "ok":
+                log_event(f"SHARDING: região {k} falhou: {value}")
+                raise RuntimeError(f"Região {k} falhou no processo: {value}")
+            replies.append(value)
+        return replies
+
+    def _metrics(self, finals: Sequence[Dict]) -> Dict:
+        cells = GRID_SIZE * GRID_SIZE
+        visited = sum(f["visited"] for f in finals)
+        redundant = sum(f["redundant"] for f in finals)
+        gap_count = sum(f["gap_count"] for f in finals)
+        gap_sum = sum(f["gap_sum"] for f in finals)
+        recharges = np.zeros(len(self.ids), dtype=np.int64)
+        for f in finals:
+            recharges[f["gidx"]] = f["recharges"]
+        windows = sum(1 for _ in self._windows())
+        metrics = {
+            "area_coverage": np.float64(visited / cells) * 100.0,
+            "route_redundancy": np.float64(redundant / visited) * 100.0 if visited else np.float64(0.0),
+            "separation_conflicts": sum(f["conflicts"] for f in finals),
+            "geofence_violations": int(self.batch._route_violations()[0]) + sum(f["violations"] for f in finals),
+            "revisit_gap_mean": float(gap_sum / gap_count) if gap_count else 0.0,
+            "revisit_gap_max": max(f["gap_max"] for f in finals),
+            "shard_handoffs": self.handoffs,
+            "shard_ghosts_mean": sum(f["ghosts"] for f in finals) / (len(finals) * windows) if windows else 0.0,
+        }
+        if self.energy is not None:
+            metrics.update(base_metrics(self.energy, int(recharges.sum()), sum(f["refuel_ticks"] for f in finals)))
+        metrics.update({f"recharge_count_{d}": int(recharges[k]) for k, d in enumerate(self.ids)})
+        log_event(f"SHARDING: {self.handoffs} transferências de drones entre regiões.")
+        return metrics
+
+
+def run_sharded(config: Union[str, Dict] = "mission_config.json", workers: Optional[int] = None,
+                barrier_ticks: Optional[int] = None) -> Dict:
+    """
+    Executa uma missão em modo particionado (`ShardedSimulation`). `workers` e `barrier_ticks`
+    também podem vir da chave `sharding` (ex.: `{"workers": 8, "barrier_ticks": 4}`); o padrão é
+    um processo por CPU e barreira a cada tick.
+    """
+    if isinstance(config, str):
+        with open(config, "r") as f:
+            config = json.load(f)
+    return ShardedSimulation(config, workers, barrier_ticks).run()
@@ -0,0 +1,231 @@
+# src/core/shared_state.py
+
+import argparse
+import time
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from contracts import log_event
+
+# Status conhecidos (o código gravado na memória compartilhada é o índice nesta tupla)
+STATUSES = ("IDLE", "PATROL", "RUNNING", "RETURNING", "REFUELING", "FAILURE")
+STATUS_CODES = {s: k for k, s in enumerate(STATUSES)}
+UNKNOWN_STATUS = 255
+
+# Cabeçalho: int64[8] = seq, tick, capacidade, drones registrados, encerrado, bytes por ID, reservados
+HEADER_FIELDS = 8
+SEQ, TICK, CAPACITY, COUNT, CLOSED, ID_BYTES = range(6)
+DEFAULT_ID_BYTES = 32
+
+# Blocos criados por este processo (já registrados no resource_tracker pelo escritor)
+_OWNED_BLOCKS = set()
+
+
+def _layout(capacity: int, id_bytes: int):
+    """Offsets (cabeçalho, IDs, valores, status) e tamanho total do bloco."""
+    ids = HEADER_FIELDS * 8
+    values = ids + ((capacity * id_bytes + 7) // 8) * 8
+    status = values + capacity * 3 * 8
+    return ids, values, status, status + capacity
+
+
+def _views(buf, capacity: int, id_bytes: int):
+    ids, values, status, _ = _layout(capacity, id_bytes)
+    return (
+        np.ndarray((capacity,), dtype=f"S{id_bytes}", buffer=buf, offset=ids),
+        np.ndarray((capacity, 3), dtype=np.float64, buffer=buf, offset=values),  # x, y, bateria
+        np.ndarray((capacity,), dtype=np.uint8, buffer=buf, offset=status),
+    )
+
+
+class SharedFleetState:
+    """
+    Espelho do estado da frota (`DroneMissionInterface.states`) num bloco de
+    `multiprocessing.shared_memory`, para monitores e visualizadores em outros processos.
+
+    O escritor é único (o processo da simulação) e protege as gravações com um seqlock: o
+    contador `seq` fica ímpar durante uma escrita e par quando o bloco está consistente. Cada
+    gravação avulsa incrementa o contador duas vezes; entre `begin_tick` e `end_tick` as
+    gravações do tick inteiro ficam sob uma só escrita, e os leitores veem sempre a frota
+    inteira num mesmo tick. Leitores (`FleetStateReader`) não usam trava: copiam o bloco e
+    repetem a leitura se o contador mudou.
+    """
+    def __init__(self, capacity: int, name: Optional[str] = None, id_bytes: int = DEFAULT_ID_BYTES):
+        if capacity < 1:
+            raise ValueError("A capacidade do estado compartilhado deve ser positiva")
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=_layout(capacity, id_bytes)[3])
+        self.name = self.shm.name
+        _OWNED_BLOCKS.add(self.shm._name)
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        self.header[:] = 0
+        self.header[CAPACITY] = capacity
+        self.header[ID_BYTES] = id_bytes
+        self.ids, self.values, self.status = _views(self.shm.buf, capacity, id_bytes)
+        self.slots: Dict[str, int] = {}
+        self._in_tick = False
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional["SharedFleetState"]:
+        """
+        Cria o bloco a partir da chave `shared_state` da configuração (None se ausente):
+        `{"name": "frota", "capacity": 64}`. Sem `capacity`, usa o número de drones.
+        """
+        conf = config.get("shared_state")
+        if not conf:
+            return None
+        conf = conf if isinstance(conf, dict) else {}
+        capacity = conf.get("capacity") or max(1, len(config.get("drones", [])))
+        state = cls(capacity, name=conf.get("name"), id_bytes=conf.get("id_bytes", DEFAULT_ID_BYTES))
+        log_event(f"ESTADO COMPARTILHADO: frota publicada em '{state.name}' (capacidade {capacity}).")
+        return state
+
+    def _slot(self, drone_id: str) -> int:
+        slot = self.slots.get(drone_id)
+        if slot is None:
+            slot = len(self.slots)
+            if slot >= self.header[CAPACITY]:
+                raise ValueError(f"Estado compartilhado '{self.name}' cheio ({slot} drones); aumente 'capacity'")
+            encoded = drone_id.encode()
+            if len(encoded) > self.header[ID_BYTES]:
+                raise ValueError(f"ID de drone longo demais para o estado compartilhado: {drone_id!r}")
+            self.slots[drone_id] = slot
+            self.ids[slot] = encoded
+            self.header[COUNT] = slot + 1
+        return slot
+
+    def write(self, drone_id: str, battery: float, position, status: str):
+        """Grava o estado de um drone (chamado pela interface a cada atualização)."""
+        if not self._in_tick:
+            self.header[SEQ] += 1
+        slot = self._slot(drone_id)
+        self.values[slot] = (position[0], position[1], battery)
+        self.status[slot] = STATUS_CODES.get(status, UNKNOWN_STATUS)
+        if not self._in_tick:
+            self.header[SEQ] += 1
+
+    def publish(self, tick: int, states: Dict[str, Dict]):
+        """Regrava a frota inteira (ex.: após restaurar um snapshot)."""
+        self.begin_tick(tick)
+        for drone_id, s in states.items():
+            self.write(drone_id, s['battery'], s['position'], s['status'])
+        self.end_tick()
+
+    def begin_tick(self, tick: int):
+        """Abre a escrita do tick: leitores aguardam até `end_tick`."""
+        self.header[SEQ] += 1
+        self.header[TICK] = tick
+        self._in_tick = True
+
+    def end_tick(self):
+        self._in_tick = False
+        self.header[SEQ] += 1
+
+    def close(self, unlink: bool = True):
+        """Marca o bloco como encerrado e o libera (leitores já conectados continuam lendo o último estado)."""
+        if self.shm is None:
+            return
+        self.header[SEQ] += 1
+        self.header[CLOSED] = 1
+        self.header[SEQ] += 1
+        self.header = self.ids = self.values = self.status = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        _OWNED_BLOCKS.discard(self.shm._name)
+        self.shm = None
+
+
+@dataclass
+class FleetFrame:
+    """Leitura consistente da frota: arrays prontos para renderização, sem dicionários por drone."""
+    seq: int
+    tick: int
+    closed: bool
+    ids: List[str]
+    positions: np.ndarray   # (N, 2)
+    battery: np.ndarray     # (N,)
+    status: np.ndarray      # (N,) códigos de STATUSES
+
+    def states(self) -> Dict[str, Dict]:
+        """Mesmo formato de `DroneMissionInterface.states`."""
+        return {
+            d: {'battery': float(self.battery[k]), 'position': (float(self.positions[k, 0]), float(self.positions[k, 1])),
+                'status': STATUSES[self.status[k]] if self.status[k] < len(STATUSES) else 'UNKNOWN'}
+            for k, d in enumerate(self.ids)
+        }
+
+
+class FleetStateReader:
+    """Cliente de leitura de um `SharedFleetState` publicado por outro processo (sem travas)."""
+    def __init__(self, name: str):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # O leitor não é dono do bloco: sem isto o resource_tracker o removeria ao sair
+        if self.shm._name not in _OWNED_BLOCKS:
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.name = name
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        self.ids, self.values, self.status = _views(self.shm.buf, int(self.header[CAPACITY]), int(self.header[ID_BYTES]))
+        self._id_cache: List[str] = []
+
+    def read(self, max_retries: int = 10000) -> FleetFrame:
+        """Copia o estado atual; repete enquanto houver escrita em andamento ou concorrente."""
+        for _ in range(max_retries):
+            seq = int(self.header[SEQ])
+            if seq % 2:
+                time.sleep(0)
+                continue
+            count = int(self.header[COUNT])
+            tick = int(self.header[TICK])
+            closed = bool(self.header[CLOSED])
+            values = self.values[:count].copy()
+            status = self.status[:count].copy()
+            if len(self._id_cache) != count:
+                ids = [raw.decode() for raw in self.ids[:count]]
+            else:
+                ids = self._id_cache
+            if int(self.header[SEQ]) == seq:
+                self._id_cache = ids
+                return FleetFrame(seq, tick, closed, ids, values[:, :2], values[:, 2], status)
+        raise TimeoutError(f"Não foi possível obter uma leitura consistente de '{self.name}'")
+
+    def wait_for_update(self, last_seq: int, timeout: Optional[float] = None, poll: float = 0.001) -> Optional[FleetFrame]:
+        """Espera o contador passar de `last_seq` (nova escrita concluída); None se `timeout` expirar."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while int(self.header[SEQ]) <= last_seq or int(self.header[SEQ]) % 2:
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            time.sleep(poll)
+        return self.read()
+
+    def close(self):
+        self.header = self.ids = self.values = self.status = None
+        self.shm.close()
+
+
+def _monitor(argv=None):
+    """Monitor de terminal: imprime a frota a cada tick publicado até a simulação encerrar o bloco."""
+    parser = argparse.ArgumentParser(description="Leitor do estado compartilhado da frota")
+    parser.add_argument("name", help="Nome do bloco (chave shared_state.name da configuração)")
+    parser.add_argument("--interval", type=float, default=0.0, help="Intervalo mínimo entre impressões (s)")
+    args = parser.parse_args(argv)
+
+    reader = FleetStateReader(args.name)
+    frame = reader.read()
+    try:
+        while True:
+            print(f"--- tick {frame.tick} (seq {frame.seq}) ---")
+            for drone_id, s in frame.states().items():
+                print(f"{drone_id:<8} ({s['position'][0]:6.2f}, {s['position'][1]:6.2f})  bateria {s['battery']:6.1f}  {s['status']}")
+            if frame.closed:
+                break
+            time.sleep(args.interval)
+            frame = reader.wait_for_update(frame.seq)
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    _monitor()
@@ -3,25 +3,41 @@ import json
 import random
 import time
 import os
-import matplotlib.pyplot as plt
-import imageio
-import py_trees
 import numpy as np
-import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from interface import DroneMissionInterface
 from agents import PAS, Broker, YPA, MRA, CLA
 from contracts import CandidateResource, log_event, SIMULATION_LOGS
 from behaviors import create_behavior_tree, MockPyFly
-from metrics import calculate_area_coverage_and_redundancy, calculate_individual_autonomy
+from metrics import calculate_area_coverage_and_redundancy, calculate_individual_autonomy, RevisitTracker, SparseCoverageGrid, CoverageBitsets
+from spatial_index import SpatialHashIndex, SeparationMonitor
+from geofence import GeofenceEngine, DEFAULT_AREA_BOUNDS
+from profiling import PhaseTimer
+from aggregation import BatchAggregator, markdown_table
+from results_store import ResultsSink, aggregate_results, build_time_series, iter_rows
+from sampling import sample_routes, scenario_rng
+from vectorized import run_vectorized
+from pool import SimulationPool
+from shared_state import SharedFleetState
+from telemetry import TelemetryServer
+from energy import EnergyModel
 
 
 # === VISUALIZAÇÃO ===
-def draw_frame(tick, interface: DroneMissionInterface, coalition_id, path_data, output_dir="debug_frames"):
+def draw_frame(tick, interface: DroneMissionInterface, coalition_id, path_data, output_dir="debug_frames",
+               area_bounds=DEFAULT_AREA_BOUNDS, geofence: GeofenceEngine = None):
+    # Importado sob demanda: execuções headless (batch) não pagam o custo do matplotlib
+    import matplotlib.pyplot as plt
+    
     os.makedirs(output_dir, exist_ok=True)
     plt.figure(figsize=(6,6))
     
+    if geofence is not None:
+        for zone in geofence.zones:
+            color = 'green' if zone.kind == 'corridor' else 'orange'
+            plt.fill(zone.polygon[:, 0], zone.polygon[:, 1], color=color, alpha=0.2)
+    
     for route in interface.routes.values():
         if route:
             px, py = zip(*route)
@@ -36,15 +52,23 @@ def draw_frame(tick, interface: DroneMissionInterface, coalition_id, path_data,
             tx, ty = zip(*trajectory)
             plt.plot(tx, ty, c='lightblue', alpha=0.7)
             
-        color = 'blue' if s['status'] == 'PATROL' else 'red'
+        color = 'blue' if s['status'] == 'PATROL' else ('orange' if s['status'] == 'RETURNING' else 'red')
         plt.scatter(x, y, c=color, s=120, label=f"Drone {drone_id}")
         plt.text(x+0.2, y+0.2, f"{drone_id}\n{int(s['battery'])}%", fontsize=8)
         
-    plt.scatter(0, 0, c='gray', s=120, marker='s', label='Base')
+    if interface.energy_model is None:
+        plt.scatter(0, 0, c='gray', s=120, marker='s', label='Base')
+    else:
+        # Todas as bases, com vagas ocupadas e fila
+        for k, base in enumerate(interface.energy_model.network.bases.values()):
+            plt.scatter(base.position[0], base.position[1], c='gray', s=120, marker='s', label='Bases' if k == 0 else None)
+            slots = base.slots if base.slots is not None else '∞'
+            plt.text(base.position[0] + 0.2, base.position[1] - 0.4,
+                     f"{base.id} {len(base.charging)}/{slots}" + (f" +{len(base.queue)}" if base.queue else ""), fontsize=7)
     
     plt.title(f"Tick {tick} | Coalizão: {coalition_id}")
-    plt.xlim(-1, 10)
-    plt.ylim(-1, 10)
+    plt.xlim(area_bounds[0], area_bounds[1])
+    plt.ylim(area_bounds[2], area_bounds[3])
     plt.grid(True)
     plt.legend(loc='upper right', fontsize=8)
     
@@ -53,35 +77,69 @@ def draw_frame(tick, interface: DroneMissionInterface, coalition_id, path_data,
 
 
 # === SIMULAÇÃO ===
-def run_simulation(config_path="mission_config.json", disable_visual=False, return_metrics=False):
+def run_simulation(config_path="mission_config.json", disable_visual=False, return_metrics=False, time_series=None,
+                   pool: Optional[SimulationPool] = None):
     """
     Executa uma simulação única.
     Se return_metrics=True, retorna dicionário com métricas em vez de gerar GIF.
+    `config_path` também pode ser o dicionário de configuração já carregado.
+    Se `time_series` for um dicionário, ele recebe as colunas da série temporal por drone
+    (posição e bateria a cada tick).
+    Com `pool` (`SimulationPool`), interface, MockPyFly, agentes e árvores são reiniciados e
+    reutilizados em vez de reconstruídos.
     """
     log_event("Iniciando simulação...")
+    # Início dos logs desta execução (a lista de logs é global e compartilhada entre execuções)
+    log_start = len(SIMULATION_LOGS)
     
-    try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-    except FileNotFoundError:
-        log_event(f"Erro: Arquivo de configuração não encontrado em {config_path}")
-        return
+    if isinstance(config_path, dict):
+        # Configuração já carregada (ex.: pontos de uma varredura de parâmetros)
+        config = config_path
+    else:
+        try:
+            with open(config_path, 'r') as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            log_event(f"Erro: Arquivo de configuração não encontrado em {config_path}")
+            return
     
     SIMULATION_TICKS = config.get("simulation_ticks", 10)
     TICK_DELAY = config.get("tick_delay_seconds", 0.1)
     PYFLY_CONFIG = config.get("pyfly_config_path", "")
     PYFLY_PARAM = config.get("pyfly_param_path", "")
+    SEPARATION_DISTANCE = config.get("separation_distance", 0.5)
+    AREA_BOUNDS = tuple(config.get("area_bounds", DEFAULT_AREA_BOUNDS))
     
-    interface = DroneMissionInterface()
-    skywalker = MockPyFly(PYFLY_CONFIG, PYFLY_PARAM)
+    cell_size = config.get("spatial_cell_size", SEPARATION_DISTANCE)
+    if pool is not None:
+        interface, skywalker, (pas, broker, ypa, mra, cla) = pool.prepare(cell_size, (PYFLY_CONFIG, PYFLY_PARAM))
+        spatial_index = interface.spatial_index
+    else:
+        spatial_index = SpatialHashIndex(cell_size=cell_size)
+        interface = DroneMissionInterface(spatial_index=spatial_index)
+        skywalker = MockPyFly(PYFLY_CONFIG, PYFLY_PARAM)
+        pas, broker, ypa, mra, cla = PAS(), Broker(), YPA(), MRA(), CLA()
+    # Com a chave `shared_state`, o estado da frota também é publicado em memória compartilhada
+    shared_state = interface.shared_state = SharedFleetState.from_config(config)
+    # Com a chave `telemetry`, o estado de cada tick é transmitido por TCP (deltas + keyframes)
+    telemetry = TelemetryServer.from_config(config)
+    # Com a chave `energy_model`, retorno preditivo à base (com voo de volta e recarga) no lugar do limiar de 30%
+    interface.energy_model = EnergyModel.from_config(config)
     
-    pas, broker, ypa, mra, cla = PAS(), Broker(), YPA(), MRA(), CLA()
+    timer = PhaseTimer.from_config(config)
+    timer.instrument(pas, ["create_contract_template"])
+    timer.instrument(broker, ["transmit_request"])
+    timer.instrument(ypa, ["store_request_json"])
+    timer.instrument(mra, ["identify_candidates"])
+    timer.instrument(cla, ["create_coalition_contract", "recruit_members"])
+    geofence = GeofenceEngine.from_config(config)
     
     drone_trees = {}
     drone_resources = []
     trajectory_data = {} 
+    battery_data = {}
     
-    for drone_conf in config.get("drones", []):
+    for k, drone_conf in enumerate(config.get("drones", [])):
         drone_id = drone_conf["id"]
         resource = CandidateResource(
             id=drone_id,
@@ -105,64 +163,151 @@ def run_simulation(config_path="mission_config.json", disable_visual=False, retu
         interface.assign_route(drone_id, patrol_points)
         interface.update_drone_state(drone_id, resource.battery, resource.position, status='IDLE')
         trajectory_data[drone_id] = [resource.position]
+        battery_data[drone_id] = [resource.battery]
         
-        tree = create_behavior_tree(drone_id, interface, skywalker)
+        tree = pool.tree(k, drone_id) if pool is not None else create_behavior_tree(drone_id, interface, skywalker)
         drone_trees[drone_id] = tree
         
     coalition_id = None
+    geofence.check_routes(0, interface.routes)
+    # Latência de revisita por célula, atualizada a cada tick com as posições da frota
+    revisit = RevisitTracker(AREA_BOUNDS)
+    revisit.update(0, [trajectory[-1] for trajectory in trajectory_data.values()])
+    # Com a chave `coverage` ({"store": "sparse", ...}), a cobertura vem da grade esparsa incremental
+    coverage_grid = SparseCoverageGrid.from_config(config, AREA_BOUNDS)
+    drone_index = np.arange(len(trajectory_data))
+    if coverage_grid is not None:
+        coverage_grid.update([trajectory[-1] for trajectory in trajectory_data.values()], drone_index)
+    # Cobertura por drone em bitsets, para a matriz de sobreposição entre pares
+    coverage_bits = CoverageBitsets(len(trajectory_data), AREA_BOUNDS)
+    coverage_bits.update([trajectory[-1] for trajectory in trajectory_data.values()])
+    # Conflitos de separação só fazem sentido entre drones em voo (patrulhando ou voltando à base)
+    separation_monitor = SeparationMonitor(
+        spatial_index, SEPARATION_DISTANCE,
+        predicate=lambda did: interface.get_state(did)['status'] in ('PATROL', 'RETURNING')
+    )
     
     for t in range(SIMULATION_TICKS):
         if not disable_visual:
             log_event(f"[Tempo t={t}]")
+        if shared_state is not None:
+            shared_state.begin_tick(t)
+        if interface.energy_model is not None:
+            interface.energy_model.network.tick = t
         
         if t % config.get("mas_config", {}).get("contract_frequency", 1) == 0:
-            template = pas.create_contract_template(config.get("mas_config", {}).get("contract_skills", []))
-            broker.transmit_request(template, ypa)
-            
-            for res in drone_resources:
-                state = interface.get_state(res.id)
-                res.battery = state['battery']
-                res.position = state['position']
-                res.available = (state['status'] != 'REFUELING')
+            with timer.phase("mas_contracting"):
+                template = pas.create_contract_template(config.get("mas_config", {}).get("contract_skills", []))
+                broker.transmit_request(template, ypa)
                 
-            candidates = mra.identify_candidates(drone_resources, template.required_skills)
-            contract = cla.create_coalition_contract(template.required_skills)
-            cla.recruit_members(candidates, contract)
-            coalition_id = contract.id
+                for res in drone_resources:
+                    state = interface.get_state(res.id)
+                    res.battery = state['battery']
+                    res.position = state['position']
+                    res.available = (state['status'] not in ['REFUELING', 'RETURNING'])
+                    
+                candidates = mra.identify_candidates(drone_resources, template.required_skills)
+                contract = cla.create_coalition_contract(template.required_skills)
+                cla.recruit_members(candidates, contract)
+                coalition_id = contract.id
+                if telemetry is not None:
+                    telemetry.event("coalition", contract=contract.id, skills=list(template.required_skills),
+                                    members=list(contract.members))
             
-        for drone_id, tree in drone_trees.items():
-            tree.tick()
-            current_pos = interface.get_state(drone_id)['position']
-            trajectory_data[drone_id].append(current_pos)
+        with timer.phase("bt_ticks"):
+            for tree in drone_trees.values():
+                tree.tick()
+        if shared_state is not None:
+            shared_state.end_tick()
+        
+        with timer.phase("trajectory_recording"):
+            for drone_id in drone_trees:
+                trajectory_data[drone_id].append(interface.get_state(drone_id)['position'])
+            positions = [trajectory_data[drone_id][-1] for drone_id in drone_trees]
+            revisit.update(t + 1, positions)
+            if coverage_grid is not None:
+                coverage_grid.update(positions, drone_index)
+            coverage_bits.update(positions)
+            if time_series is not None:
+                for drone_id in drone_trees:
+                    battery_data[drone_id].append(interface.get_state(drone_id)['battery'])
+        
+        with timer.phase("monitoring"):
+            separation_monitor.check(t)
+            geofence.check_positions(t, list(drone_trees), [interface.get_position(d) for d in drone_trees])
+        if interface.energy_model is not None:
+            # Eventos das bases (atribuição, fila, início/fim de recarga)
+            for event in interface.energy_model.network.pop_events():
+                if telemetry is not None:
+                    telemetry.event("base_" + event.pop("kind"), **event)
+        if telemetry is not None:
+            with timer.phase("telemetry"):
+                telemetry.publish(t, interface.states)
             
         if not disable_visual:
-            draw_frame(t, interface, coalition_id, trajectory_data)
-        time.sleep(TICK_DELAY)
+            with timer.phase("rendering"):
+                draw_frame(t, interface, coalition_id, trajectory_data, area_bounds=AREA_BOUNDS, geofence=geofence)
+        with timer.phase("sleep"):
+            time.sleep(TICK_DELAY)
         
     skywalker.close()
+    if shared_state is not None:
+        shared_state.close()
+        interface.shared_state = None
+    if telemetry is not None:
+        telemetry.close()
+    
+    trace_path = config.get("profiling", {}).get("trace_path")
+    if timer.trace and trace_path:
+        timer.export_chrome_trace(trace_path)
+        log_event(f"Trace de execução exportado: {trace_path}")
     
     # --- MÉTRICAS ---
     drone_ids = list(trajectory_data.keys())
-    area_bounds = (-1.0, 10.0, -1.0, 10.0)
+    area_bounds = AREA_BOUNDS
     
     try:
-        area_coverage, route_redundancy = calculate_area_coverage_and_redundancy(trajectory_data, area_bounds)
+        if coverage_grid is not None:
+            area_coverage, route_redundancy = coverage_grid.coverage_and_redundancy()
+        else:
+            area_coverage, route_redundancy = calculate_area_coverage_and_redundancy(trajectory_data, area_bounds)
     except Exception as e:
         log_event(f"Erro ao calcular métricas: {e}")
         area_coverage, route_redundancy = 0.0, 0.0
 
     try:
-        recharge_counts = calculate_individual_autonomy(SIMULATION_LOGS, drone_ids)
+        recharge_counts = calculate_individual_autonomy(SIMULATION_LOGS[log_start:], drone_ids)
     except Exception as e:
         log_event(f"Erro autonomia: {e}")
         recharge_counts = {did: 0 for did in drone_ids}
     
+    revisit_summary = revisit.summary()[0]
+    overlap_fraction = CoverageBitsets.overlap_fraction(coverage_bits.overlap())
+    pairwise_overlap_max = float(overlap_fraction.max()) if len(drone_ids) > 1 else 0.0
+    heatmap_path = config.get("revisit_heatmap_path")
+    if heatmap_path:
+        revisit.export_heatmap(heatmap_path)
+        log_event(f"Mapa de calor de revisita exportado: {heatmap_path}")
+    
+    if time_series is not None:
+        time_series.update(build_time_series(0, trajectory_data, battery_data))
+    
     if return_metrics:
         metrics = {
             "area_coverage": area_coverage,
-            "route_redundancy": route_redundancy
+            "route_redundancy": route_redundancy,
+            "separation_conflicts": separation_monitor.total_conflicts,
+            "geofence_violations": len(geofence.violations),
+            **revisit_summary,
+            "pairwise_overlap_max": pairwise_overlap_max,
         }
+        if coverage_grid is not None:
+            # Níveis mais grossos da grade esparsa (area_coverage_x<fator>, route_redundancy_x<fator>)
+            metrics.update({k: v for k, v in coverage_grid.metrics().items() if k not in metrics})
+        if interface.energy_model is not None:
+            metrics.update(interface.energy_model.network.summary())
         metrics.update({f"recharge_count_{d}": recharge_counts.get(d, 0) for d in drone_ids})
+        metrics.update(timer.summary())
         return metrics
     
     # --- RELATÓRIO (modo visual) ---
@@ -173,10 +318,19 @@ def run_simulation(config_path="mission_config.json", disable_visual=False, retu
 | :--- | :--- |
 | **Cobertura Média da Área (%)** | {area_coverage:.2f} |
 | **Redundância de Rota (%)** | {route_redundancy:.2f} |
+| **Intervalo Médio de Revisita (ticks)** | {revisit_summary['revisit_gap_mean']:.2f} |
+| **Maior Intervalo sem Observação (ticks)** | {revisit_summary['revisit_gap_max']} |
+| **Maior Sobreposição entre Pares (%)** | {pairwise_overlap_max:.2f} |
 """
+    splits = cla.suggest_splits(drone_ids, overlap_fraction)
+    if splits:
+        report += "\n## Pares com Patrulha Sobreposta (sugestões do CLA)\n\n| Drone A | Drone B | Cobertura Compartilhada (%) |\n| :--- | :--- | :--- |\n"
+        report += "".join(f"| {a} | {b} | {f:.2f} |\n" for a, b, f in splits)
     with open("relatorio_case1.md", "w") as f:
         f.write(report)
     
+    import imageio
+    
     frames = [imageio.v2.imread(f"debug_frames/frame_{t:03d}.png") for t in range(SIMULATION_TICKS) if os.path.exists(f"debug_frames/frame_{t:03d}.png")]
     if frames:
         imageio.mimsave("simulacao_skywalker.gif", frames, duration=TICK_DELAY)
@@ -185,14 +339,19 @@ def run_simulation(config_path="mission_config.json", disable_visual=False, retu
 
 
 # === FUNÇÕES DE BATCH ===
-def generate_random_patrol_config(num_drones: int, num_points: int, area_bounds: Tuple[int, int, int, int] = (1, 9, 1, 9)) -> List[Dict]:
-    min_coord, max_coord = area_bounds[0], area_bounds[1]
+def generate_random_patrol_config(num_drones: int, num_points: int, area_bounds: Tuple[int, int, int, int] = (1, 9, 1, 9),
+                                  sampler: str = "uniform", rng: Optional[np.random.Generator] = None) -> List[Dict]:
+    """
+    Gera rotas de patrulha aleatórias. `sampler` escolhe o amostrador dos pontos ("uniform",
+    "lhs" ou "sobol", ver `sampling.py`); sem `rng`, o gerador numpy é semeado a partir do
+    `random` global, então `random.seed` continua tornando a geração reprodutível.
+    """
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    routes = sample_routes(num_drones, num_points, area_bounds, rng, sampler)
     drone_configs = []
     for i in range(num_drones):
-        patrol_points = [
-            [random.uniform(min_coord, max_coord), random.uniform(min_coord, max_coord)]
-            for _ in range(num_points)
-        ]
+        patrol_points = routes[i].tolist()
         drone_configs.append({
             "id": f"D{i+1}",
             "skills": ["search"],
@@ -207,8 +366,75 @@ def generate_random_patrol_config(num_drones: int, num_points: int, area_bounds:
     return drone_configs
 
 
-def run_batch_simulation(num_batches: int = 10, num_drones: int = 3, num_points: int = 5, config_path: str = "mission_config.json"):
-    log_event(f"Iniciando Batch de {num_batches} Simulações.")
+def _batch_runs(base_config: Dict, limit: int, num_drones: int, num_points: int, sampler: str, seed: Optional[int],
+                record_time_series: bool, engine: str, chunk_size: int):
+    """Gera (batch_id, métricas, série temporal) de cada cenário do batch com o motor escolhido."""
+    if engine not in ("bt", "vectorized"):
+        raise ValueError(f"Motor desconhecido: {engine!r} (opções: bt, vectorized)")
+    step = 1 if engine == "bt" else chunk_size
+    # Os objetos da simulação (interface, agentes, árvores) são reaproveitados entre os cenários
+    pool = SimulationPool()
+    for start in range(1, limit + 1, step):
+        batch_ids = range(start, min(limit, start + step - 1) + 1)
+        configs = []
+        for b in batch_ids:
+            log_event(f"\n--- Simulação Batch {b}/{limit} ---")
+            rng = scenario_rng(seed, b) if seed is not None else None
+            new_drones = generate_random_patrol_config(num_drones, num_points, sampler=sampler, rng=rng)
+            if rng is not None:
+                # Sorteios internos da simulação também vêm do fluxo do cenário
+                random.seed(int(rng.integers(2 ** 63)))
+            config_copy = base_config.copy()
+            config_copy["drones"] = new_drones
+            configs.append(config_copy)
+        if engine == "vectorized":
+            for b, (metrics, series) in zip(batch_ids, run_vectorized(configs, record_time_series, chunk_size)):
+                yield b, metrics, series
+            continue
+        temp_path = f"temp_config_batch_{start}.json"
+        with open(temp_path, "w") as f:
+            json.dump(configs[0], f, indent=4)
+        series = {} if record_time_series else None
+        metrics = run_simulation(temp_path, disable_visual=True, return_metrics=True, time_series=series, pool=pool)
+        # Os logs de cada execução já foram consumidos pelas métricas
+        del SIMULATION_LOGS[:]
+        yield start, metrics, series
+
+
+def run_batch_simulation(num_batches: int = 10, num_drones: int = 3, num_points: int = 5, config_path: str = "mission_config.json",
+                         keep_rows: bool = False, results_path: str = "batch_results", record_time_series: bool = False,
+                         report_runs: bool = True, ci_targets: Optional[Dict[str, float]] = None,
+                         max_batches: int = 200, min_batches: int = 5, confidence: float = 0.95,
+                         sampler: str = "uniform", seed: Optional[int] = None, engine: str = "bt",
+                         chunk_size: int = 256):
+    """
+    Executa `num_batches` simulações com rotas aleatórias e gera o relatório estatístico.
+    As estatísticas são atualizadas de forma incremental a cada execução (memória constante),
+    para qualquer número de drones; as linhas individuais só ficam em memória com `keep_rows=True`.
+    Cada execução é anexada ao armazenamento colunar `results_path` assim que termina (com a
+    série temporal por tick se `record_time_series=True`), e o relatório markdown é gerado a
+    partir dos dados armazenados.
+
+    Modo sequencial: com `ci_targets` ({métrica: semi-amplitude}, ex.: `DEFAULT_CI_TARGETS`),
+    `num_batches` é ignorado e as execuções continuam até que o intervalo de confiança da média
+    de todas as métricas-alvo fique dentro do alvo (após `min_batches`) ou até `max_batches`.
+    O número de execuções usadas e a convergência ficam em `aggregator.num_runs`/`aggregator.converged`
+    e no relatório.
+
+    Rotas: `sampler` escolhe o amostrador dos pontos ("uniform", "lhs" ou "sobol"). Com `seed`,
+    o cenário `b` usa o fluxo aleatório próprio (seed, b) — números aleatórios comuns: o Case 1 e
+    o Case 2 executados com a mesma `seed` recebem as mesmas rotas em cada cenário, o que permite
+    comparações pareadas.
+
+    Motor: `engine="bt"` executa cada cenário com `run_simulation` (Behavior Trees); com
+    `engine="vectorized"`, blocos de `chunk_size` cenários avançam juntos como arrays
+    (`vectorized.py`), com as mesmas métricas por execução e sem arquivos temporários.
+    """
+    sequential = ci_targets is not None
+    if sequential:
+        log_event(f"Iniciando Batch sequencial (alvos de IC {ci_targets}, máx. {max_batches} simulações).")
+    else:
+        log_event(f"Iniciando Batch de {num_batches} Simulações.")
     
     try:
         with open(config_path, 'r') as f:
@@ -217,56 +443,73 @@ def run_batch_simulation(num_batches: int = 10, num_drones: int = 3, num_points:
         log_event(f"Erro: Arquivo de configuração não encontrado em {config_path}")
         return
     
-    results = []
-    for b in range(1, num_batches + 1):
-        log_event(f"\n--- Simulação Batch {b}/{num_batches} ---")
-        new_drones = generate_random_patrol_config(num_drones, num_points)
-        config_copy = base_config.copy()
-        config_copy["drones"] = new_drones
-        temp_path = f"temp_config_batch_{b}.json"
-        with open(temp_path, "w") as f:
-            json.dump(config_copy, f, indent=4)
-        metrics = run_simulation(temp_path, disable_visual=True, return_metrics=True)
-        metrics["batch_id"] = b
-        results.append(metrics)
-    
-    df = pd.DataFrame(results)
-    summary = df.describe().loc[["mean", "std", "min", "max"]]
+    aggregator = BatchAggregator(keep_rows=keep_rows)
+    if sequential:
+        aggregator.converged = False
+    limit = max_batches if sequential else num_batches
+    runs = _batch_runs(base_config, limit, num_drones, num_points, sampler, seed, record_time_series, engine, chunk_size)
+    with ResultsSink(results_path) as sink:
+        for b, metrics, series in runs:
+            metrics["batch_id"] = b
+            aggregator.add(metrics)
+            if series is not None:
+                series["batch_id"][:] = b
+            sink.append(metrics, series)
+            if sequential and b >= min_batches and aggregator.meets_targets(ci_targets, confidence):
+                aggregator.converged = True
+                break
+        if sequential and not aggregator.converged:
+            log_event(f"⚠️ Alvos de IC não atingidos em {limit} simulações.")
+        elif sequential:
+            log_event(f"Alvos de IC atingidos após {aggregator.num_runs} simulações.")
     
-    # --- NOVO BLOCO DE RELATÓRIO DETALHADO ---
+    # --- RELATÓRIO (a partir dos dados armazenados) ---
+    stored = aggregate_results(sink.path)
     final_report = f"""
-# Relatório de Batch - {num_batches} Simulações de Patrulha Independente
+# Relatório de Batch - {stored.num_runs} Simulações de Patrulha Independente
+
+## Estatísticas Agregadas ({stored.num_runs} Simulações, {num_drones} Drones)
 
-## Estatísticas Agregadas ({num_batches} Simulações)
+Amostrador de rotas: `{sampler}`{f', semente {seed} (números aleatórios comuns)' if seed is not None else ''}.
 
-| Métrica | Média | Desvio Padrão | Mínimo | Máximo |
-| :--- | :--- | :--- | :--- | :--- |
-| **Cobertura Média da Área (%)** | {summary.loc['mean', 'area_coverage']:.2f} | {summary.loc['std', 'area_coverage']:.2f} | {summary.loc['min', 'area_coverage']:.2f} | {summary.loc['max', 'area_coverage']:.2f} |
-| **Redundância de Rota (%)** | {summary.loc['mean', 'route_redundancy']:.2f} | {summary.loc['std', 'route_redundancy']:.2f} | {summary.loc['min', 'route_redundancy']:.2f} | {summary.loc['max', 'route_redundancy']:.2f} |
-| **Recargas (D1) (Média)** | {summary.loc['mean', 'recharge_count_D1']:.2f} | {summary.loc['std', 'recharge_count_D1']:.2f} | {summary.loc['min', 'recharge_count_D1']:.2f} | {summary.loc['max', 'recharge_count_D1']:.2f} |
-| **Recargas (Total) (Média)** | {df[['recharge_count_D1', 'recharge_count_D2', 'recharge_count_D3']].sum(axis=1).mean():.2f} | - | - | - |
+{stored.summary_markdown()}
+"""
+    if sequential:
+        status = "atingidos" if aggregator.converged else f"não atingidos (limite de {max_batches})"
+        final_report += f"""
+## Critério de Parada Sequencial
+
+Execuções usadas: **{aggregator.num_runs}** (mínimo {min_batches}, máximo {max_batches}); alvos {status}.
 
+{aggregator.ci_markdown(ci_targets, confidence)}
+"""
+    if report_runs:
+        rows = []
+        per_drone_ids = None
+        for r in iter_rows(sink.path):
+            if per_drone_ids is None:
+                # Colunas por drone só entram na tabela individual para frotas pequenas
+                per_drone_ids = r['drone_ids'] if len(r['drone_ids']) <= 10 else []
+            counts = dict(zip(r['drone_ids'], r['recharge_counts']))
+            rows.append([r['batch_id'], r['area_coverage'], r['route_redundancy'], r['recharge_count_total']]
+                        + [counts.get(d, 0) for d in per_drone_ids])
+        headers = ['ID', 'Cobertura (%)', 'Redundância (%)', 'Recargas (Total)'] + [f"Recarga {d}" for d in per_drone_ids or []]
+        final_report += f"""
 ## Resultados Individuais por Simulação
 
-A tabela abaixo mostra os resultados detalhados de cada uma das {num_batches} execuções:
+A tabela abaixo mostra os resultados detalhados de cada uma das {stored.num_runs} execuções:
 
+{markdown_table(headers, rows)}
 """
-    # Adiciona a tabela individual
-    df_report = df[['batch_id', 'area_coverage', 'route_redundancy', 'recharge_count_D1', 'recharge_count_D2', 'recharge_count_D3']].copy()
-    df_report.columns = ['ID', 'Cobertura (%)', 'Redundância (%)', 'Recarga D1', 'Recarga D2', 'Recarga D3']
-    df_report['Cobertura (%)'] = df_report['Cobertura (%)'].apply(lambda x: f"{x:.2f}")
-    df_report['Redundância (%)'] = df_report['Redundância (%)'].apply(lambda x: f"{x:.2f}")
-    individual_table_markdown = df_report.to_markdown(index=False)
-    
-    final_report += individual_table_markdown
-    final_report += "\n\n## Dados Brutos (CSV)\n"
-    final_report += "Os dados brutos de todas as colunas estão salvos no arquivo `batch_simulation_results.csv`."
+    final_report += "\n## Dados Brutos\n"
+    final_report += f"Os dados brutos de todas as execuções estão salvos em formato colunar em `{sink.path}`."
+    if record_time_series:
+        final_report += f" A série temporal por tick está em `{sink.series_path}`."
     
-    df.to_csv("batch_simulation_results.csv", index=False)
     with open("relatorio_batch_case1.md", "w") as f:
         f.write(final_report)
     log_event("✅ Relatório de Batch gerado: relatorio_batch_case1.md")
-    return df
+    return aggregator
 
 
 # === EXECUÇÃO DIRETA ===
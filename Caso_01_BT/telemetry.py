@@ -0,0 +1,342 @@
+# src/core/telemetry.py
+
+import argparse
+import collections
+import json
+import selectors
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+from contracts import log_event
+
+# Casas decimais das posições e da bateria no fluxo (valores repetidos após o arredondamento não geram delta)
+POSITION_DECIMALS = 3
+BATTERY_DECIMALS = 1
+
+# Política para consumidores lentos: "downsample" descarta os deltas pendentes e envia só o
+# próximo keyframe; "drop" desconecta o cliente
+SLOW_CONSUMER_POLICIES = ("downsample", "drop")
+
+
+def _encode(message: Dict) -> bytes:
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+class _Client:
+    __slots__ = ("sock", "address", "queue", "buffer", "needs_keyframe", "skipped")
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.queue = collections.deque()   # mensagens codificadas ainda não enviadas
+        self.buffer = b""                  # parte não enviada da mensagem corrente
+        self.needs_keyframe = True
+        self.skipped = 0
+
+
+class TelemetryServer:
+    """
+    Publica o estado da frota, tick a tick, para clientes TCP locais (JSON por linha).
+
+    Cada tick gera uma mensagem `delta` só com os drones cujo estado (posição, bateria, status)
+    mudou desde o tick anterior, mais os eventos do MAS (contratos, coalizões, falhas,
+    replanejamentos). A cada `keyframe_interval` ticks, e para cada cliente que acaba de se
+    conectar ou que ficou para trás, vai um `keyframe` com a frota inteira. Cada delta traz o
+    `seq` da mensagem anterior (`base`), e o cliente só o aplica se estiver sincronizado.
+
+    O tick nunca bloqueia: `publish` só codifica a mensagem uma vez e a enfileira. Os envios
+    acontecem numa thread própria, com sockets não bloqueantes. Um cliente com mais de
+    `max_queue` mensagens pendentes é tratado pela política `slow_consumer`: em "downsample",
+    os deltas pendentes são descartados e ele recebe apenas o próximo keyframe; em "drop", ele
+    é desconectado.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, keyframe_interval: int = 50,
+                 max_queue: int = 64, slow_consumer: str = "downsample"):
+        if slow_consumer not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Política desconhecida para consumidores lentos: {slow_consumer!r}")
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.max_queue = max_queue
+        self.slow_consumer = slow_consumer
+        self.listener = socket.create_server((host, port))
+        self.listener.setblocking(False)
+        self.address = self.listener.getsockname()[:2]
+
+        self.seq = 0
+        self.tick = None
+        self.last: Dict[str, List] = {}        # último estado publicado de cada drone
+        self.pending_events: List[Dict] = []
+        self.stats = {"messages": 0, "keyframes": 0, "bytes": 0, "downsampled": 0, "dropped": 0}
+
+        self.clients: List[_Client] = []
+        self.lock = threading.Lock()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._running = True
+        self.thread = threading.Thread(target=self._serve, name="telemetry", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional["TelemetryServer"]:
+        """
+        Cria o servidor a partir da chave `telemetry` da configuração (None se ausente), ex.:
+        `{"host": "127.0.0.1", "port": 8765, "keyframe_interval": 50, "max_queue": 64,
+        "slow_consumer": "downsample"}`.
+        """
+        conf = config.get("telemetry")
+        if not conf:
+            return None
+        conf = conf if isinstance(conf, dict) else {}
+        server = cls(
+            host=conf.get("host", "127.0.0.1"),
+            port=conf.get("port", 0),
+            keyframe_interval=conf.get("keyframe_interval", 50),
+            max_queue=conf.get("max_queue", 64),
+            slow_consumer=conf.get("slow_consumer", "downsample"),
+        )
+        log_event(f"TELEMETRIA: publicando em {server.address[0]}:{server.address[1]}")
+        return server
+
+    # --- Lado da simulação ---
+    def event(self, kind: str, **data):
+        """Registra um evento (contrato, coalizão, falha...) para a próxima mensagem."""
+        self.pending_events.append({"type": kind, **data})
+
+    def publish(self, tick: int, states: Dict[str, Dict]):
+        """Publica o estado do tick (delta ou keyframe) e os eventos acumulados."""
+        current = {
+            drone_id: [round(s['position'][0], POSITION_DECIMALS), round(s['position'][1], POSITION_DECIMALS),
+                       round(s['battery'], BATTERY_DECIMALS), s['status']]
+            for drone_id, s in states.items()
+        }
+        base = self.seq
+        self.seq += 1
+        self.tick = tick
+        if not self.clients:
+            # Sem consumidores, nada é codificado: quem se conectar recebe um keyframe
+            self.last = current
+            self.pending_events = []
+            return
+        is_keyframe = base == 0 or tick % self.keyframe_interval == 0
+        if is_keyframe:
+            message = {"type": "keyframe", "seq": self.seq, "tick": tick, "drones": current}
+        else:
+            changed = {d: v for d, v in current.items() if self.last.get(d) != v}
+            removed = [d for d in self.last if d not in current]
+            message = {"type": "delta", "seq": self.seq, "base": base, "tick": tick, "drones": changed}
+            if removed:
+                message["removed"] = removed
+        events = self.pending_events
+        if events:
+            message["events"] = events
+            self.pending_events = []
+        self.last = current
+        data = _encode(message)
+        self.stats["keyframes"] += is_keyframe
+        self.stats["messages"] += 1
+        self.stats["bytes"] += len(data)
+        self._enqueue(data, is_keyframe, current, events)
+
+    def _enqueue(self, data: bytes, is_keyframe: bool, current: Dict[str, List], events: List[Dict]):
+        # Clientes novos ou que ficaram para trás recebem a frota inteira deste tick
+        resync = None
+        with self.lock:
+            for client in list(self.clients):
+                if client.needs_keyframe and not is_keyframe:
+                    if resync is None:
+                        message = {"type": "keyframe", "seq": self.seq, "tick": self.tick, "drones": current}
+                        if events:
+                            message["events"] = events
+                        resync = _encode(message)
+                    client.queue.append(resync)
+                    client.needs_keyframe = False
+                    continue
+                if len(client.queue) >= self.max_queue:
+                    if self.slow_consumer == "drop":
+                        self._disconnect(client, "fila cheia")
+                        self.stats["dropped"] += 1
+                        continue
+                    client.skipped += len(client.queue)
+                    client.queue.clear()
+                    client.needs_keyframe = True
+                    self.stats["downsampled"] += 1
+                    continue
+                client.queue.append(data)
+                client.needs_keyframe = False
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def close(self, timeout: float = 2.0):
+        """Envia o fim do fluxo, espera (até `timeout`) o envio do que está pendente e encerra."""
+        if not self._running:
+            return
+        end = _encode({"type": "end", "seq": self.seq + 1, "tick": self.tick})
+        with self.lock:
+            for client in self.clients:
+                client.queue.append(end)
+        self._wake()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if all(not c.queue and not c.buffer for c in self.clients):
+                    break
+            time.sleep(0.005)
+        self._running = False
+        self._wake()
+        self.thread.join(timeout)
+        with self.lock:
+            for client in list(self.clients):
+                self._disconnect(client, None)
+        self.listener.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    # --- Thread de envio ---
+    def _disconnect(self, client: _Client, reason: Optional[str]):
+        if reason:
+            log_event(f"TELEMETRIA: cliente {client.address[0]}:{client.address[1]} desconectado ({reason}).")
+        self.clients.remove(client)
+        try:
+            client.sock.close()
+        except OSError:
+            pass
+
+    def _serve(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.listener, selectors.EVENT_READ)
+        selector.register(self._wake_r, selectors.EVENT_READ)
+        while self._running:
+            for key, _ in selector.select(timeout=0.05):
+                if key.fileobj is self.listener:
+                    self._accept()
+                elif key.fileobj is self._wake_r:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+            self._flush()
+        selector.close()
+
+    def _accept(self):
+        try:
+            sock, address = self.listener.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.lock:
+            self.clients.append(_Client(sock, address))
+
+    def _flush(self):
+        with self.lock:
+            for client in list(self.clients):
+                try:
+                    while client.buffer or client.queue:
+                        if not client.buffer:
+                            client.buffer = client.queue.popleft()
+                        sent = client.sock.send(client.buffer)
+                        client.buffer = client.buffer[sent:]
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    self._disconnect(client, "conexão encerrada")
+
+
+class TelemetryClient:
+    """
+    Cliente de teste: reconstrói o estado da frota a partir dos keyframes e deltas.
+
+    `states` segue o formato de `DroneMissionInterface.states`. Deltas que não partem da última
+    mensagem aplicada (o servidor descartou mensagens deste cliente) são ignorados até o
+    próximo keyframe.
+    """
+    def __init__(self, host: str, port: int, timeout: Optional[float] = 10.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.file = self.sock.makefile("rb")
+        self.states: Dict[str, Dict] = {}
+        self.events: List[Dict] = []
+        self.seq = None
+        self.tick = None
+        self.synced = False
+        self.finished = False
+        self.stats = {"keyframes": 0, "deltas": 0, "ignored": 0, "bytes": 0}
+
+    def apply(self, message: Dict):
+        kind = message["type"]
+        if kind == "end":
+            self.finished = True
+            return
+        if kind == "keyframe":
+            self.states = {}
+            self.synced = True
+            self.stats["keyframes"] += 1
+        elif not self.synced or message.get("base") != self.seq:
+            self.synced = False
+            self.stats["ignored"] += 1
+            return
+        else:
+            self.stats["deltas"] += 1
+        for drone_id, (x, y, battery, status) in message["drones"].items():
+            self.states[drone_id] = {'battery': battery, 'position': (x, y), 'status': status}
+        for drone_id in message.get("removed", []):
+            self.states.pop(drone_id, None)
+        self.events.extend(message.get("events", []))
+        self.seq = message["seq"]
+        self.tick = message["tick"]
+
+    def receive(self) -> Optional[Dict]:
+        """Lê e aplica a próxima mensagem (None quando a conexão termina)."""
+        line = self.file.readline()
+        if not line.endswith(b"\n"):
+            # Conexão encerrada (possivelmente no meio de uma mensagem, se o cliente foi descartado)
+            self.finished = True
+            return None
+        self.stats["bytes"] += len(line)
+        message = json.loads(line)
+        self.apply(message)
+        return message
+
+    def run(self, delay: float = 0.0):
+        """Consome o fluxo até o fim; `delay` simula um consumidor lento."""
+        while not self.finished:
+            if self.receive() is not None and delay:
+                time.sleep(delay)
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def _main(argv=None):
+    parser = argparse.ArgumentParser(description="Cliente de teste da telemetria da frota")
+    parser.add_argument("address", help="host:porta do servidor (chave telemetry da configuração)")
+    parser.add_argument("--delay", type=float, default=0.0, help="Atraso por mensagem (simula consumidor lento)")
+    args = parser.parse_args(argv)
+    host, port = args.address.rsplit(":", 1)
+    client = TelemetryClient(host, int(port), timeout=None)
+    try:
+        while not client.finished:
+            message = client.receive()
+            if message is None or message["type"] == "end":
+                continue
+            for event in message.get("events", []):
+                print(f"tick {message['tick']}: evento {event}")
+            if args.delay:
+                time.sleep(args.delay)
+        print(f"Fim do fluxo no tick {client.tick}: {len(client.states)} drones, {client.stats}")
+        for drone_id, s in sorted(client.states.items()):
+            print(f"{drone_id:<8} ({s['position'][0]:6.2f}, {s['position'][1]:6.2f})  bateria {s['battery']:6.1f}  {s['status']}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    _main()
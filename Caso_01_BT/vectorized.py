@@ -0,0 +1,359 @@
+# src/core/vectorized.py
+
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from energy import EnergyModel
+from geofence import GeofenceEngine, DEFAULT_AREA_BOUNDS
+from metrics import grid_cells, pairwise_overlap, CoverageBitsets, RevisitTracker
+from results_store import build_time_series
+
+# Parâmetros do modelo de patrulha (os mesmos de behaviors.py)
+STEP_SIZE = 0.25
+BATTERY_DRAIN = 0.3
+LOW_BATTERY = 30
+WAYPOINT_RADIUS = 0.3
+BASE_POSITION = (0.0, 0.0)
+GRID_SIZE = 50
+
+# Chaves da configuração que precisam ser iguais em todas as execuções de um lote
+SHARED_KEYS = ("simulation_ticks", "area_bounds", "geofences", "geofence_cell_size", "separation_distance", "energy_model")
+
+
+class PatrolState:
+    """
+    Estado mutável do modelo de patrulha em arrays (B, D), com os drones no eixo 1: avança um
+    tick por `tick()`, no lote vetorizado e nas regiões do modo particionado (`sharding.py`).
+    """
+    # Campos por drone (eixo 1), recortados e concatenados nas transferências entre regiões
+    FIELDS = ("routes", "route_len", "exists", "return_energy", "pos", "battery", "idx", "running",
+              "patrolling", "recharges", "in_refuel", "charging", "charge_ticks", "refuel_ticks")
+
+    def __init__(self, routes: np.ndarray, route_len: np.ndarray, exists: np.ndarray, pos: np.ndarray,
+                 battery: np.ndarray, energy: Optional[EnergyModel] = None):
+        shape = exists.shape
+        self.energy = energy
+        self.routes, self.route_len, self.exists = routes, route_len, exists
+        self.pos, self.battery = pos, battery
+        self.idx = np.zeros(shape, dtype=np.int64)
+        self.running = np.zeros(shape, dtype=bool)       # Selector retomando a patrulha (RUNNING)
+        self.patrolling = np.zeros(shape, dtype=bool)    # em voo: status 'PATROL' ou 'RETURNING'
+        self.recharges = np.zeros(shape, dtype=np.int64)
+        self.in_refuel = np.zeros(shape, dtype=bool)     # sequência de retorno em andamento (modelo de energia)
+        self.charging = np.zeros(shape, dtype=bool)      # status 'REFUELING' (pousado na base)
+        self.charge_ticks = np.zeros(shape, dtype=np.int64)  # ticks desde o pouso (recarga em andamento)
+        self.refuel_ticks = np.zeros(shape, dtype=np.int64)  # soma das durações das recargas concluídas
+        self.return_energy = None
+        if energy is not None:
+            # Energia de retorno à base a partir de cada ponto (como a tabela de `assign_route`)
+            self.return_energy = energy.flight_cost(np.hypot(routes[..., 0] - energy.base[0], routes[..., 1] - energy.base[1]))
+
+    def tick(self):
+        """Um tick da BT de todos os drones: condição de bateria, passo da patrulha e reabastecimento."""
+        B, D = self.exists.shape
+        rows = np.arange(B)[:, None]
+        cols = np.arange(D)[None, :]
+        pos, battery, idx = self.pos, self.battery, self.idx
+        if self.energy is None:
+            # Selector reiniciando: a sequência de bateria baixa tem prioridade
+            refuel = self.exists & ~self.running & (battery < LOW_BATTERY)
+        else:
+            # Condição preditiva a cada tick: perna corrente + retorno a partir do alvo + reserva
+            k = idx % np.maximum(self.route_len, 1)
+            leg_target = self.routes[rows, cols, k]
+            needed = (self.energy.flight_cost(np.hypot(leg_target[..., 0] - pos[..., 0], leg_target[..., 1] - pos[..., 1]))
+                      + self.return_energy[rows, cols, k])
+            self.in_refuel |= self.exists & (self.route_len > 0) & (battery < needed + self.energy.reserve)
+            refuel = self.in_refuel
+        patrol = self.exists & ~refuel
+        lap_done = patrol & (self.route_len > 0) & (idx >= self.route_len)
+        moving = patrol & (idx < self.route_len)
+
+        target = self.routes[rows, cols, np.minimum(idx, self.routes.shape[2] - 1)]
+        dx = target[..., 0] - pos[..., 0]
+        dy = target[..., 1] - pos[..., 1]
+        course = np.radians(np.degrees(np.arctan2(dy, dx)))
+        pos[..., 0] = np.where(moving, pos[..., 0] + STEP_SIZE * np.cos(course), pos[..., 0])
+        pos[..., 1] = np.where(moving, pos[..., 1] + STEP_SIZE * np.sin(course), pos[..., 1])
+        battery[:] = np.where(moving, np.maximum(0, battery - BATTERY_DRAIN), battery)
+        idx += moving & (np.hypot(dx, dy) < WAYPOINT_RADIUS)
+        idx[lap_done] = 0
+
+        if self.energy is None:
+            pos[refuel] = BASE_POSITION
+            battery[refuel] = 100
+            self.recharges += refuel
+            self.patrolling = (self.patrolling | moving) & ~refuel
+        else:
+            flying = self._return_and_charge()
+            self.patrolling = np.where(refuel, flying, self.patrolling | moving)
+        self.running = moving
+
+    def _return_and_charge(self) -> np.ndarray:
+        """
+        Um tick de `Action_Refuel` com modelo de energia para os drones em retorno: voo até a
+        base (pouso quando a base está a até um passo) e recarga. Retorna a máscara dos que
+        continuam em voo.
+        """
+        energy, pos, battery = self.energy, self.pos, self.battery
+        returning = self.in_refuel & ~self.charging
+        charge = self.in_refuel & self.charging
+        dx = energy.base[0] - pos[..., 0]
+        dy = energy.base[1] - pos[..., 1]
+        land = returning & (np.hypot(dx, dy) <= energy.step_size)
+        fly = returning & ~land
+        course = np.arctan2(dy, dx)
+        pos[..., 0] = np.where(fly, pos[..., 0] + energy.step_size * np.cos(course), pos[..., 0])
+        pos[..., 1] = np.where(fly, pos[..., 1] + energy.step_size * np.sin(course), pos[..., 1])
+        pos[land] = energy.base
+        battery[:] = np.where(returning, np.maximum(0, battery - energy.drain), battery)
+        self.charging |= land
+        battery[:] = np.where(charge, np.minimum(energy.capacity, battery + energy.charge_rate), battery)
+        self.charge_ticks += charge
+        done = charge & (battery >= energy.capacity)
+        self.recharges += done
+        self.refuel_ticks += np.where(done, self.charge_ticks, 0)
+        self.charge_ticks[done] = 0
+        self.in_refuel &= ~done
+        self.charging &= ~done
+        return fly
+
+    def take(self, cols: np.ndarray) -> Dict[str, np.ndarray]:
+        """Campos por drone das colunas `cols` (cópias), para enviar a outra região."""
+        return {name: getattr(self, name)[:, cols].copy() for name in self.FIELDS if getattr(self, name) is not None}
+
+    def keep(self, cols: np.ndarray):
+        """Mantém só as colunas `cols`."""
+        for name in self.FIELDS:
+            if getattr(self, name) is not None:
+                setattr(self, name, getattr(self, name)[:, cols])
+
+    def extend(self, parts: Sequence[Dict[str, np.ndarray]]):
+        """Acrescenta drones recebidos (saídas de `take`) ao fim do eixo 1."""
+        if not parts:
+            return
+        for name in self.FIELDS:
+            if getattr(self, name) is not None:
+                setattr(self, name, np.concatenate([getattr(self, name)] + [p[name] for p in parts], axis=1))
+
+
+class VectorizedPatrolBatch:
+    """
+    Motor vetorizado do Case 1: B execuções independentes avançam juntas em arrays (B, drones).
+
+    Reproduz a árvore de comportamento de `behaviors.py` (Selector/Sequence com memória):
+    enquanto a patrulha está RUNNING o Selector retoma direto nela, e a bateria só é verificada
+    quando o Selector reinicia (início, fim de volta da rota ou após reabastecer). Com a chave
+    `energy_model`, a condição preditiva é avaliada a cada tick (Selector sem memória) e o
+    retorno/recarga dura vários ticks, como em `Action_Refuel`. O MAS do Case 1 não altera o
+    estado dos drones, então não participa do motor.
+
+    As execuções podem ter frotas e rotas de tamanhos diferentes (arrays preenchidos com
+    máscara), mas devem compartilhar as chaves de `SHARED_KEYS`. `run()` retorna, para cada
+    execução, o mesmo dicionário de métricas de `run_simulation(return_metrics=True)`.
+    """
+    def __init__(self, configs: Sequence[Dict], record_time_series: bool = False):
+        if not configs:
+            raise ValueError("O lote vetorizado precisa de ao menos uma configuração")
+        shared = {k: configs[0].get(k) for k in SHARED_KEYS}
+        for config in configs[1:]:
+            diff = [k for k in SHARED_KEYS if config.get(k) != shared[k]]
+            if diff:
+                raise ValueError(f"Configurações do lote vetorizado divergem em: {', '.join(diff)}")
+        base = configs[0]
+        self.ticks = base.get("simulation_ticks", 10)
+        self.area_bounds = tuple(base.get("area_bounds", DEFAULT_AREA_BOUNDS))
+        self.separation = base.get("separation_distance", 0.5)
+        self.geofence = GeofenceEngine.from_config(base)
+        self.energy = EnergyModel.from_config(base)
+        if self.energy is not None and (len(self.energy.network.bases) > 1
+                                        or any(b.slots is not None for b in self.energy.network.bases.values())):
+            # Filas das bases dependem da ordem dos drones no tick: ficam com o motor de Behavior Trees
+            raise ValueError("O motor vetorizado suporta uma única base sem limite de vagas; use engine='bt'")
+        self.record_time_series = record_time_series
+
+        self.drone_ids: List[List[str]] = []
+        routes: List[List[List[Tuple[float, float]]]] = []
+        initial: List[List[Tuple[float, float, float]]] = []
+        for config in configs:
+            ids, run_routes, run_initial = [], [], []
+            for drone_conf in config.get("drones", []):
+                ids.append(drone_conf["id"])
+                if drone_conf.get("route_type") == "random_patrol":
+                    route = [(random.uniform(1, 9), random.uniform(1, 9)) for _ in range(drone_conf.get("route_points", 3))]
+                elif drone_conf.get("route_type") == "fixed_patrol":
+                    route = [tuple(p) for p in drone_conf.get("route", [])]
+                else:
+                    route = []
+                run_routes.append(route)
+                x, y = drone_conf.get("initial_position", (0, 0))
+                run_initial.append((x, y, drone_conf.get("initial_battery", 100)))
+            self.drone_ids.append(ids)
+            routes.append(run_routes)
+            initial.append(run_initial)
+
+        self.B = len(configs)
+        self.D = max(1, max(len(ids) for ids in self.drone_ids))
+        P = max([1] + [len(r) for run in routes for r in run])
+        self.exists = np.zeros((self.B, self.D), dtype=bool)
+        self.route_len = np.zeros((self.B, self.D), dtype=np.int64)
+        self.routes = np.zeros((self.B, self.D, P, 2))
+        self.pos = np.zeros((self.B, self.D, 2))
+        self.battery = np.zeros((self.B, self.D))
+        for b in range(self.B):
+            for d, (route, (x, y, battery)) in enumerate(zip(routes[b], initial[b])):
+                self.exists[b, d] = True
+                self.route_len[b, d] = len(route)
+                if route:
+                    self.routes[b, d, :len(route)] = route
+                self.pos[b, d] = (x, y)
+                self.battery[b, d] = battery
+        self.route_lists = routes
+
+    def _cells(self, pos: np.ndarray) -> np.ndarray:
+        """Célula da grade de cobertura (índice linear) de cada posição, como em `metrics.py`."""
+        return grid_cells(pos, self.area_bounds, GRID_SIZE)
+
+    def run(self) -> List[Tuple[Dict, Optional[Dict[str, np.ndarray]]]]:
+        """Executa todos os ticks e retorna [(métricas, série temporal ou None)] por execução."""
+        B, D = self.B, self.D
+        state = PatrolState(self.routes, self.route_len, self.exists, self.pos, self.battery, self.energy)
+        pos, battery = state.pos, state.battery
+
+        cells = np.empty((self.ticks + 1, B, D), dtype=np.int64)
+        cells[0] = self._cells(pos)
+        revisit = RevisitTracker(self.area_bounds, GRID_SIZE, runs=B)
+        run_offset = np.arange(B)[:, None] * (GRID_SIZE * GRID_SIZE)
+        revisit.update_cells(0, (run_offset + cells[0])[self.exists])
+        if self.record_time_series:
+            pos_history = np.empty((self.ticks + 1, B, D, 2))
+            battery_history = np.empty((self.ticks + 1, B, D))
+            pos_history[0], battery_history[0] = pos, battery
+
+        a, c = np.triu_indices(D, k=1)
+        active_pairs = np.zeros((B, len(a)), dtype=bool)
+        conflicts = np.zeros(B, dtype=np.int64)
+        violations = self._route_violations()
+        active_out = np.zeros((B, D), dtype=bool)
+        active_zone = np.zeros((B * D, len(self.geofence.zones)), dtype=bool)
+
+        for t in range(self.ticks):
+            state.tick()
+
+            cells[t + 1] = self._cells(pos)
+            revisit.update_cells(t + 1, (run_offset + cells[t + 1])[self.exists])
+            if self.record_time_series:
+                pos_history[t + 1], battery_history[t + 1] = pos, battery
+
+            # Separação: pares em patrulha a até `separation`, contados no início do conflito
+            if len(a):
+                dist = np.hypot(pos[:, a, 0] - pos[:, c, 0], pos[:, a, 1] - pos[:, c, 1])
+                current = (dist <= self.separation) & state.patrolling[:, a] & state.patrolling[:, c]
+                conflicts += (current & ~active_pairs).sum(axis=1)
+                active_pairs = current
+
+            # Geofence por posição (fora da área e zonas no-fly), também contada no início
+            out, point_idx, zone_idx = self.geofence.position_violations(pos.reshape(-1, 2))
+            out = out.reshape(B, D) & self.exists
+            violations += (out & ~active_out).sum(axis=1)
+            active_out = out
+            if active_zone.shape[1]:
+                current_zone = np.zeros_like(active_zone)
+                current_zone[point_idx, zone_idx] = True
+                current_zone &= self.exists.reshape(-1, 1)
+                violations += (current_zone & ~active_zone).reshape(B, -1).sum(axis=1)
+                active_zone = current_zone
+
+        coverage, redundancy, overlap_max = self._coverage(cells)
+        revisit_summary = revisit.summary()
+        results = []
+        for b in range(B):
+            metrics = {
+                "area_coverage": coverage[b],
+                "route_redundancy": redundancy[b],
+                "separation_conflicts": int(conflicts[b]),
+                "geofence_violations": int(violations[b]),
+                **revisit_summary[b],
+                "pairwise_overlap_max": float(overlap_max[b]),
+            }
+            if self.energy is not None:
+                metrics.update(base_metrics(self.energy, int(state.recharges[b].sum()), int(state.refuel_ticks[b].sum())))
+            metrics.update({f"recharge_count_{d}": int(state.recharges[b, k]) for k, d in enumerate(self.drone_ids[b])})
+            series = None
+            if self.record_time_series:
+                series = build_time_series(
+                    0,
+                    {d: pos_history[:, b, k] for k, d in enumerate(self.drone_ids[b])},
+                    {d: battery_history[:, b, k] for k, d in enumerate(self.drone_ids[b])},
+                )
+            results.append((metrics, series))
+        return results
+
+    def _coverage(self, cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cobertura, redundância e maior sobreposição entre pares de todas as execuções (células
+        distintas por drone, depois drones por célula; pares via bitsets como em `CoverageBitsets`).
+        """
+        B, D = self.B, self.D
+        G2 = GRID_SIZE * GRID_SIZE
+        run_drone = (np.arange(B)[:, None] * D + np.arange(D)[None, :])[None, :, :]
+        keys = np.unique((run_drone * G2 + cells)[:, self.exists])
+        run_cell, drones_per_cell = np.unique((keys // (D * G2)) * G2 + keys % G2, return_counts=True)
+        run = run_cell // G2
+        visited = np.bincount(run, minlength=B)
+        redundant = np.bincount(run[drones_per_cell > 1], minlength=B)
+        coverage = (visited / G2) * 100.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            redundancy = np.where(visited > 0, (redundant / visited) * 100.0, 0.0)
+        bits = np.zeros((B * D, -(-G2 // 64) * 8), dtype=np.uint8)
+        row, cell = keys // G2, keys % G2
+        np.bitwise_or.at(bits, (row, cell >> 3), (128 >> (cell & 7)).astype(np.uint8))
+        fraction = CoverageBitsets.overlap_fraction(pairwise_overlap(bits.reshape(B, D, -1)))
+        overlap_max = fraction.reshape(B, -1).max(axis=1)
+        return coverage, redundancy, overlap_max
+
+    def _route_violations(self) -> np.ndarray:
+        """Violações das pernas das rotas contra zonas no-fly (verificação do tick 0)."""
+        violations = np.zeros(self.B, dtype=np.int64)
+        if not self.geofence.zones:
+            return violations
+        owners, starts, ends = [], [], []
+        for b, run_routes in enumerate(self.route_lists):
+            for d, route in enumerate(run_routes):
+                for p, q in zip(route, route[1:] + route[:1]):
+                    owners.append(b * self.D + d)
+                    starts.append(p)
+                    ends.append(q)
+        if not owners:
+            return violations
+        seg_idx, zone_idx = self.geofence.segment_violations(np.array(starts), np.array(ends))
+        # Cada par (drone, zona) conta uma vez, como no conjunto de eventos do GeofenceEngine
+        pairs = np.unique(np.asarray(owners)[seg_idx] * len(self.geofence.zones) + zone_idx)
+        np.add.at(violations, pairs // len(self.geofence.zones) // self.D, 1)
+        return violations
+
+
+def base_metrics(energy: EnergyModel, charges: int, refuel_ticks: int) -> Dict[str, float]:
+    """
+    Métricas de `BaseNetwork.summary()` para a base única sem limite de vagas dos motores em
+    arrays: não há fila, e a duração vai do pouso à bateria cheia.
+    """
+    metrics = {
+        "base_charges_total": charges,
+        "base_queue_wait_mean": 0.0,
+        "base_queue_wait_max": 0.0,
+        "refuel_duration_mean": float(refuel_ticks / charges) if charges else 0.0,
+    }
+    metrics.update({f"base_throughput_{base_id}": charges for base_id in energy.network.bases})
+    return metrics
+
+
+def run_vectorized(configs: Sequence[Dict], record_time_series: bool = False,
+                   chunk_size: int = 1024) -> List[Tuple[Dict, Optional[Dict[str, np.ndarray]]]]:
+    """Executa as configurações em lotes vetorizados de até `chunk_size` execuções."""
+    results = []
+    for start in range(0, len(configs), chunk_size):
+        results.extend(VectorizedPatrolBatch(configs[start:start + chunk_size], record_time_series).run())
+    return results
@@ -0,0 +1,351 @@
+# src/workqueue.py
+
+import argparse
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from aggregation import BatchAggregator
+from contracts import log_event, SIMULATION_LOGS
+from sweep import CASE_ID, ParameterSweep, ResultCache, _json_default, aggregate_by_point, sweep_markdown
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (namespace, state);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    worker TEXT,
+    entry TEXT NOT NULL,
+    finished REAL NOT NULL
+);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Fila de trabalho de varreduras em um arquivo SQLite compartilhado entre coordenador e workers.
+
+    Cada tarefa é um ponto da varredura, identificado pela chave de conteúdo de `sweep.py`
+    (configuração + semente + caso de estudo). Publicar de novo um ponto já existente não tem
+    efeito. Um worker obtém uma tarefa por `lease`, que a reserva por `lease_seconds`; se o
+    worker cair, a reserva expira e a tarefa volta para a fila (até `max_attempts` reservas,
+    depois fica como 'failed'). Os resultados são gravados uma única vez por chave: um
+    resultado atrasado de uma reserva expirada, ou uma tarefa executada duas vezes, não duplica
+    nada. A primeira gravação vale, e as execuções são determinísticas pela semente.
+
+    O arquivo pode estar num diretório compartilhado entre nós. Os prazos usam o relógio de
+    parede, então os relógios dos nós devem estar sincronizados.
+    """
+    def __init__(self, path: str = "sweep_queue.db", lease_seconds: float = 600.0, max_attempts: int = 3,
+                 namespace: str = CASE_ID):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.namespace = namespace
+        # Transações explícitas (BEGIN IMMEDIATE) em vez das implícitas do módulo sqlite3
+        # (diário padrão do SQLite: o modo WAL não funciona com o arquivo em sistema de arquivos de rede)
+        self.conn = sqlite3.connect(path, timeout=60.0, isolation_level=None)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def _expire_leases(self, now: Optional[float] = None):
+        """Encerra como 'failed' as reservas expiradas que já esgotaram as `max_attempts` tentativas."""
+        self.conn.execute(
+            "UPDATE tasks SET state = 'failed', error = 'reserva expirada', worker = NULL "
+            "WHERE namespace = ? AND state = 'leased' AND lease_until < ? AND attempts >= ?",
+            (self.namespace, time.time() if now is None else now, self.max_attempts))
+
+    def publish(self, tasks: Iterator[Dict]) -> List[str]:
+        """Publica as tarefas {key, params, seed, config} (idempotente) e retorna as chaves, na ordem."""
+        keys, rows = [], []
+        for task in tasks:
+            keys.append(task["key"])
+            payload = json.dumps({"params": task["params"], "seed": task["seed"], "config": task["config"]},
+                                 default=_json_default)
+            rows.append((task["key"], self.namespace, payload))
+        self._transaction()
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO tasks (key, namespace, payload) VALUES (?, ?, ?)", rows)
+            added = self.conn.total_changes - before
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        log_event(f"FILA: {len(rows)} pontos publicados ({added} novos) em {self.path}.")
+        return keys
+
+    def lease(self, worker: str) -> Optional[Dict]:
+        """
+        Reserva a próxima tarefa pendente (ou com reserva expirada) do caso de estudo. Retorna
+        {key, params, seed, config, attempt} ou None se não houver tarefa disponível.
+        """
+        now = time.time()
+        self._transaction()
+        try:
+            self._expire_leases(now)
+            row = self.conn.execute(
+                "SELECT key, payload, attempts, worker FROM tasks WHERE namespace = ? AND "
+                "(state = 'pending' OR (state = 'leased' AND lease_until < ?)) ORDER BY rowid LIMIT 1",
+                (self.namespace, now)).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            key, payload, attempts, previous = row
+            self.conn.execute(
+                "UPDATE tasks SET state = 'leased', attempts = ?, worker = ?, lease_until = ? WHERE key = ?",
+                (attempts + 1, worker, now + self.lease_seconds, key))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if previous is not None:
+            log_event(f"FILA: reserva de {previous} expirou; tarefa {key[:12]} reatribuída a {worker} "
+                      f"(tentativa {attempts + 1}).")
+        return dict(json.loads(payload), key=key, attempt=attempts + 1)
+
+    def renew(self, key: str, worker: str, attempt: int) -> bool:
+        """Estende a reserva ainda válida de `worker`; False se ela já foi perdida."""
+        cursor = self.conn.execute(
+            "UPDATE tasks SET lease_until = ? WHERE key = ? AND state = 'leased' AND worker = ? AND attempts = ?",
+            (time.time() + self.lease_seconds, key, worker, attempt))
+        return cursor.rowcount == 1
+
+    def complete(self, key: str, worker: str, entry: Dict) -> bool:
+        """Grava o resultado (apenas o primeiro por chave) e encerra a tarefa. True se este foi gravado."""
+        self._transaction()
+        try:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO results (key, worker, entry, finished) VALUES (?, ?, ?, ?)",
+                (key, worker, json.dumps(entry, default=_json_default), time.time()))
+            stored = cursor.rowcount == 1
+            self.conn.execute("UPDATE tasks SET state = 'done', lease_until = NULL, error = NULL WHERE key = ?", (key,))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return stored
+
+    def fail(self, key: str, worker: str, attempt: int, error: str):
+        """Devolve a tarefa à fila após um erro, ou a encerra como 'failed' após `max_attempts`."""
+        self.conn.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "worker = NULL, lease_until = NULL, error = ? "
+            "WHERE key = ? AND state = 'leased' AND worker = ? AND attempts = ?",
+            (self.max_attempts, error, key, worker, attempt))
+
+    def results(self, keys: Sequence[str]) -> Dict[str, Dict]:
+        """Resultados gravados entre `keys`: {chave: entrada}."""
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(f"SELECT key, entry FROM results WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            found.update((key, json.loads(entry)) for key, entry in rows)
+        return found
+
+    def failed(self, keys: Sequence[str]) -> Dict[str, str]:
+        """
+        Tarefas encerradas sem resultado entre `keys`: {chave: erro}. Inclui as reservas
+        expiradas na última tentativa, mesmo sem nenhum worker para reservar de novo.
+        """
+        self._expire_leases()
+        wanted = set(keys)
+        rows = self.conn.execute("SELECT key, error FROM tasks WHERE namespace = ? AND state = 'failed'", (self.namespace,))
+        return {key: error for key, error in rows if key in wanted}
+
+    def status(self) -> Dict[str, int]:
+        """Número de tarefas do caso de estudo em cada estado."""
+        self._expire_leases()
+        rows = self.conn.execute("SELECT state, COUNT(*) FROM tasks WHERE namespace = ? GROUP BY state", (self.namespace,))
+        return dict(rows.fetchall())
+
+
+class _LeaseHeartbeat(threading.Thread):
+    """Renova a reserva de uma tarefa enquanto a simulação roda (conexão SQLite própria)."""
+    def __init__(self, queue: WorkQueue, task: Dict, worker: str):
+        super().__init__(daemon=True)
+        self.args = (queue.path, queue.lease_seconds, queue.max_attempts, queue.namespace)
+        self.task, self.worker = task, worker
+        self.stopped = threading.Event()
+
+    def run(self):
+        path, lease_seconds, max_attempts, namespace = self.args
+        queue = WorkQueue(path, lease_seconds, max_attempts, namespace)
+        try:
+            while not self.stopped.wait(lease_seconds / 3):
+                if not queue.renew(self.task["key"], self.worker, self.task["attempt"]):
+                    log_event(f"FILA: reserva da tarefa {self.task['key'][:12]} perdida por {self.worker}.")
+                    break
+        finally:
+            queue.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_worker(queue: WorkQueue, worker: Optional[str] = None, runner: Optional[Callable] = None,
+               max_tasks: Optional[int] = None, wait_seconds: float = 0.0, poll_seconds: float = 2.0) -> int:
+    """
+    Laço de um worker: reserva tarefas, executa `runner` (padrão: `run_simulation` do caso de
+    estudo) e grava as métricas, como em `ParameterSweep.run`. Termina após `max_tasks` tarefas
+    ou quando a fila fica vazia por `wait_seconds`. Retorna o número de tarefas concluídas.
+    """
+    if runner is None:
+        from simulation import run_simulation
+        runner = run_simulation
+    worker = worker or default_worker_id()
+    done = 0
+    idle_since = time.time()
+    while max_tasks is None or done < max_tasks:
+        task = queue.lease(worker)
+        if task is None:
+            if time.time() - idle_since >= wait_seconds:
+                break
+            time.sleep(poll_seconds)
+            continue
+        heartbeat = _LeaseHeartbeat(queue, task, worker)
+        heartbeat.start()
+        try:
+            random.seed(task["seed"])
+            metrics = runner(task["config"], disable_visual=True, return_metrics=True)
+            if metrics is None:
+                raise RuntimeError("a simulação não retornou métricas")
+        except Exception as e:
+            queue.fail(task["key"], worker, task["attempt"], repr(e))
+            log_event(f"FILA: tarefa {task['key'][:12]} falhou em {worker}: {e!r}")
+            continue
+        finally:
+            heartbeat.stop()
+            # Os logs de cada execução já foram consumidos pelas métricas
+            del SIMULATION_LOGS[:]
+        entry = {"key": task["key"], "params": task["params"], "seed": task["seed"], "metrics": metrics}
+        queue.complete(task["key"], worker, entry)
+        done += 1
+        idle_since = time.time()
+    log_event(f"FILA: worker {worker} encerrado após {done} tarefas.")
+    return done
+
+
+def collect(queue: WorkQueue, keys: Sequence[str], cache: Optional[ResultCache] = None, wait: bool = True,
+            poll_seconds: float = 5.0, timeout: Optional[float] = None) -> List[Dict]:
+    """
+    Coordenador: aguarda os resultados de `keys` (até todos chegarem ou falharem, ou `timeout`)
+    e os retorna na ordem das chaves, no formato de `ParameterSweep.run`. Com `cache`, os
+    resultados também são gravados no cache local da varredura.
+    """
+    start = time.time()
+    found: Dict[str, Dict] = {}
+    failed: Dict[str, str] = {}
+    reported = -1
+    while True:
+        missing = [k for k in keys if k not in found]
+        found.update(queue.results(missing))
+        failed = queue.failed([k for k in keys if k not in found])
+        if len(found) != reported:
+            reported = len(found)
+            log_event(f"FILA: {len(found)}/{len(keys)} pontos concluídos ({len(failed)} com falha).")
+        if len(found) + len(failed) >= len(keys) or not wait or (timeout is not None and time.time() - start >= timeout):
+            break
+        time.sleep(poll_seconds)
+    for key, error in failed.items():
+        log_event(f"⚠️ FILA: tarefa {key[:12]} falhou: {error}")
+    results = []
+    for key in keys:
+        entry = found.get(key)
+        if entry is None:
+            continue
+        if cache is not None and key not in cache:
+            cache.put(key, entry)
+        results.append(dict(entry, cached=False))
+    return results
+
+
+def publish_sweep(sweep: ParameterSweep, queue: WorkQueue, cache: Optional[ResultCache] = None) -> List[str]:
+    """
+    Publica os pontos da varredura e retorna as chaves na ordem da varredura. Pontos que já
+    estão no cache local entram direto como resultados, sem nova execução.
+    """
+    tasks = list(sweep.tasks())
+    if cache is not None:
+        for task in tasks:
+            entry = cache.get(task["key"])
+            if entry is not None:
+                queue.complete(task["key"], "cache", {k: entry[k] for k in ("key", "params", "seed", "metrics")})
+    queue.publish(t for t in tasks if cache is None or t["key"] not in cache)
+    return [t["key"] for t in tasks]
+
+
+def run_distributed_sweep(grid: Dict[str, Sequence], seeds: Sequence[int] = (0,), config_path: str = "mission_config.json",
+                          queue_path: str = "sweep_queue.db", cache_dir: Optional[str] = ".sweep_cache",
+                          report_path: Optional[str] = None, lease_seconds: float = 600.0,
+                          local_worker: bool = False, timeout: Optional[float] = None) -> Dict[str, BatchAggregator]:
+    """
+    Atalho do coordenador, como `run_sweep`: publica a varredura na fila `queue_path`, espera
+    os resultados dos workers (`python workqueue.py worker <fila>` em cada nó) e agrega. Com
+    `local_worker`, o próprio coordenador também consome a fila antes de esperar.
+    """
+    with open(config_path, "r") as f:
+        base_config = json.load(f)
+    sweep = ParameterSweep(grid, seeds, base_config)
+    cache = ResultCache(cache_dir) if cache_dir else None
+    with WorkQueue(queue_path, lease_seconds) as queue:
+        keys = publish_sweep(sweep, queue, cache)
+        if local_worker:
+            run_worker(queue, worker=f"{default_worker_id()}:coordenador")
+        results = collect(queue, keys, cache, timeout=timeout)
+    groups = aggregate_by_point(results)
+    if report_path:
+        with open(report_path, "w") as f:
+            f.write(f"# Relatório de Varredura de Parâmetros - {CASE_ID}\n\n{sweep_markdown(groups)}\n")
+        log_event(f"✅ Relatório de varredura gerado: {report_path}")
+    return groups
+
+
+def _main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker e status da fila de varreduras distribuídas")
+    parser.add_argument("command", choices=("worker", "status"))
+    parser.add_argument("queue", help="Arquivo SQLite da fila (compartilhado entre os nós)")
+    parser.add_argument("--lease", type=float, default=600.0, help="Duração da reserva de uma tarefa (s)")
+    parser.add_argument("--max-tasks", type=int, default=None, help="Encerra após N tarefas")
+    parser.add_argument("--wait", type=float, default=0.0, help="Espera por novas tarefas com a fila vazia (s)")
+    args = parser.parse_args(argv)
+    with WorkQueue(args.queue, args.lease) as queue:
+        if args.command == "worker":
+            run_worker(queue, max_tasks=args.max_tasks, wait_seconds=args.wait)
+        else:
+            print(f"{CASE_ID}: {queue.status()}")
+
+
+if __name__ == "__main__":
+    _main()
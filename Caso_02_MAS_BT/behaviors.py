@@ -35,6 +35,11 @@ class PIDControllerCourse:
         self.integral_course = 0.0
         self.error_previous_course = 0.0
 
+    def reset(self):
+        """Zera o integrador e o erro anterior."""
+        self.integral_course = 0.0
+        self.error_previous_course = 0.0
+
     def calculate(self, reference, value):
         if value < 0.0:
             value += 360.0
@@ -60,12 +65,29 @@ class PIDControllerCourse:
 # === Condições e Ações do Behavior Tree ===
 
 class Condition_Low_Battery(py_trees.behaviour.Behaviour):
-    def __init__(self, drone_id: str, interface: DroneMissionInterface):
+    """
+    Sem modelo de energia na interface: bateria abaixo de 30%. Com o modelo, retorno preditivo:
+    a bateria não cobre a perna corrente da patrulha (`patrol.index`), o retorno à base a partir
+    do alvo e a reserva.
+    """
+    def __init__(self, drone_id: str, interface: DroneMissionInterface, patrol=None):
         super().__init__("LowBattery?")
         self.drone_id = drone_id
         self.interface = interface
+        self.patrol = patrol
 
     def update(self):
+        model = self.interface.energy_model
+        if model is not None:
+            state = self.interface.get_state(self.drone_id)
+            needed = self.interface.energy_to_return(self.drone_id, self.patrol.index if self.patrol is not None else 0)
+            if state['status'] == 'FAILURE' or needed is None:
+                return py_trees.common.Status.FAILURE
+            if state['battery'] < needed + model.reserve:
+                log_event(f"BT: Drone {self.drone_id} retorna à base: bateria {state['battery']:.1f}% < "
+                          f"{needed + model.reserve:.1f}% previstos (perna + retorno + reserva).")
+                return py_trees.common.Status.SUCCESS
+            return py_trees.common.Status.FAILURE
         b = self.interface.get_state(self.drone_id)['battery']
         if b < 30:
             log_event(f"BT: Drone {self.drone_id} com bateria baixa ({b}%).")
@@ -74,6 +96,12 @@ class Condition_Low_Battery(py_trees.behaviour.Behaviour):
 
 
 class Action_Refuel(py_trees.behaviour.Behaviour):
+    """
+    Sem modelo de energia: teletransporte para a base com 100% no mesmo tick. Com o modelo, o
+    drone voa até a base escolhida pela rede de bases (RETURNING, consumindo bateria), pousa,
+    espera vaga se a base estiver cheia e recarrega `charge_rate` por tick (REFUELING); retorna
+    SUCCESS quando a bateria chega a `capacity`.
+    """
     def __init__(self, drone_id: str, interface: DroneMissionInterface, skywalker: MockPyFly):
         super().__init__("Refuel")
         self.drone_id = drone_id
@@ -81,11 +109,53 @@ class Action_Refuel(py_trees.behaviour.Behaviour):
         self.skywalker = skywalker
 
     def update(self):
+        model = self.interface.energy_model
+        if model is not None:
+            return self._return_and_charge(model)
         self.skywalker.reset()
         self.interface.update_drone_state(self.drone_id, 100, (0, 0), status='IDLE')
         log_event(f"BT: Drone {self.drone_id} REABASTECIDO na base (0, 0).")
         return py_trees.common.Status.SUCCESS
 
+    def _return_and_charge(self, model):
+        state = self.interface.get_state(self.drone_id)
+        network = model.network
+        if state['status'] == 'FAILURE':
+            network.leave(self.drone_id)
+            return py_trees.common.Status.FAILURE
+        base = network.base_of(self.drone_id)
+        if base is None:
+            # Início do retorno: base mais próxima com vaga que a bateria alcança
+            base = network.assign(self.drone_id, state['position'],
+                                  reachable=state['battery'] / model.drain * model.step_size)
+        if state['status'] != 'REFUELING':
+            pos = state['position']
+            dx, dy = base.position[0] - pos[0], base.position[1] - pos[1]
+            battery = max(0, state['battery'] - model.drain)
+            if math.hypot(dx, dy) <= model.step_size:
+                self.skywalker.reset()
+                self.interface.update_drone_state(self.drone_id, battery=battery, position=base.position, status='REFUELING')
+                log_event(f"BT: Drone {self.drone_id} pousou na base {base.id} {base.position} com {battery:.1f}% de bateria.")
+                network.arrive(self.drone_id)
+            else:
+                course = math.atan2(dy, dx)
+                new_pos = (pos[0] + model.step_size * math.cos(course), pos[1] + model.step_size * math.sin(course))
+                self.interface.update_drone_state(self.drone_id, battery=battery, position=new_pos, status='RETURNING')
+                self.skywalker.set_control(roll=0, pitch=0, throttle=0.7, rudder=0)
+                self.skywalker.update()
+            return py_trees.common.Status.RUNNING
+        if not network.is_charging(self.drone_id):
+            # Na fila da base: aguarda uma vaga sem recarregar
+            return py_trees.common.Status.RUNNING
+        battery = min(model.capacity, state['battery'] + model.charge_rate)
+        if battery < model.capacity:
+            self.interface.update_drone_state(self.drone_id, battery=battery, position=state['position'], status='REFUELING')
+            return py_trees.common.Status.RUNNING
+        self.interface.update_drone_state(self.drone_id, battery=battery, position=state['position'], status='IDLE')
+        log_event(f"BT: Drone {self.drone_id} REABASTECIDO na base {base.id} {base.position}.")
+        network.release(self.drone_id)
+        return py_trees.common.Status.SUCCESS
+
 
 class Action_Patrol(py_trees.behaviour.Behaviour):
     def __init__(self, drone_id: str, interface: DroneMissionInterface, skywalker: MockPyFly):
@@ -112,13 +182,15 @@ class Action_Patrol(py_trees.behaviour.Behaviour):
         if not points:
             return py_trees.common.Status.FAILURE
 
-        if self.index >= len(points):
+        # Aproximação (percorrida uma única vez) antes de entrar no laço da patrulha
+        approach = mission.get("approach")
+        if not approach and self.index >= len(points):
             log_event(f"BT: Drone {self.drone_id} completou a patrulha. Reiniciando.")
             self.index = 0
             return py_trees.common.Status.SUCCESS
 
         pos = self.interface.get_position(self.drone_id)
-        target = points[self.index]
+        target = approach[0] if approach else points[self.index]
         dx, dy = target[0] - pos[0], target[1] - pos[1]
 
         desired_course = math.degrees(math.atan2(dy, dx))
@@ -136,24 +208,61 @@ class Action_Patrol(py_trees.behaviour.Behaviour):
         self.skywalker.update()
 
         if math.hypot(dx, dy) < 0.3:
-            log_event(f"BT: Drone {self.drone_id} chegou ao ponto {self.index + 1}/{len(points)}.")
-            self.index += 1
+            if approach:
+                approach.pop(0)
+                if not approach:
+                    log_event(f"BT: Drone {self.drone_id} concluiu a aproximação. Iniciando a patrulha.")
+                    self.index = 0
+            else:
+                log_event(f"BT: Drone {self.drone_id} chegou ao ponto {self.index + 1}/{len(points)}.")
+                self.index += 1
 
         return py_trees.common.Status.RUNNING
 
 
 # === Montagem da Árvore de Comportamento ===
 def create_behavior_tree(drone_id: str, interface: DroneMissionInterface, skywalker: MockPyFly) -> py_trees.trees.BehaviourTree:
-    root = py_trees.composites.Selector("RootSelector", memory=True)
+    # Com o modelo de energia, a condição de retorno é reavaliada a cada tick (Selector sem memória),
+    # interrompendo a patrulha no meio da perna; a sequência de retorno mantém a memória
+    root = py_trees.composites.Selector("RootSelector", memory=interface.energy_model is None)
+
+    patrol_action = Action_Patrol(drone_id, interface, skywalker)
 
     low_batt_seq = py_trees.composites.Sequence("LowBatterySeq", memory=True)
     low_batt_seq.add_children([
-        Condition_Low_Battery(drone_id, interface),
+        Condition_Low_Battery(drone_id, interface, patrol=patrol_action),
         Action_Refuel(drone_id, interface, skywalker)
     ])
 
-    patrol_action = Action_Patrol(drone_id, interface, skywalker)
-
     root.add_children([low_batt_seq, patrol_action])
 
-    return py_trees.trees.BehaviourTree(root)
\ No newline at end of file
+    return py_trees.trees.BehaviourTree(root)
+
+
+def patrol_node(tree: py_trees.trees.BehaviourTree) -> Action_Patrol:
+    """Nó de patrulha da árvore (guarda o índice do próximo ponto da rota)."""
+    return next(node for node in tree.root.iterate() if isinstance(node, Action_Patrol))
+
+
+def reset_behavior_tree(tree: py_trees.trees.BehaviourTree, drone_id: str, interface: DroneMissionInterface,
+                        skywalker: MockPyFly) -> py_trees.trees.BehaviourTree:
+    """
+    Prepara uma árvore já construída para uma nova execução, sem reconstruí-la: todos os nós
+    voltam a INVALID (compostos sem filho corrente), são religados ao drone/interface/MockPyFly
+    informados, e o índice da patrulha e o PID são zerados.
+    """
+    tree.root.stop(py_trees.common.Status.INVALID)
+    tree.root.memory = interface.energy_model is None
+    tree.count = 0
+    for node in tree.root.iterate():
+        if node.status != py_trees.common.Status.INVALID:
+            node.stop(py_trees.common.Status.INVALID)
+        if hasattr(node, "drone_id"):
+            node.drone_id = drone_id
+            node.interface = interface
+        if hasattr(node, "skywalker"):
+            node.skywalker = skywalker
+        if isinstance(node, Action_Patrol):
+            node.index = 0
+            node.pid_controller.reset()
+    return tree
@@ -0,0 +1,158 @@
+# src/core/failures.py
+
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from contracts import log_event
+
+
+def _duration_sampler(spec, rng: np.random.Generator):
+    """Durações em ticks: número fixo, intervalo [mín, máx] uniforme ou None (sem reparo)."""
+    if spec is None:
+        return None
+    if isinstance(spec, (int, float)):
+        return lambda size: np.full(size, int(spec), dtype=np.int64)
+    low, high = spec
+    return lambda size: rng.integers(int(low), int(high) + 1, size=size)
+
+
+def generate_hazard_failures(drone_ids: Sequence[str], ticks: int, rng: np.random.Generator,
+                             hazard_rate: float = 0.0, hazard_rates: Optional[Dict[str, float]] = None,
+                             repair_ticks=None) -> List[Dict]:
+    """
+    Falhas independentes por drone, geradas de uma vez: processo de renovação com tempo até a
+    falha geométrico (taxa de risco por tick) e tempo de reparo amostrado. Sem `repair_ticks`,
+    cada drone falha no máximo uma vez e não volta. Retorna eventos {tick, drone, repair_tick}.
+    """
+    hazard_rates = hazard_rates or {}
+    rates = np.array([hazard_rates.get(d, hazard_rate) for d in drone_ids], dtype=np.float64)
+    active = rates > 0
+    if not active.any() or ticks <= 0:
+        return []
+    repair = _duration_sampler(repair_ticks, rng)
+    D = len(drone_ids)
+    # Falhas por drone dimensionadas pela taxa máxima, com folga; dobra enquanto não cobrir o horizonte
+    K = int(np.ceil(ticks * rates.max() * 2)) + 4 if repair is not None else 1
+    while True:
+        up = rng.geometric(np.where(active, np.clip(rates, 1e-12, 1.0), 1.0)[:, None], size=(D, K))
+        down = repair((D, K)) if repair is not None else np.full((D, K), ticks + 1, dtype=np.int64)
+        down_before = np.concatenate([np.zeros((D, 1), dtype=np.int64), np.cumsum(down, axis=1)[:, :-1]], axis=1)
+        fail_tick = np.cumsum(up, axis=1) + down_before
+        if repair is None or (fail_tick[active, -1] >= ticks).all():
+            break
+        K *= 2
+    repair_tick = fail_tick + down
+    drone, k = np.nonzero((fail_tick < ticks) & active[:, None])
+    order = np.lexsort((drone, fail_tick[drone, k]))
+    return [
+        {"tick": int(fail_tick[d, j]), "drone": drone_ids[d],
+         "repair_tick": int(repair_tick[d, j]) if repair is not None else None, "cause": "hazard"}
+        for d, j in zip(drone[order], k[order])
+    ]
+
+
+def generate_regional_outages(ticks: int, area_bounds, rng: np.random.Generator, rate: float = 0.0,
+                              radius: float = 2.0, duration=(10, 30)) -> List[Dict]:
+    """
+    Quedas regionais correlacionadas: no máximo uma por tick, com probabilidade `rate`, centro
+    uniforme na área e duração amostrada. Todos os drones a até `radius` do centro no tick da
+    queda falham juntos (resolvido na simulação, pelas posições daquele momento).
+    """
+    if rate <= 0 or ticks <= 0:
+        return []
+    starts = np.flatnonzero(rng.random(ticks) < rate)
+    min_x, max_x, min_y, max_y = area_bounds
+    centers = np.column_stack([rng.uniform(min_x, max_x, len(starts)), rng.uniform(min_y, max_y, len(starts))])
+    durations = _duration_sampler(duration, rng)(len(starts))
+    return [{"tick": int(t), "center": (float(c[0]), float(c[1])), "radius": float(radius), "duration": int(d)}
+            for t, c, d in zip(starts, centers, durations)]
+
+
+def failure_process_events(config: Dict, drone_ids: Sequence[str], ticks: int, area_bounds) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Eventos de falha e quedas regionais da chave `failure_process` da configuração, ex.:
+    `{"seed": 7, "hazard_rate": 0.002, "hazard_rates": {"D2": 0.01}, "repair_ticks": [20, 60],
+    "regional_outages": {"rate": 0.005, "radius": 2.0, "duration": [10, 30]}}`.
+    Sem `seed`, a semente vem do `random` global (reprodutível quando o batch fixa a semente).
+    """
+    conf = config.get("failure_process") or {}
+    seed = conf.get("seed")
+    rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+    failures = generate_hazard_failures(
+        list(drone_ids), ticks, rng,
+        hazard_rate=conf.get("hazard_rate", 0.0),
+        hazard_rates=conf.get("hazard_rates"),
+        repair_ticks=conf.get("repair_ticks"),
+    )
+    outage_conf = conf.get("regional_outages") or {}
+    outages = generate_regional_outages(
+        ticks, area_bounds, rng,
+        rate=outage_conf.get("rate", 0.0),
+        radius=outage_conf.get("radius", 2.0),
+        duration=outage_conf.get("duration", (10, 30)),
+    )
+    return failures, outages
+
+
+class RecoveryTracker:
+    """
+    Latência de recuperação de cada falha: ticks e tempo de relógio até que (1) uma coalizão
+    formada depois da falha volte a cobrir as habilidades contratadas que o drone perdido
+    oferecia e (2) a cobertura recente (fração de células observadas nos últimos `window`
+    ticks) volte a `tolerance` vezes o valor de antes da falha. Também mede as rodadas de
+    replanejamento do MAS disparadas por falhas/reparos.
+    """
+    def __init__(self, window: int = 20, tolerance: float = 0.95):
+        self.window = window
+        self.tolerance = tolerance
+        self.open: List[Dict] = []
+        self.closed: List[Dict] = []
+        self.replan_rounds = 0
+        self.replan_seconds = 0.0
+
+    def on_failure(self, tick: int, drone_id: str, lost_skills, baseline: float, cause: str):
+        self.open.append({
+            "tick": tick, "drone": drone_id, "cause": cause, "skills": set(lost_skills), "baseline": baseline,
+            "skills_tick": None if lost_skills else tick, "coverage_tick": None, "wall_start": time.perf_counter(),
+        })
+
+    def on_coalition(self, tick: int, covered_skills):
+        covered = set(covered_skills)
+        for failure in self.open:
+            if failure["skills_tick"] is None and failure["skills"] <= covered:
+                failure["skills_tick"] = tick
+
+    def on_replan(self, seconds: float):
+        self.replan_rounds += 1
+        self.replan_seconds += seconds
+
+    def on_tick_end(self, tick: int, fresh_coverage: float):
+        still_open = []
+        for failure in self.open:
+            if failure["coverage_tick"] is None and fresh_coverage >= failure["baseline"] * self.tolerance:
+                failure["coverage_tick"] = tick
+            if failure["skills_tick"] is not None and failure["coverage_tick"] is not None:
+                failure["recovery_ticks"] = max(failure["skills_tick"], failure["coverage_tick"]) - failure["tick"]
+                failure["recovery_seconds"] = time.perf_counter() - failure.pop("wall_start")
+                log_event(f"RECUPERAÇÃO: falha de {failure['drone']} (tick {failure['tick']}) recuperada em "
+                          f"{failure['recovery_ticks']} ticks.")
+                self.closed.append(failure)
+            else:
+                still_open.append(failure)
+        self.open = still_open
+
+    def summary(self) -> Dict[str, float]:
+        ticks = np.array([f["recovery_ticks"] for f in self.closed], dtype=np.float64)
+        seconds = np.array([f["recovery_seconds"] for f in self.closed], dtype=np.float64)
+        return {
+            "failures_total": len(self.closed) + len(self.open),
+            "failures_unrecovered": len(self.open),
+            "recovery_ticks_mean": float(ticks.mean()) if len(ticks) else 0.0,
+            "recovery_ticks_max": float(ticks.max()) if len(ticks) else 0.0,
+            "recovery_wall_ms_mean": float(seconds.mean() * 1e3) if len(seconds) else 0.0,
+            "replan_rounds": self.replan_rounds,
+            "replan_rounds_per_s": self.replan_rounds / self.replan_seconds if self.replan_seconds > 0 else 0.0,
+        }
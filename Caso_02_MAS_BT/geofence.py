@@ -0,0 +1,229 @@
+# src/core/geofence.py
+
+import math
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+from contracts import log_event
+
+DEFAULT_AREA_BOUNDS = (-1.0, 10.0, -1.0, 10.0)
+
+
+@dataclass
+class GeofenceZone:
+    """Zona de espaço aéreo: 'no_fly' (proibida) ou 'corridor' (corredor liberado)."""
+    id: str
+    kind: str
+    polygon: np.ndarray  # (V, 2)
+
+    @property
+    def bbox(self) -> Tuple[float, float, float, float]:
+        return (self.polygon[:, 0].min(), self.polygon[:, 0].max(),
+                self.polygon[:, 1].min(), self.polygon[:, 1].max())
+
+
+@dataclass
+class GeofenceViolation:
+    """Evento de violação de geofence."""
+    tick: int
+    drone_id: str
+    zone_id: str
+    kind: str  # 'position', 'segment' ou 'out_of_bounds'
+
+
+def points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Teste par-ímpar (ray casting) vetorizado: pontos (N, 2) contra um polígono (V, 2)."""
+    x = points[:, 0][:, None]
+    y = points[:, 1][:, None]
+    x0, y0 = polygon[:, 0][None, :], polygon[:, 1][None, :]
+    x1, y1 = np.roll(polygon[:, 0], -1)[None, :], np.roll(polygon[:, 1], -1)[None, :]
+    crosses = (y0 > y) != (y1 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return np.count_nonzero(crosses & (x < x_cross), axis=1) % 2 == 1
+
+
+def segments_intersect_polygon(starts: np.ndarray, ends: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Indica quais segmentos (N) tocam o polígono: extremidade interna ou cruzamento de aresta."""
+    hit = points_in_polygon(starts, polygon) | points_in_polygon(ends, polygon)
+    p, r = starts[:, None, :], (ends - starts)[:, None, :]
+    q = polygon[None, :, :]
+    s = (np.roll(polygon, -1, axis=0) - polygon)[None, :, :]
+    r_x_s = r[..., 0] * s[..., 1] - r[..., 1] * s[..., 0]
+    qp = q - p
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (qp[..., 0] * s[..., 1] - qp[..., 1] * s[..., 0]) / r_x_s
+        u = (qp[..., 0] * r[..., 1] - qp[..., 1] * r[..., 0]) / r_x_s
+    crossing = (r_x_s != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+    return hit | crossing.any(axis=1)
+
+
+class GeofenceEngine:
+    """
+    Motor de geofence com índice em grade uniforme.
+
+    Cada zona é registrada em todas as células da grade que sua caixa envolvente toca.
+    Na verificação em lote, cada posição só é testada contra as zonas da sua célula,
+    e os testes ponto-em-polígono são feitos zona a zona de forma vetorizada.
+    Posições dentro de um corredor ficam isentas das zonas no-fly que o corredor atravessa.
+    """
+    def __init__(self, zones: Sequence[GeofenceZone], area_bounds=DEFAULT_AREA_BOUNDS, cell_size: float = 1.0):
+        self.zones = list(zones)
+        self.area_bounds = tuple(float(v) for v in area_bounds)
+        self.cell_size = float(cell_size)
+        self.active: set = set()
+        self.violations: List[GeofenceViolation] = []
+        self._build_index()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "GeofenceEngine":
+        """Cria o motor a partir das chaves `area_bounds`, `geofences` e `geofence_cell_size`."""
+        zones = [
+            GeofenceZone(id=z.get("id", f"Z{k + 1}"), kind=z.get("type", "no_fly"),
+                         polygon=np.asarray(z["polygon"], dtype=float))
+            for k, z in enumerate(config.get("geofences", []))
+        ]
+        return cls(zones, config.get("area_bounds", DEFAULT_AREA_BOUNDS), config.get("geofence_cell_size", 1.0))
+
+    # --- Índice em grade uniforme ---
+    def _build_index(self):
+        min_x, max_x, min_y, max_y = self.area_bounds
+        self.nx = max(1, math.ceil((max_x - min_x) / self.cell_size))
+        self.ny = max(1, math.ceil((max_y - min_y) / self.cell_size))
+        cell_zones: Dict[int, List[int]] = {}
+        for z, zone in enumerate(self.zones):
+            zx0, zx1, zy0, zy1 = zone.bbox
+            i0, j0 = self._cell_indices(np.array([[zx0, zy0]]))[0]
+            i1, j1 = self._cell_indices(np.array([[zx1, zy1]]))[0]
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    cell_zones.setdefault(i * self.ny + j, []).append(z)
+        # Estrutura compacta (CSR): zonas da célula c em zone_ids[offsets[c]:offsets[c + 1]]
+        counts = np.zeros(self.nx * self.ny, dtype=np.int64)
+        for c, zs in cell_zones.items():
+            counts[c] = len(zs)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.zone_ids = np.zeros(self.offsets[-1], dtype=np.int64)
+        for c, zs in cell_zones.items():
+            self.zone_ids[self.offsets[c]:self.offsets[c + 1]] = zs
+        self.is_corridor = np.array([z.kind == "corridor" for z in self.zones], dtype=bool)
+
+    def _cell_indices(self, points: np.ndarray) -> np.ndarray:
+        min_x, _, min_y, _ = self.area_bounds
+        i = np.clip(((points[:, 0] - min_x) / self.cell_size).astype(int), 0, self.nx - 1)
+        j = np.clip(((points[:, 1] - min_y) / self.cell_size).astype(int), 0, self.ny - 1)
+        return np.stack([i, j], axis=1)
+
+    # --- Consultas em lote ---
+    def containing_zones(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna pares (índice_do_ponto, índice_da_zona) para cada ponto dentro de uma zona."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if not self.zones or len(points) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        ij = self._cell_indices(points)
+        cells = ij[:, 0] * self.ny + ij[:, 1]
+        counts = self.offsets[cells + 1] - self.offsets[cells]
+        point_idx = np.repeat(np.arange(len(points)), counts)
+        # Posição de cada candidato dentro da lista de zonas da sua célula
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        zone_idx = self.zone_ids[np.repeat(self.offsets[cells], counts) + local]
+        inside = np.zeros(len(point_idx), dtype=bool)
+        for z in np.unique(zone_idx):
+            sel = zone_idx == z
+            inside[sel] = points_in_polygon(points[point_idx[sel]], self.zones[z].polygon)
+        return point_idx[inside], zone_idx[inside]
+
+    def position_violations(self, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Violações de um lote de posições, sem registrar eventos: máscara de posições fora da
+        área e pares (índice_do_ponto, índice_da_zona) dentro de zonas no-fly fora de corredores.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        min_x, max_x, min_y, max_y = self.area_bounds
+        out = ((positions[:, 0] < min_x) | (positions[:, 0] > max_x) |
+               (positions[:, 1] < min_y) | (positions[:, 1] > max_y))
+        point_idx, zone_idx = self.containing_zones(positions)
+        in_corridor = np.zeros(len(positions), dtype=bool)
+        in_corridor[point_idx[self.is_corridor[zone_idx]]] = True
+        keep = ~self.is_corridor[zone_idx] & ~in_corridor[point_idx]
+        return out, point_idx[keep], zone_idx[keep]
+
+    def segment_violations(self, starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pares (índice_do_segmento, índice_da_zona) de segmentos que tocam zonas no-fly, sem
+        registrar eventos. Um segmento com as duas extremidades no mesmo corredor é liberado.
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        seg_idx, zone_idx = [], []
+        if len(starts) and self.zones:
+            lo = np.minimum(starts, ends)
+            hi = np.maximum(starts, ends)
+            exempt = np.zeros(len(starts), dtype=bool)
+            for z in np.flatnonzero(self.is_corridor):
+                poly = self.zones[z].polygon
+                exempt |= points_in_polygon(starts, poly) & points_in_polygon(ends, poly)
+            for z in np.flatnonzero(~self.is_corridor):
+                zx0, zx1, zy0, zy1 = self.zones[z].bbox
+                cand = np.flatnonzero(~exempt & (lo[:, 0] <= zx1) & (hi[:, 0] >= zx0) &
+                                      (lo[:, 1] <= zy1) & (hi[:, 1] >= zy0))
+                if len(cand) == 0:
+                    continue
+                hit = cand[segments_intersect_polygon(starts[cand], ends[cand], self.zones[z].polygon)]
+                seg_idx.append(hit)
+                zone_idx.append(np.full(len(hit), z, dtype=np.int64))
+        if not seg_idx:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(seg_idx), np.concatenate(zone_idx)
+
+    def check_positions(self, tick: int, drone_ids: Sequence[str], positions: np.ndarray) -> List[GeofenceViolation]:
+        """
+        Verifica todas as posições de um tick. Retorna (e registra em log) apenas as violações
+        novas; uma violação contínua do mesmo drone na mesma zona gera um único evento.
+        """
+        out, point_idx, zone_idx = self.position_violations(positions)
+        current = {(drone_ids[k], "area_bounds", "out_of_bounds") for k in np.flatnonzero(out)}
+        current |= {(drone_ids[k], self.zones[z].id, "position") for k, z in zip(point_idx, zone_idx)}
+        return self._emit(tick, current, kinds=("position", "out_of_bounds"))
+
+    def check_segments(self, tick: int, drone_ids: Sequence[str], starts: np.ndarray, ends: np.ndarray) -> List[GeofenceViolation]:
+        """Verifica segmentos planejados (ex.: pernas das rotas) contra as zonas no-fly."""
+        seg_idx, zone_idx = self.segment_violations(starts, ends)
+        current = {(drone_ids[k], self.zones[z].id, "segment") for k, z in zip(seg_idx, zone_idx)}
+        return self._emit(tick, current, kinds=("segment",))
+
+    def check_routes(self, tick: int, routes: Dict[str, List[Tuple[float, float]]]) -> List[GeofenceViolation]:
+        """Verifica todas as pernas (inclusive a de fechamento do ciclo) das rotas de patrulha."""
+        ids, starts, ends = [], [], []
+        for drone_id, route in routes.items():
+            for a, b in zip(route, route[1:] + route[:1]):
+                ids.append(drone_id)
+                starts.append(a)
+                ends.append(b)
+        return self.check_segments(tick, ids, np.array(starts).reshape(-1, 2), np.array(ends).reshape(-1, 2))
+
+    def no_fly_cells(self, grid_size: int) -> List[Tuple[int, int]]:
+        """Rasteriza as zonas no-fly (fora de corredores) na grade de cobertura/planejamento."""
+        min_x, max_x, min_y, max_y = self.area_bounds
+        ii, jj = np.meshgrid(np.arange(grid_size), np.arange(grid_size), indexing="ij")
+        centers = np.stack([
+            min_x + (ii.ravel() + 0.5) * (max_x - min_x) / grid_size,
+            min_y + (jj.ravel() + 0.5) * (max_y - min_y) / grid_size,
+        ], axis=1)
+        point_idx, zone_idx = self.containing_zones(centers)
+        blocked = np.zeros(len(centers), dtype=bool)
+        blocked[point_idx[~self.is_corridor[zone_idx]]] = True
+        blocked[point_idx[self.is_corridor[zone_idx]]] = False
+        return [(int(k // grid_size), int(k % grid_size)) for k in np.flatnonzero(blocked)]
+
+    def _emit(self, tick, current, kinds):
+        previous = {v for v in self.active if v[2] in kinds}
+        new = []
+        for drone_id, zone_id, kind in sorted(current - previous):
+            violation = GeofenceViolation(tick=tick, drone_id=drone_id, zone_id=zone_id, kind=kind)
+            log_event(f"GEOFENCE: Drone {drone_id} violou {zone_id} ({kind}) no tick {tick}.")
+            new.append(violation)
+        self.active = {v for v in self.active if v[2] not in kinds} | current
+        self.violations.extend(new)
+        return new
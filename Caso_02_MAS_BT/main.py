@@ -3,10 +3,12 @@
 # main.py
 
 from simulation import run_batch_simulation
+from aggregation import DEFAULT_CI_TARGETS
 
 if __name__ == "__main__":
-    # Altere o número de batches para 100 após o teste inicial
-    run_batch_simulation(num_batches=5) 
+    # Modo sequencial: executa até o IC de cobertura, redundância e recargas atingir os alvos
+    # (para um número fixo de execuções: run_batch_simulation(num_batches=5))
+    run_batch_simulation(ci_targets=DEFAULT_CI_TARGETS, max_batches=100)
     # A função run_simulation retornará o GIF para exibição no Colab
     #Teste Unitario
     #gif = run_simulation() 
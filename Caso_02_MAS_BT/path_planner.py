@@ -0,0 +1,155 @@
+# src/core/path_planner.py
+
+import heapq
+import math
+import numpy as np
+from typing import Dict, Iterable, List, Tuple
+
+from contracts import log_event
+
+Point = Tuple[float, float]
+Cell = Tuple[int, int]
+
+# Vizinhança 8-conectada: (di, dj, custo)
+_NEIGHBORS = [
+    (1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+    (1, 1, math.sqrt(2)), (1, -1, math.sqrt(2)), (-1, 1, math.sqrt(2)), (-1, -1, math.sqrt(2)),
+]
+
+
+class GridPathPlanner:
+    """
+    Planejador de caminhos sobre a mesma grade usada pela métrica de cobertura.
+
+    Para cada objetivo é calculado (Dijkstra a partir do objetivo) um campo de distâncias
+    de todas as células até ele. O campo fica em cache, então replanejar outro drone para o
+    mesmo POI ou base é apenas uma descida de gradiente sobre a tabela, sem nova busca.
+    """
+    def __init__(self, area_bounds: Tuple[float, float, float, float], grid_size: int = 50,
+                 no_fly_cells: Iterable[Cell] = ()):
+        self.area_bounds = area_bounds
+        self.grid_size = grid_size
+        min_x, max_x, min_y, max_y = area_bounds
+        self.x_scale = grid_size / (max_x - min_x)
+        self.y_scale = grid_size / (max_y - min_y)
+        self.blocked = np.zeros((grid_size, grid_size), dtype=bool)
+        # {celula_objetivo: campo de distâncias (grid_size x grid_size)}
+        self._fields: Dict[Cell, np.ndarray] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.block_cells(no_fly_cells)
+
+    # --- Conversão de coordenadas (mesma convenção de metrics.py) ---
+    def world_to_cell(self, point: Point) -> Cell:
+        min_x, _, min_y, _ = self.area_bounds
+        i = int(np.clip(int((point[0] - min_x) * self.x_scale), 0, self.grid_size - 1))
+        j = int(np.clip(int((point[1] - min_y) * self.y_scale), 0, self.grid_size - 1))
+        return (i, j)
+
+    def cell_to_world(self, cell: Cell) -> Point:
+        min_x, _, min_y, _ = self.area_bounds
+        return (min_x + (cell[0] + 0.5) / self.x_scale, min_y + (cell[1] + 0.5) / self.y_scale)
+
+    # --- Restrições ---
+    def block_cells(self, cells: Iterable[Cell]):
+        """Marca células como proibidas (no-fly) e invalida o cache de campos."""
+        changed = False
+        for i, j in cells:
+            if not self.blocked[i, j]:
+                self.blocked[i, j] = True
+                changed = True
+        if changed:
+            self.invalidate()
+
+    def invalidate(self):
+        """Descarta os campos de distância em cache (ex.: após mudança de no-fly)."""
+        self._fields.clear()
+
+    # --- Campos de distância ---
+    def distance_field(self, goal: Cell) -> np.ndarray:
+        """Retorna (do cache, se possível) o campo de distâncias até a célula objetivo."""
+        field = self._fields.get(goal)
+        if field is not None:
+            self.cache_hits += 1
+            return field
+        self.cache_misses += 1
+        field = self._dijkstra(goal)
+        self._fields[goal] = field
+        return field
+
+    def _passable(self, ci: int, cj: int, di: int, dj: int) -> bool:
+        ni, nj = ci + di, cj + dj
+        if not (0 <= ni < self.grid_size and 0 <= nj < self.grid_size) or self.blocked[ni, nj]:
+            return False
+        # Não permite cortar quina de células bloqueadas na diagonal
+        if di and dj and (self.blocked[ci + di, cj] or self.blocked[ci, cj + dj]):
+            return False
+        return True
+
+    def _dijkstra(self, goal: Cell) -> np.ndarray:
+        field = np.full((self.grid_size, self.grid_size), np.inf)
+        if self.blocked[goal]:
+            return field
+        field[goal] = 0.0
+        heap = [(0.0, goal)]
+        while heap:
+            d, (ci, cj) = heapq.heappop(heap)
+            if d > field[ci, cj]:
+                continue
+            for di, dj, cost in _NEIGHBORS:
+                if not self._passable(ci, cj, di, dj):
+                    continue
+                nd = d + cost
+                if nd < field[ci + di, cj + dj]:
+                    field[ci + di, cj + dj] = nd
+                    heapq.heappush(heap, (nd, (ci + di, cj + dj)))
+        return field
+
+    # --- Planejamento ---
+    def plan(self, start: Point, goal: Point) -> List[Point]:
+        """
+        Planeja um caminho de `start` até `goal` e retorna os waypoints (coordenadas do mundo),
+        mantendo apenas os pontos de mudança de direção. O último ponto é exatamente `goal`.
+        """
+        goal_cell = self.world_to_cell(goal)
+        field = self.distance_field(goal_cell)
+        cell = self.world_to_cell(start)
+        if not np.isfinite(field[cell]):
+            log_event(f"PLANEJADOR: Sem caminho livre de {start} até {goal}. Usando linha reta.")
+            return [tuple(goal)]
+
+        waypoints = []
+        direction = None
+        while cell != goal_cell:
+            ci, cj = cell
+            step = min(
+                ((cost + field[ci + di, cj + dj], di, dj) for di, dj, cost in _NEIGHBORS
+                 if self._passable(ci, cj, di, dj)),
+                key=lambda item: item[0]
+            )
+            _, di, dj = step
+            if direction is not None and (di, dj) != direction:
+                waypoints.append(self.cell_to_world(cell))
+            direction = (di, dj)
+            cell = (ci + di, cj + dj)
+        waypoints.append(tuple(goal))
+        return waypoints
+
+    def plan_route(self, start: Point, targets: List[Point]) -> List[Point]:
+        """Encadeia caminhos planejados de `start` passando por todos os `targets` em ordem."""
+        route = []
+        current = start
+        for target in targets:
+            route.extend(self.plan(current, target))
+            current = target
+        return route
+
+    def plan_cycle(self, targets: List[Point]) -> List[Point]:
+        """
+        Planeja o laço fechado targets[0] -> ... -> targets[-1] -> targets[0] para patrulha
+        contínua: começa em targets[0] e termina no último waypoint antes de voltar a ele.
+        """
+        if len(targets) < 2:
+            return [tuple(p) for p in targets]
+        cycle = [tuple(targets[0])] + self.plan_route(targets[0], targets[1:])
+        return cycle + self.plan(targets[-1], targets[0])[:-1]
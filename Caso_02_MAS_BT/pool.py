@@ -0,0 +1,69 @@
+# src/core/pool.py
+
+import random
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import py_trees
+
+from agents import PAS, Broker, YPA, MRA, CLA
+from behaviors import create_behavior_tree, reset_behavior_tree, MockPyFly
+from interface import DroneMissionInterface
+from spatial_index import SpatialHashIndex
+
+
+def _strip_instrumentation(obj):
+    """Remove métodos de instância que sombreiam os da classe (envoltórios do PhaseTimer)."""
+    for name in [n for n, v in vars(obj).items() if callable(v) and hasattr(type(obj), n)]:
+        delattr(obj, name)
+
+
+class SimulationPool:
+    """
+    Objetos reutilizáveis entre as execuções de um worker de batch.
+
+    Em vez de reconstruir a cada `run_simulation` a interface (e seu índice espacial), o
+    MockPyFly, os agentes do MAS e uma Behavior Tree por drone, o pool os reinicia no lugar:
+    tabelas da interface limpas, registros do YPA/CLA esvaziados e árvores religadas ao novo
+    drone com o índice da patrulha e o PID zerados. Árvores são guardadas por posição na frota
+    e só são criadas quando a frota cresce.
+    """
+    def __init__(self):
+        self.interface: Optional[DroneMissionInterface] = None
+        self.skywalker: Optional[MockPyFly] = None
+        self.agents: Optional[Tuple] = None
+        self.trees: List[py_trees.trees.BehaviourTree] = []
+        self.runs = 0
+
+    def prepare(self, cell_size: float, pyfly_args: Sequence = (), seed: Optional[int] = None):
+        """
+        Reinicia (ou cria, na primeira execução) interface, MockPyFly e agentes.
+        Com `seed`, também ressemeia o `random` e o `numpy.random` globais.
+        Retorna (interface, skywalker, (pas, broker, ypa, mra, cla)).
+        """
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+        if self.interface is None:
+            self.interface = DroneMissionInterface(spatial_index=SpatialHashIndex(cell_size=cell_size))
+            self.skywalker = MockPyFly(*pyfly_args)
+            self.agents = (PAS(), Broker(), YPA(), MRA(), CLA())
+        else:
+            if self.interface.spatial_index.cell_size != cell_size:
+                self.interface.spatial_index = SpatialHashIndex(cell_size=cell_size)
+            self.interface.reset()
+            self.skywalker.reset()
+            for agent in self.agents:
+                _strip_instrumentation(agent)
+                if hasattr(agent, "reset"):
+                    agent.reset()
+        self.runs += 1
+        return self.interface, self.skywalker, self.agents
+
+    def tree(self, k: int, drone_id: str) -> py_trees.trees.BehaviourTree:
+        """Árvore da k-ésima posição da frota, religada a `drone_id` (criada se ainda não existir)."""
+        if k < len(self.trees):
+            return reset_behavior_tree(self.trees[k], drone_id, self.interface, self.skywalker)
+        tree = create_behavior_tree(drone_id, self.interface, self.skywalker)
+        self.trees.append(tree)
+        return tree
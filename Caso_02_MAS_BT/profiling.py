@@ -0,0 +1,124 @@
+# src/core/profiling.py
+
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class _NullPhase:
+    """Contexto vazio usado quando a instrumentação está desligada (custo quase zero)."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class PhaseTimer:
+    """
+    Instrumentação leve por fase/subsistema da simulação.
+
+    Uso: `with timer.phase("bt_ticks"): ...`. Acumula as durações de cada fase para
+    totais e percentis e, opcionalmente, guarda os intervalos para exportar uma linha do
+    tempo no formato Chrome trace-event (abrir em chrome://tracing ou Perfetto).
+    Desligado, `phase()` devolve um contexto vazio compartilhado.
+    """
+    def __init__(self, enabled: bool = False, trace: bool = False):
+        self.enabled = enabled
+        self.trace = enabled and trace
+        # {fase: [duração_ns, ...]}
+        self.durations: Dict[str, List[int]] = {}
+        # [(fase, início_ns, fim_ns, thread_id)]
+        self.spans: List[tuple] = []
+        self._origin = time.perf_counter_ns()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "PhaseTimer":
+        """Cria o timer a partir da chave `profiling` ({"enabled": bool, "trace_path": str})."""
+        conf = config.get("profiling", {})
+        return cls(enabled=conf.get("enabled", False), trace=bool(conf.get("trace_path")))
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def record(self, name: str, start_ns: int, end_ns: int):
+        self.durations.setdefault(name, []).append(end_ns - start_ns)
+        if self.trace:
+            self.spans.append((name, start_ns, end_ns, threading.get_ident()))
+
+    def instrument(self, obj, methods: List[str], prefix: Optional[str] = None):
+        """Envolve métodos de uma instância (ex.: agentes do MAS) com uma fase própria."""
+        if not self.enabled:
+            return obj
+        prefix = prefix or type(obj).__name__
+        for method_name in methods:
+            original = getattr(obj, method_name)
+            setattr(obj, method_name, self._wrap(original, f"{prefix}.{method_name}"))
+        return obj
+
+    def _wrap(self, fn, name):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, start, time.perf_counter_ns())
+        return wrapper
+
+    def summary(self, prefix: str = "time_") -> Dict[str, float]:
+        """Totais (s), contagem e percentis p50/p95/p99 (ms) por fase, prontos para o dicionário de métricas."""
+        out = {}
+        for name, samples in sorted(self.durations.items()):
+            ordered = sorted(samples)
+            key = prefix + name.replace(".", "_")
+            out[f"{key}_total_s"] = sum(ordered) / 1e9
+            out[f"{key}_count"] = len(ordered)
+            for q in (50, 95, 99):
+                idx = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+                out[f"{key}_p{q}_ms"] = ordered[idx] / 1e6
+        return out
+
+    def export_chrome_trace(self, path: str):
+        """Grava os intervalos registrados no formato JSON de trace-events do Chrome."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "cat": name.split(".")[0],
+                "ph": "X",
+                "ts": (start - self._origin) / 1e3,
+                "dur": (end - start) / 1e3,
+                "pid": pid,
+                "tid": tid,
+            }
+            for name, start, end, tid in self.spans
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
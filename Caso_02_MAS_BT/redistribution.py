@@ -0,0 +1,209 @@
+# src/core/redistribution.py
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from behaviors import patrol_node
+from contracts import log_event
+
+Point = Tuple[float, float]
+
+
+def insertion_slots(route: Sequence[Point], position: Point, index: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Arestas onde um ponto pode ser inserido numa patrulha cíclica: (origens, destinos, posições
+    de inserção). A aresta que chega ao alvo corrente (`index`) parte da posição atual do drone;
+    as demais são as da volta da patrulha, incluindo a de fechamento (último -> primeiro).
+    """
+    n = len(route)
+    if n == 0:
+        p = np.asarray([position], dtype=np.float64)
+        return p, p, np.zeros(1, dtype=np.int64)
+    points = np.asarray(route, dtype=np.float64)
+    slots = np.arange(1, n + 1)
+    starts = points[slots - 1]
+    ends = points[slots % n]
+    k = min(index, n)
+    if k > 0:
+        starts[k - 1] = position
+    else:
+        starts = np.vstack([position, starts])
+        ends = np.vstack([points[0], ends])
+        slots = np.concatenate([[0], slots])
+    return starts, ends, slots
+
+
+def insertion_costs(route: Sequence[Point], position: Point, index: int, orphans: np.ndarray):
+    """Desvio d(a, p) + d(p, b) - d(a, b) de cada órfão (linhas) em cada aresta (colunas)."""
+    starts, ends, slots = insertion_slots(route, position, index)
+    to_start = np.linalg.norm(orphans[:, None, :] - starts[None], axis=2)
+    to_end = np.linalg.norm(orphans[:, None, :] - ends[None], axis=2)
+    return to_start + to_end - np.linalg.norm(ends - starts, axis=1), slots
+
+
+def cheapest_insertion(routes: Dict[str, List[Point]], positions: Dict[str, Point], indices: Dict[str, int],
+                       orphans: Sequence[Point]):
+    """
+    Insere os pontos órfãos nas rotas dos drones pela heurística de inserção mais barata.
+
+    O custo de todos os órfãos em todas as arestas de cada rota é avaliado de uma vez (matriz
+    órfãos x arestas); a cada passo, o par (órfão, aresta) de menor desvio entre todas as rotas
+    é aplicado e só a matriz da rota alterada é recalculada. Inserções antes do alvo corrente
+    avançam o índice da patrulha, para que o drone não mude de alvo no meio do trecho.
+    Retorna (rotas, índices, {drone: pontos recebidos}), sem alterar as entradas.
+    """
+    routes = {d: list(r) for d, r in routes.items()}
+    indices = dict(indices)
+    received: Dict[str, List[Point]] = {d: [] for d in routes}
+    if not routes or not orphans:
+        return routes, indices, received
+    drones = list(routes)
+    orphan_xy = np.asarray(orphans, dtype=np.float64).reshape(-1, 2)
+    tables = {}
+    best_cost = np.empty((len(drones), len(orphan_xy)))
+    best_edge = np.empty((len(drones), len(orphan_xy)), dtype=np.int64)
+    placed = np.zeros(len(orphan_xy), dtype=bool)
+
+    def refresh(r):
+        d = drones[r]
+        cost, slots = insertion_costs(routes[d], positions[d], indices[d], orphan_xy)
+        tables[d] = slots
+        best_edge[r] = np.argmin(cost, axis=1)
+        best_cost[r] = np.where(placed, np.inf, cost[np.arange(len(orphan_xy)), best_edge[r]])
+
+    for r in range(len(drones)):
+        refresh(r)
+    for _ in range(len(orphan_xy)):
+        r, p = np.unravel_index(np.argmin(best_cost), best_cost.shape)
+        d = drones[r]
+        slot = int(tables[d][best_edge[r, p]])
+        point = tuple(orphans[p])
+        routes[d].insert(slot, point)
+        if slot < indices[d]:
+            indices[d] += 1
+        received[d].append(point)
+        placed[p] = True
+        best_cost[:, p] = np.inf
+        refresh(r)
+    return routes, indices, received
+
+
+def _remove_point(route: List[Point], index: int, point: Point) -> Tuple[List[Point], int]:
+    """Remove a primeira ocorrência de `point`, mantendo o alvo corrente da patrulha."""
+    route = list(route)
+    if point in route:
+        k = route.index(point)
+        route.pop(k)
+        if k < index:
+            index -= 1
+    return route, index
+
+
+class WaypointRedistributor:
+    """
+    Redistribuição dos pontos de patrulha de um drone em falha entre os sobreviventes.
+
+    Quando um drone entra em FAILURE, os pontos da sua rota são inseridos (inserção mais barata,
+    `cheapest_insertion`) nas rotas dos membros operacionais da coalizão corrente (ou de toda a
+    frota operacional, com `"members": "fleet"` ou sem coalizão disponível). As novas rotas
+    passam por `DroneMissionInterface.assign_route` e o índice de cada `Action_Patrol` é
+    ajustado. Quando o drone é reparado, os pontos que ele cedeu são retirados de quem os
+    recebeu e ele retoma a própria rota.
+    """
+    def __init__(self, members: str = "coalition", budget_ms: Optional[float] = None):
+        self.members = members
+        self.budget_ms = budget_ms
+        # {drone de origem: [(ponto, drone que o patrulha agora)]}
+        self.handoffs: Dict[str, List[Tuple[Point, str]]] = {}
+        # {drone em falha: pontos de outros drones que estavam na sua rota e foram repassados}
+        self.vacated: Dict[str, List[Point]] = {}
+        self.rounds = 0
+        self.points_moved = 0
+        self.seconds = 0.0
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional["WaypointRedistributor"]:
+        """
+        Criado a partir da chave `waypoint_redistribution` (None se ausente), ex.:
+        `{"members": "coalition", "budget_ms": 5}`.
+        """
+        conf = config.get("waypoint_redistribution")
+        if not conf:
+            return None
+        conf = conf if isinstance(conf, dict) else {}
+        return cls(members=conf.get("members", "coalition"), budget_ms=conf.get("budget_ms"))
+
+    def _receivers(self, interface, coalition_members: Sequence[str], exclude) -> List[str]:
+        def operational(d):
+            return (d not in exclude and interface.get_state(d)['status'] not in ('FAILURE', 'RETURNING', 'REFUELING')
+                    and (interface.get_mission(d) or {}).get("type") == "patrol")
+        receivers = [d for d in coalition_members if operational(d)] if self.members == "coalition" else []
+        return receivers or [d for d in interface.routes if operational(d)]
+
+    def redistribute(self, t: int, failed_id: str, interface, trees: Dict, coalition_members: Sequence[str] = ()) -> Dict[str, List[Point]]:
+        """Distribui a rota de `failed_id` entre os sobreviventes; retorna {drone: pontos recebidos}."""
+        start = time.perf_counter()
+        orphans = list(interface.routes.get(failed_id, []))
+        receivers = self._receivers(interface, coalition_members, {failed_id})
+        if not orphans or not receivers:
+            return {}
+        nodes = {d: patrol_node(trees[d]) for d in receivers}
+        routes, indices, received = cheapest_insertion(
+            {d: interface.routes[d] for d in receivers},
+            {d: interface.get_position(d) for d in receivers},
+            {d: nodes[d].index for d in receivers},
+            orphans,
+        )
+        received = {d: points for d, points in received.items() if points}
+        for d in received:
+            # Uma aproximação ainda em curso (ex.: trânsito até o POI) é mantida
+            interface.assign_route(d, routes[d], approach=(interface.get_mission(d) or {}).get("approach"))
+            nodes[d].index = indices[d]
+        # Pontos que o drone em falha patrulhava por outro passam para o novo responsável
+        self.vacated[failed_id] = [p for origin, entries in self.handoffs.items() if origin != failed_id
+                                   for p, holder in entries if holder == failed_id]
+        new_holder = {point: d for d, points in received.items() for point in points}
+        for origin, entries in self.handoffs.items():
+            self.handoffs[origin] = [(p, new_holder.get(p, holder) if holder == failed_id else holder) for p, holder in entries]
+        self.handoffs.setdefault(failed_id, []).extend((p, d) for d, points in received.items() for p in points)
+
+        elapsed = time.perf_counter() - start
+        self.rounds += 1
+        self.points_moved += len(orphans)
+        self.seconds += elapsed
+        summary = ", ".join(f"{d}: +{len(points)}" for d, points in received.items())
+        log_event(f"REDISTRIBUIÇÃO: {len(orphans)} pontos de {failed_id} inseridos nas rotas de {summary} "
+                  f"no tick {t} ({elapsed * 1e3:.2f} ms).")
+        if self.budget_ms is not None and elapsed * 1e3 > self.budget_ms:
+            log_event(f"REDISTRIBUIÇÃO: {elapsed * 1e3:.2f} ms excedeu o orçamento de {self.budget_ms} ms.")
+        return received
+
+    def give_back(self, t: int, repaired_id: str, interface, trees: Dict):
+        """O drone reparado retoma a própria rota: seus pontos saem das rotas de quem os recebeu."""
+        changed = {}
+        for point, holder in self.handoffs.pop(repaired_id, []):
+            route, index = changed.get(holder, (interface.routes.get(holder, []), patrol_node(trees[holder]).index))
+            changed[holder] = _remove_point(route, index, point)
+        vacated = self.vacated.pop(repaired_id, [])
+        if vacated:
+            own, index = interface.routes.get(repaired_id, []), patrol_node(trees[repaired_id]).index
+            for point in vacated:
+                own, index = _remove_point(own, index, point)
+            changed[repaired_id] = (own, index)
+        for d, (route, index) in changed.items():
+            interface.assign_route(d, route, approach=(interface.get_mission(d) or {}).get("approach"))
+            patrol_node(trees[d]).index = index
+        if changed:
+            holders = [d for d in changed if d != repaired_id]
+            log_event(f"REDISTRIBUIÇÃO: Drone {repaired_id} reparado no tick {t} retoma sua rota"
+                      + (f"; pontos retirados das rotas de {', '.join(holders)}." if holders else "."))
+        return list(changed)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "redistribution_rounds": self.rounds,
+            "redistributed_points": self.points_moved,
+            "redistribution_ms_mean": self.seconds / self.rounds * 1e3 if self.rounds else 0.0,
+        }
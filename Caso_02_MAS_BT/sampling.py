@@ -0,0 +1,107 @@
+# src/core/sampling.py
+
+from typing import Optional
+
+import numpy as np
+
+# Amostradores disponíveis para a geração dos pontos de patrulha
+SAMPLERS = ("uniform", "lhs", "sobol")
+
+# Bits de precisão do Sobol (pontos em inteiros de 32 bits)
+SOBOL_BITS = 32
+
+
+def scenario_rng(seed: int, index: int = 0) -> np.random.Generator:
+    """
+    Gerador do cenário `index` de uma sequência com semente `seed`.
+
+    Cada cenário tem seu próprio fluxo (SeedSequence com entropia [seed, index]), independente
+    de quantos números aleatórios as simulações anteriores consumiram. Com a mesma semente,
+    variantes comparadas (ex.: Case 1 e Case 2) recebem exatamente as mesmas rotas no mesmo
+    cenário: números aleatórios comuns (common random numbers).
+    """
+    return np.random.default_rng(np.random.SeedSequence([seed, index]))
+
+
+def latin_hypercube(n: int, dims: int, rng: np.random.Generator) -> np.ndarray:
+    """Hipercubo latino em [0, 1)^dims: cada dimensão tem exatamente um ponto por estrato 1/n."""
+    strata = np.argsort(rng.random((dims, n)), axis=1).T
+    return (strata + rng.random((n, dims))) / n
+
+
+def _sobol_direction_numbers(bits: int = SOBOL_BITS) -> np.ndarray:
+    """Números de direção das duas primeiras dimensões do Sobol, como inteiros de `bits` bits."""
+    # Dimensão 1: van der Corput (m_k = 1). Dimensão 2: polinômio primitivo x + 1 (m_k = 2·m_{k-1} xor m_{k-1}).
+    m = [1]
+    for _ in range(1, bits):
+        m.append((m[-1] << 1) ^ m[-1])
+    v = np.zeros((2, bits), dtype=np.uint64)
+    for k in range(bits):
+        v[0, k] = 1 << (bits - 1 - k)
+        v[1, k] = m[k] << (bits - 1 - k)
+    return v
+
+
+_SOBOL_V = _sobol_direction_numbers()
+
+
+def sobol_2d(n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Primeiros `n` pontos da sequência de Sobol em [0, 1)^2.
+
+    Com `rng`, aplica o embaralhamento linear de Matoušek (matriz triangular inferior aleatória
+    com diagonal unitária) seguido de um deslocamento digital aleatório: cada cenário recebe uma
+    réplica independente e não viesada, preservando a equidistribuição da sequência.
+    """
+    index = np.arange(n, dtype=np.uint64)
+    points = np.zeros((n, 2), dtype=np.uint64)
+    for k in range(max(1, int(n - 1).bit_length())):
+        bit = (index >> np.uint64(k)) & np.uint64(1)
+        points ^= bit[:, None] * _SOBOL_V[:, k][None, :]
+    if rng is None:
+        return points.astype(np.float64) / 2.0 ** SOBOL_BITS
+
+    top = np.uint64(1) << np.uint64(SOBOL_BITS - 1)
+    for d in range(2):
+        # Coluna l da matriz: bit l (diagonal) + bits aleatórios nas linhas abaixo (dígitos menos significativos)
+        below = rng.integers(0, 2, size=(SOBOL_BITS, SOBOL_BITS), dtype=np.uint64)
+        scrambled = np.zeros(n, dtype=np.uint64)
+        for l in range(SOBOL_BITS):
+            diagonal = top >> np.uint64(l)
+            column = diagonal
+            for r in range(l + 1, SOBOL_BITS):
+                column |= below[l, r] * (top >> np.uint64(r))
+            bit = (points[:, d] & diagonal) != 0
+            scrambled[bit] ^= column
+        shift = np.uint64(rng.integers(0, 2 ** SOBOL_BITS, dtype=np.uint64))
+        points[:, d] = scrambled ^ shift
+    # Jitter uniforme dentro da menor célula para obter valores contínuos
+    return (points.astype(np.float64) + rng.random((n, 2))) / 2.0 ** SOBOL_BITS
+
+
+def sample_unit_square(n: int, rng: np.random.Generator, sampler: str = "uniform") -> np.ndarray:
+    """`n` pontos em [0, 1)^2 segundo o amostrador escolhido."""
+    if sampler == "uniform":
+        return rng.random((n, 2))
+    if sampler == "lhs":
+        return latin_hypercube(n, 2, rng)
+    if sampler == "sobol":
+        return sobol_2d(n, rng)
+    raise ValueError(f"Amostrador desconhecido: {sampler!r} (opções: {', '.join(SAMPLERS)})")
+
+
+def sample_routes(num_drones: int, num_points: int, area_bounds, rng: np.random.Generator,
+                  sampler: str = "uniform") -> np.ndarray:
+    """
+    Pontos de patrulha de toda a frota, shape (num_drones, num_points, 2).
+
+    Os `num_drones * num_points` pontos são amostrados em conjunto, de modo que o LHS e o Sobol
+    estratificam a área inteira (no Sobol, os pontos consecutivos de cada drone também ficam
+    bem distribuídos).
+    """
+    min_x, max_x, min_y, max_y = area_bounds
+    unit = sample_unit_square(num_drones * num_points, rng, sampler)
+    points = np.empty_like(unit)
+    points[:, 0] = min_x + unit[:, 0] * (max_x - min_x)
+    points[:, 1] = min_y + unit[:, 1] * (max_y - min_y)
+    return points.reshape(num_drones, num_points, 2)
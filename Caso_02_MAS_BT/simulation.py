@@ -1,27 +1,48 @@
 # src/simulation.py (Versão Ajustada para Case Study 2)
+import copy
 import json
 import random
 import time
 import os
-import matplotlib.pyplot as plt
-import imageio
-import py_trees
 import numpy as np
-import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from interface import DroneMissionInterface
 from agents import PAS, Broker, YPA, MRA, CLA
 from contracts import CandidateResource, log_event, SIMULATION_LOGS
 from behaviors import create_behavior_tree, MockPyFly
-from metrics import calculate_area_coverage_and_redundancy, calculate_individual_autonomy
+from metrics import calculate_area_coverage_and_redundancy, calculate_individual_autonomy, RevisitTracker, SparseCoverageGrid, CoverageBitsets
+from spatial_index import SpatialHashIndex, SeparationMonitor
+from geofence import GeofenceEngine, DEFAULT_AREA_BOUNDS
+from profiling import PhaseTimer
+from aggregation import BatchAggregator, markdown_table
+from results_store import ResultsSink, aggregate_results, build_time_series, iter_rows
+from sampling import sample_routes, scenario_rng
+from path_planner import GridPathPlanner
+from pool import SimulationPool
+from failures import RecoveryTracker, failure_process_events
+from redistribution import WaypointRedistributor
+from shared_state import SharedFleetState
+from telemetry import TelemetryServer
+from energy import EnergyModel
+from snapshot import (SimulationSnapshot, copy_interface_state, restore_rng_state, restore_tree_state,
+                      rng_state, tree_state)
 
 
 # === VISUALIZAÇÃO ===
-def draw_frame(tick, interface: DroneMissionInterface, coalition_id, path_data, output_dir="debug_frames"):
+def draw_frame(tick, interface: DroneMissionInterface, coalition_id, path_data, output_dir="debug_frames",
+               area_bounds=DEFAULT_AREA_BOUNDS, geofence: GeofenceEngine = None):
+    # Importado sob demanda: execuções headless (batch) não pagam o custo do matplotlib
+    import matplotlib.pyplot as plt
+    
     os.makedirs(output_dir, exist_ok=True)
     plt.figure(figsize=(6,6))
     
+    if geofence is not None:
+        for zone in geofence.zones:
+            color = 'green' if zone.kind == 'corridor' else 'orange'
+            plt.fill(zone.polygon[:, 0], zone.polygon[:, 1], color=color, alpha=0.2)
+    
     for route in interface.routes.values():
         if route:
             px, py = zip(*route)
@@ -36,15 +57,23 @@ def draw_frame(tick, interface: DroneMissionInterface, coalition_id, path_data,
             tx, ty = zip(*trajectory)
             plt.plot(tx, ty, c='lightblue', alpha=0.7)
             
-        color = 'blue' if s['status'] == 'PATROL' else ('red' if s['status'] == 'FAILURE' else 'green')
+        color = {'PATROL': 'blue', 'FAILURE': 'red', 'RETURNING': 'orange'}.get(s['status'], 'green')
         plt.scatter(x, y, c=color, s=120, label=f"Drone {drone_id}")
         plt.text(x+0.2, y+0.2, f"{drone_id}\n{int(s['battery'])}%", fontsize=8)
         
-    plt.scatter(0, 0, c='gray', s=120, marker='s', label='Base')
+    if interface.energy_model is None:
+        plt.scatter(0, 0, c='gray', s=120, marker='s', label='Base')
+    else:
+        # Todas as bases, com vagas ocupadas e fila
+        for k, base in enumerate(interface.energy_model.network.bases.values()):
+            plt.scatter(base.position[0], base.position[1], c='gray', s=120, marker='s', label='Bases' if k == 0 else None)
+            slots = base.slots if base.slots is not None else '∞'
+            plt.text(base.position[0] + 0.2, base.position[1] - 0.4,
+                     f"{base.id} {len(base.charging)}/{slots}" + (f" +{len(base.queue)}" if base.queue else ""), fontsize=7)
     
     plt.title(f"Tick {tick} | Coalizão: {coalition_id}")
-    plt.xlim(-1, 10)
-    plt.ylim(-1, 10)
+    plt.xlim(area_bounds[0], area_bounds[1])
+    plt.ylim(area_bounds[2], area_bounds[3])
     plt.grid(True)
     plt.legend(loc='upper right', fontsize=8)
     
@@ -53,151 +82,523 @@ def draw_frame(tick, interface: DroneMissionInterface, coalition_id, path_data,
 
 
 # === SIMULAÇÃO ===
-def run_simulation(config_path="mission_config.json", disable_visual=False, return_metrics=False):
+class MissionSimulation:
     """
-    Executa a simulação do Case Study 2 com eventos dinâmicos:
-    - Falha de drone (D2) no tick 100
-    - Novo POI e missão de resgate no tick 150 (replanejamento dinâmico)
+    Estado completo de uma execução do Case Study 2, avançado tick a tick.
+
+    Eventos dinâmicos (configuráveis por `configure_events` ou pelas chaves `failure_events`,
+    `poi_tick` e `poi_route` da configuração):
+    - Falha de drone (padrão: D2 no tick 100)
+    - Novo POI e missão de resgate (padrão: tick 150, replanejamento dinâmico)
+    - Com a chave `failure_process`: falhas estocásticas por drone, quedas regionais e reparos
+      (ver `failures.py`), cada falha disparando uma rodada de replanejamento do MAS e tendo a
+      latência de recuperação medida
+    - Com a chave `waypoint_redistribution`: os pontos de patrulha do drone em falha são inseridos
+      nas rotas dos membros sobreviventes da coalizão (ver `redistribution.py`) e devolvidos a ele
+      quando é reparado
+
+    `snapshot()`/`restore()` salvam e recuperam todo o estado mutável, e `snapshot.run_branches`
+    executa vários ramos "e se" a partir de um prefixo comum já simulado. Com `pool`, os objetos
+    da simulação (interface, MockPyFly, agentes, árvores) são reiniciados e reutilizados.
     """
-    log_event("Iniciando simulação (Case Study 2)...")
-    
-    try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-    except FileNotFoundError:
-        log_event(f"Erro: Arquivo de configuração não encontrado em {config_path}")
-        return
-    
-    SIMULATION_TICKS = config.get("simulation_ticks", 10)
-    TICK_DELAY = config.get("tick_delay_seconds", 0.1)
-    PYFLY_CONFIG = config.get("pyfly_config_path", "")
-    PYFLY_PARAM = config.get("pyfly_param_path", "")
-    
-    interface = DroneMissionInterface()
-    skywalker = MockPyFly(PYFLY_CONFIG, PYFLY_PARAM)
-    
-    pas, broker, ypa, mra, cla = PAS(), Broker(), YPA(), MRA(), CLA()
-    
-    drone_trees = {}
-    drone_resources = []
-    trajectory_data = {} 
-    
-    # --- Inicialização dos Drones ---
-    for drone_conf in config.get("drones", []):
-        drone_id = drone_conf["id"]
-        resource = CandidateResource(
-            id=drone_id,
-            skills=drone_conf.get("skills", []),
-            cost=drone_conf.get("cost", 1),
-            time=drone_conf.get("time", 1),
-            quality=drone_conf.get("quality", 1),
-            battery=drone_conf.get("initial_battery", 100),
-            position=tuple(drone_conf.get("initial_position", (0,0))),
-            available=True
+    def __init__(self, config: Dict, disable_visual: bool = True, record_battery: bool = False,
+                 pool: Optional[SimulationPool] = None):
+        self.config = config
+        self.disable_visual = disable_visual
+        self.record_battery = record_battery
+        # Início dos logs desta execução (a lista de logs é global e compartilhada entre execuções)
+        self.log_start = len(SIMULATION_LOGS)
+        
+        self.ticks = config.get("simulation_ticks", 10)
+        self.tick_delay = config.get("tick_delay_seconds", 0.1)
+        self.separation_distance = config.get("separation_distance", 0.5)
+        self.area_bounds = tuple(config.get("area_bounds", DEFAULT_AREA_BOUNDS))
+        self.failure_conf = config.get("failure_process")
+        self.configure_events(
+            failure_events=config.get("failure_events", [] if self.failure_conf else [{"tick": 100, "drone": "D2"}]),
+            poi_tick=config.get("poi_tick", 150),
+            poi_route=config.get("poi_route", [(5, 5), (6, 6)]),
+            outages=[],
         )
-        drone_resources.append(resource)
+        # {drone: tick do reparo} dos drones em falha com reparo previsto
+        self.failed_until: Dict[str, int] = {}
+        # Drones que falharam / foram reparados no tick corrente (para a redistribuição de pontos)
+        self.failed_now: List[str] = []
+        self.repaired_now: List[str] = []
+        self.redistributor = WaypointRedistributor.from_config(config)
         
-        if drone_conf.get("route_type") == "random_patrol":
-            patrol_points = [(random.uniform(1,9), random.uniform(1,9)) for _ in range(drone_conf.get("route_points", 3))]
-        elif drone_conf.get("route_type") == "fixed_patrol":
-            patrol_points = [tuple(p) for p in drone_conf.get("route", [])]
+        cell_size = config.get("spatial_cell_size", self.separation_distance)
+        pyfly_args = (config.get("pyfly_config_path", ""), config.get("pyfly_param_path", ""))
+        if pool is not None:
+            self.interface, self.skywalker, agents = pool.prepare(cell_size, pyfly_args)
+            self.spatial_index = self.interface.spatial_index
         else:
-            patrol_points = []
-            
-        interface.assign_route(drone_id, patrol_points)
-        interface.update_drone_state(drone_id, resource.battery, resource.position, status='IDLE')
-        trajectory_data[drone_id] = [resource.position]
+            self.spatial_index = SpatialHashIndex(cell_size=cell_size)
+            self.interface = DroneMissionInterface(spatial_index=self.spatial_index)
+            self.skywalker = MockPyFly(*pyfly_args)
+            agents = (PAS(), Broker(), YPA(), MRA(), CLA())
+        self.pas, self.broker, self.ypa, self.mra, self.cla = agents
+        # Com a chave `shared_state`, o estado da frota também é publicado em memória compartilhada
+        self.shared_state = self.interface.shared_state = SharedFleetState.from_config(config)
+        # Com a chave `telemetry`, o estado de cada tick é transmitido por TCP (deltas + keyframes)
+        self.telemetry = TelemetryServer.from_config(config)
+        # Com a chave `energy_model`, retorno preditivo à base (com voo de volta e recarga) no lugar do limiar de 30%
+        self.interface.energy_model = EnergyModel.from_config(config)
+        
+        self.timer = PhaseTimer.from_config(config)
+        self.timer.instrument(self.pas, ["create_contract_template"])
+        self.timer.instrument(self.broker, ["transmit_request"])
+        self.timer.instrument(self.ypa, ["store_request_json"])
+        self.timer.instrument(self.mra, ["identify_candidates", "identify_nearest_candidates"])
+        self.timer.instrument(self.cla, ["create_coalition_contract", "recruit_members"])
         
-        tree = create_behavior_tree(drone_id, interface, skywalker)
-        drone_trees[drone_id] = tree
+        self.geofence = GeofenceEngine.from_config(config)
+        planner_conf = config.get("planner", {})
+        planner_grid = planner_conf.get("grid_size", 50)
+        self.planner = GridPathPlanner(
+            self.area_bounds,
+            grid_size=planner_grid,
+            no_fly_cells=[tuple(c) for c in planner_conf.get("no_fly_cells", [])] + self.geofence.no_fly_cells(planner_grid)
+        )
+        
+        self.drone_trees = {}
+        self.drone_resources = []
+        self.trajectory_data = {} 
+        self.battery_data = {}
         
-    coalition_id = None
+        # --- Inicialização dos Drones ---
+        for k, drone_conf in enumerate(config.get("drones", [])):
+            drone_id = drone_conf["id"]
+            resource = CandidateResource(
+                id=drone_id,
+                skills=drone_conf.get("skills", []),
+                cost=drone_conf.get("cost", 1),
+                time=drone_conf.get("time", 1),
+                quality=drone_conf.get("quality", 1),
+                battery=drone_conf.get("initial_battery", 100),
+                position=tuple(drone_conf.get("initial_position", (0,0))),
+                available=True
+            )
+            self.drone_resources.append(resource)
+            
+            if drone_conf.get("route_type") == "random_patrol":
+                patrol_points = [(random.uniform(1,9), random.uniform(1,9)) for _ in range(drone_conf.get("route_points", 3))]
+            elif drone_conf.get("route_type") == "fixed_patrol":
+                patrol_points = [tuple(p) for p in drone_conf.get("route", [])]
+            else:
+                patrol_points = []
+                
+            self.interface.assign_route(drone_id, patrol_points)
+            self.interface.update_drone_state(drone_id, resource.battery, resource.position, status='IDLE')
+            self.trajectory_data[drone_id] = [resource.position]
+            self.battery_data[drone_id] = [resource.battery]
+            
+            self.drone_trees[drone_id] = (pool.tree(k, drone_id) if pool is not None
+                                          else create_behavior_tree(drone_id, self.interface, self.skywalker))
+            
+        self.resource_by_id = {res.id: res for res in self.drone_resources}
+        self.coalition_id = None
+        self.t = 0
+        self.recovery = None
+        if self.failure_conf:
+            failures, outages = failure_process_events(config, list(self.drone_trees), self.ticks, self.area_bounds)
+            self.configure_events(failure_events=self.failure_events + failures, outages=outages)
+            self.recovery = RecoveryTracker(window=self.failure_conf.get("coverage_window", 20),
+                                            tolerance=self.failure_conf.get("coverage_tolerance", 0.95))
+            log_event(f"PROCESSO DE FALHAS: {len(failures)} falhas e {len(outages)} quedas regionais programadas.")
+        # Fração das células observadas na janela recente (base da recuperação de cobertura)
+        self.fresh_coverage = 0.0
+        self.geofence.check_routes(0, self.interface.routes)
+        # Latência de revisita por célula, atualizada a cada tick com as posições da frota
+        self.revisit = RevisitTracker(self.area_bounds)
+        self.revisit.update(0, [trajectory[-1] for trajectory in self.trajectory_data.values()])
+        # Com a chave `coverage` ({"store": "sparse", ...}), a cobertura vem da grade esparsa incremental
+        self.coverage_grid = SparseCoverageGrid.from_config(config, self.area_bounds)
+        self.drone_index = np.arange(len(self.trajectory_data))
+        if self.coverage_grid is not None:
+            self.coverage_grid.update([trajectory[-1] for trajectory in self.trajectory_data.values()], self.drone_index)
+        # Cobertura por drone em bitsets, para a matriz de sobreposição entre pares
+        self.coverage_bits = CoverageBitsets(len(self.trajectory_data), self.area_bounds)
+        self.coverage_bits.update([trajectory[-1] for trajectory in self.trajectory_data.values()])
+        # Conflitos de separação só fazem sentido entre drones em voo
+        self.separation_monitor = SeparationMonitor(self.spatial_index, self.separation_distance, predicate=self._in_flight)
+    
+    def _in_flight(self, drone_id) -> bool:
+        return self.interface.get_state(drone_id)['status'] in ('PATROL', 'RETURNING')
+    
+    def configure_events(self, failure_events=None, poi_tick=None, poi_route=None, outages=None):
+        """Redefine os eventos dinâmicos ainda não ocorridos (ex.: num ramo após um snapshot)."""
+        if failure_events is not None:
+            self.failure_events = [dict(e) for e in failure_events]
+            self.failures_by_tick: Dict[int, List[Dict]] = {}
+            for event in self.failure_events:
+                self.failures_by_tick.setdefault(event["tick"], []).append(event)
+        if outages is not None:
+            self.outages = [dict(o) for o in outages]
+            self.outages_by_tick: Dict[int, List[Dict]] = {}
+            for outage in self.outages:
+                self.outages_by_tick.setdefault(outage["tick"], []).append(outage)
+        if poi_tick is not None:
+            self.poi_tick = poi_tick
+        if poi_route is not None:
+            self.poi_route = [tuple(p) for p in poi_route]
     
-    # --- Loop Principal ---
-    for t in range(SIMULATION_TICKS):
-        if not disable_visual:
+    def step(self):
+        """Executa o tick `self.t`."""
+        t = self.t
+        interface, timer = self.interface, self.timer
+        if not self.disable_visual:
             log_event(f"[Tempo t={t}]")
+        if self.shared_state is not None:
+            self.shared_state.begin_tick(t)
+        if interface.energy_model is not None:
+            interface.energy_model.network.tick = t
         
         # === 1. EVENTOS DINÂMICOS ===
-        if t == 100:
-            failed_drone_id = "D2"
-            
-            # Atualiza o estado do drone
-            state = interface.get_state(failed_drone_id)
-            interface.update_drone_state(failed_drone_id, battery=state['battery'], position=state['position'], status='FAILURE')
-            log_event(f"EVENTO DINÂMICO: Drone {failed_drone_id} falhou no tick {t}. Status: FAILURE.")
-            
-            # Marca o recurso como indisponível
-            for res in drone_resources:
-                if res.id == failed_drone_id:
-                    res.available = False
-                    log_event(f"MAS: Recurso {failed_drone_id} marcado como indisponível para contratação.")
+        fleet_changed = False
+        self.failed_now, self.repaired_now = [], []
+        with timer.phase("dynamic_events"):
+            for drone_id in [d for d, repair_tick in self.failed_until.items() if repair_tick == t]:
+                self._repair_drone(drone_id, t)
+                fleet_changed = True
+            for outage in self.outages_by_tick.get(t, ()):
+                hit = self.spatial_index.query_radius(outage["center"], outage["radius"])
+                log_event(f"EVENTO DINÂMICO: Queda regional em {outage['center']} (raio {outage['radius']}) no tick {t} "
+                          f"atinge {len(hit)} drones.")
+                for drone_id, _ in hit:
+                    fleet_changed |= self._fail_drone(drone_id, t, t + outage["duration"], "outage")
+            for event in self.failures_by_tick.get(t, ()):
+                fleet_changed |= self._fail_drone(event["drone"], t, event.get("repair_tick"), event.get("cause", "scripted"))
         
         # === 2. LÓGICA DO MAS ===
-        if t % config.get("mas_config", {}).get("contract_frequency", 1) == 0 or t == 150:
-            
-            if t == 150:
-                contract_skills = ["rescue"]
-                log_event(f"EVENTO DINÂMICO: Novo POI (Missão de Resgate) surgiu no tick {t}.")
-            else:
-                contract_skills = config.get("mas_config", {}).get("contract_skills", [])
-            
-            template = pas.create_contract_template(contract_skills)
-            broker.transmit_request(template, ypa)
+        poi_event = t == self.poi_tick
+        # Com o processo de falhas, cada falha/reparo dispara uma rodada de replanejamento
+        replan_event = fleet_changed and self.recovery is not None and self.failure_conf.get("replan_on_failure", True)
+        if t % self.config.get("mas_config", {}).get("contract_frequency", 1) == 0 or poi_event or replan_event:
+            round_start = time.perf_counter()
+            with timer.phase("mas_contracting"):
+                if poi_event:
+                    contract_skills = ["rescue"]
+                    log_event(f"EVENTO DINÂMICO: Novo POI (Missão de Resgate) surgiu no tick {t}.")
+                else:
+                    contract_skills = self.config.get("mas_config", {}).get("contract_skills", [])
+                
+                template = self.pas.create_contract_template(contract_skills)
+                self.broker.transmit_request(template, self.ypa)
             
-            # Atualiza disponibilidade (considera falha e recarga)
-            for res in drone_resources:
-                state = interface.get_state(res.id)
-                res.battery = state['battery']
-                res.position = state['position']
-                res.available = (state['status'] not in ['REFUELING', 'FAILURE'])
+                # Atualiza disponibilidade (considera falha e recarga)
+                for res in self.drone_resources:
+                    state = interface.get_state(res.id)
+                    res.battery = state['battery']
+                    res.position = state['position']
+                    res.available = (state['status'] not in ['REFUELING', 'RETURNING', 'FAILURE'])
                 
-            candidates = mra.identify_candidates(drone_resources, template.required_skills)
-            contract = cla.create_coalition_contract(template.required_skills)
-            cla.recruit_members(candidates, contract)
-            coalition_id = contract.id
+                if poi_event:
+                    # O drone disponível mais próximo do POI é selecionado via índice espacial
+                    candidates = self.mra.identify_nearest_candidates(
+                        self.drone_resources, template.required_skills, self.spatial_index, self.poi_route[0],
+                        k=self.config.get("poi_nearest_candidates", 1)
+                    )
+                else:
+                    candidates = self.mra.identify_candidates(self.drone_resources, template.required_skills)
+                contract = self.cla.create_coalition_contract(template.required_skills)
+                self.cla.recruit_members(candidates, contract)
+                self.coalition_id = contract.id
+                if self.recovery is not None:
+                    self.recovery.on_coalition(t, [s for s in contract.required_skills
+                                                   if any(s in self.resource_by_id[m].skills for m in contract.members)])
+                if self.telemetry is not None:
+                    self.telemetry.event("coalition", contract=contract.id, skills=list(template.required_skills),
+                                         members=list(contract.members), poi=poi_event)
             
-            # === 3. REPLANEJAMENTO ===
-            if t == 150 and contract.members:
-                recruited_drone_id = contract.members[0]
-                poi_route = [(5, 5), (6, 6)]
-                interface.assign_route(recruited_drone_id, poi_route)
-                log_event(f"REPLANEJAMENTO: Drone {recruited_drone_id} recrutado para POI. Nova rota atribuída: {poi_route}.")
+                # === 3. REPLANEJAMENTO ===
+                if poi_event and contract.members:
+                    recruited_drone_id = contract.members[0]
+                    # Trânsito até o primeiro POI uma única vez; a patrulha repete só o laço dos POIs
+                    approach = self.planner.plan(interface.get_position(recruited_drone_id), self.poi_route[0])
+                    poi_route = self.planner.plan_cycle(self.poi_route)
+                    interface.assign_route(recruited_drone_id, poi_route, approach=approach)
+                    self.geofence.check_routes(t, interface.routes)
+                    log_event(f"REPLANEJAMENTO: Drone {recruited_drone_id} recrutado para POI. "
+                              f"Aproximação: {approach}. Nova rota atribuída: {poi_route}.")
+                    if self.telemetry is not None:
+                        self.telemetry.event("replan", drone=recruited_drone_id, route=[list(p) for p in poi_route],
+                                             approach=[list(p) for p in approach])
+            if replan_event:
+                self.recovery.on_replan(time.perf_counter() - round_start)
+        
+        if self.redistributor is not None and (self.failed_now or self.repaired_now):
+            with timer.phase("redistribution"):
+                self._redistribute_waypoints(t)
         
         # === 4. EXECUÇÃO DAS BEHAVIOR TREES ===
-        for drone_id, tree in drone_trees.items():
-            tree.tick()
-            current_pos = interface.get_state(drone_id)['position']
-            trajectory_data[drone_id].append(current_pos)
+        with timer.phase("bt_ticks"):
+            for tree in self.drone_trees.values():
+                tree.tick()
+        if self.shared_state is not None:
+            self.shared_state.end_tick()
+        
+        with timer.phase("trajectory_recording"):
+            for drone_id in self.drone_trees:
+                self.trajectory_data[drone_id].append(interface.get_state(drone_id)['position'])
+            positions = [self.trajectory_data[drone_id][-1] for drone_id in self.drone_trees]
+            self.revisit.update(t + 1, positions)
+            if self.coverage_grid is not None:
+                self.coverage_grid.update(positions, self.drone_index)
+            self.coverage_bits.update(positions)
+            if self.recovery is not None:
+                recent = self.revisit.last_visit >= t + 1 - self.recovery.window
+                self.fresh_coverage = np.count_nonzero(recent) / recent.size
+                self.recovery.on_tick_end(t, self.fresh_coverage)
+            if self.record_battery:
+                for drone_id in self.drone_trees:
+                    self.battery_data[drone_id].append(interface.get_state(drone_id)['battery'])
+        
+        with timer.phase("monitoring"):
+            self.separation_monitor.check(t)
+            self.geofence.check_positions(t, list(self.drone_trees), [interface.get_position(d) for d in self.drone_trees])
+        if interface.energy_model is not None:
+            # Eventos das bases (atribuição, fila, início/fim de recarga)
+            for event in interface.energy_model.network.pop_events():
+                if self.telemetry is not None:
+                    self.telemetry.event("base_" + event.pop("kind"), **event)
+        if self.telemetry is not None:
+            with timer.phase("telemetry"):
+                self.telemetry.publish(t, interface.states)
             
-        if not disable_visual:
-            draw_frame(t, interface, coalition_id, trajectory_data)
-        time.sleep(TICK_DELAY)
+        if not self.disable_visual:
+            with timer.phase("rendering"):
+                draw_frame(t, interface, self.coalition_id, self.trajectory_data, area_bounds=self.area_bounds, geofence=self.geofence)
+        with timer.phase("sleep"):
+            time.sleep(self.tick_delay)
+        self.t += 1
+    
+    def _fail_drone(self, drone_id: str, t: int, repair_tick: Optional[int], cause: str) -> bool:
+        """Coloca o drone em FAILURE (reparo em `repair_tick`, ou nunca). Retorna False se ele já estava em falha."""
+        state = self.interface.get_state(drone_id)
+        if state['status'] == 'FAILURE':
+            # Já em falha: o reparo passa a ser o mais tardio (ou nenhum, se a nova falha é permanente)
+            if drone_id in self.failed_until:
+                if repair_tick is None:
+                    del self.failed_until[drone_id]
+                else:
+                    self.failed_until[drone_id] = max(self.failed_until[drone_id], repair_tick)
+            return False
+        self.interface.update_drone_state(drone_id, battery=state['battery'], position=state['position'], status='FAILURE')
+        log_event(f"EVENTO DINÂMICO: Drone {drone_id} falhou no tick {t}. Status: FAILURE.")
+        if self.telemetry is not None:
+            self.telemetry.event("failure", drone=drone_id, cause=cause)
         
-    skywalker.close()
+        # Marca o recurso como indisponível
+        resource = self.resource_by_id.get(drone_id)
+        if resource is not None:
+            resource.available = False
+            log_event(f"MAS: Recurso {drone_id} marcado como indisponível para contratação.")
+        if repair_tick is not None:
+            self.failed_until[drone_id] = repair_tick
+        self.failed_now.append(drone_id)
+        if self.recovery is not None:
+            contract_skills = self.config.get("mas_config", {}).get("contract_skills", [])
+            lost = [s for s in contract_skills if resource is not None and s in resource.skills]
+            self.recovery.on_failure(t, drone_id, lost, self.fresh_coverage, cause)
+        return True
     
-    # === MÉTRICAS ===
-    drone_ids = list(trajectory_data.keys())
-    area_bounds = (-1.0, 10.0, -1.0, 10.0)
+    def _repair_drone(self, drone_id: str, t: int):
+        """Fim do reparo: o drone volta a IDLE (a BT retoma a patrulha) e fica disponível para o MAS."""
+        del self.failed_until[drone_id]
+        state = self.interface.get_state(drone_id)
+        self.interface.update_drone_state(drone_id, battery=state['battery'], position=state['position'], status='IDLE')
+        log_event(f"EVENTO DINÂMICO: Drone {drone_id} reparado no tick {t}. Status: IDLE.")
+        if self.telemetry is not None:
+            self.telemetry.event("repair", drone=drone_id)
+        resource = self.resource_by_id.get(drone_id)
+        if resource is not None:
+            resource.available = True
+        self.repaired_now.append(drone_id)
     
-    try:
-        area_coverage, route_redundancy = calculate_area_coverage_and_redundancy(trajectory_data, area_bounds)
-    except Exception as e:
-        log_event(f"Erro ao calcular métricas: {e}")
-        area_coverage, route_redundancy = 0.0, 0.0
-
-    try:
-        recharge_counts = calculate_individual_autonomy(SIMULATION_LOGS, drone_ids)
-    except Exception as e:
-        log_event(f"Erro autonomia: {e}")
-        recharge_counts = {did: 0 for did in drone_ids}
+    def _redistribute_waypoints(self, t: int):
+        """Repassa as rotas dos drones que falharam neste tick e devolve as dos que foram reparados."""
+        changed = []
+        for drone_id in self.repaired_now:
+            changed += self.redistributor.give_back(t, drone_id, self.interface, self.drone_trees)
+        members = self.cla.coalitions[-1].members if self.cla.coalitions else []
+        for drone_id in self.failed_now:
+            changed += list(self.redistributor.redistribute(t, drone_id, self.interface, self.drone_trees, members))
+        if changed:
+            self.geofence.check_routes(t, self.interface.routes)
+        if self.telemetry is not None:
+            for drone_id in dict.fromkeys(changed):
+                self.telemetry.event("replan", drone=drone_id, route=[list(p) for p in self.interface.routes[drone_id]])
     
-    if return_metrics:
+    def run_until(self, tick: int):
+        """Avança até o início do tick `tick` (no máximo até o fim da simulação)."""
+        while self.t < min(tick, self.ticks):
+            self.step()
+    
+    def metrics(self) -> Dict:
+        """Métricas da execução até o tick atual (mesmo formato de `run_simulation(return_metrics=True)`)."""
+        drone_ids = list(self.trajectory_data.keys())
+        try:
+            if self.coverage_grid is not None:
+                area_coverage, route_redundancy = self.coverage_grid.coverage_and_redundancy()
+            else:
+                area_coverage, route_redundancy = calculate_area_coverage_and_redundancy(self.trajectory_data, self.area_bounds)
+        except Exception as e:
+            log_event(f"Erro ao calcular métricas: {e}")
+            area_coverage, route_redundancy = 0.0, 0.0
+
+        try:
+            recharge_counts = calculate_individual_autonomy(SIMULATION_LOGS[self.log_start:], drone_ids)
+        except Exception as e:
+            log_event(f"Erro autonomia: {e}")
+            recharge_counts = {did: 0 for did in drone_ids}
+        
         metrics = {
             "area_coverage": area_coverage,
-            "route_redundancy": route_redundancy
+            "route_redundancy": route_redundancy,
+            "separation_conflicts": self.separation_monitor.total_conflicts,
+            "geofence_violations": len(self.geofence.violations),
+            **self.revisit.summary()[0],
+            "pairwise_overlap_max": self.coverage_bits.max_overlap(),
         }
+        if self.coverage_grid is not None:
+            # Níveis mais grossos da grade esparsa (area_coverage_x<fator>, route_redundancy_x<fator>)
+            metrics.update({k: v for k, v in self.coverage_grid.metrics().items() if k not in metrics})
+        if self.recovery is not None:
+            metrics.update(self.recovery.summary())
+        if self.redistributor is not None:
+            metrics.update(self.redistributor.summary())
+        if self.interface.energy_model is not None:
+            metrics.update(self.interface.energy_model.network.summary())
         metrics.update({f"recharge_count_{d}": recharge_counts.get(d, 0) for d in drone_ids})
+        metrics.update(self.timer.summary())
+        return metrics
+    
+    # --- Snapshot / restauração ---
+    def snapshot(self) -> SimulationSnapshot:
+        """Salva todo o estado mutável da simulação no tick atual."""
+        return SimulationSnapshot(
+            tick=self.t,
+            interface=copy_interface_state(self.interface),
+            trees={d: tree_state(tree) for d, tree in self.drone_trees.items()},
+            resources=copy.deepcopy(self.drone_resources),
+            mas={"ypa_records": copy.deepcopy(self.ypa.records), "cla_coalitions": copy.deepcopy(self.cla.coalitions),
+                 "coalition_id": self.coalition_id},
+            events={"failure_events": copy.deepcopy(self.failure_events), "poi_tick": self.poi_tick,
+                    "poi_route": list(self.poi_route), "outages": copy.deepcopy(self.outages)},
+            failures={"failed_until": dict(self.failed_until), "recovery": copy.deepcopy(self.recovery),
+                      "fresh_coverage": self.fresh_coverage, "redistributor": copy.deepcopy(self.redistributor)},
+            energy=copy.deepcopy(self.interface.energy_model),
+            rng=rng_state(),
+            trajectory_data={d: list(v) for d, v in self.trajectory_data.items()},
+            battery_data={d: list(v) for d, v in self.battery_data.items()},
+            monitors={"separation_active": set(self.separation_monitor.active_pairs),
+                      "separation_total": self.separation_monitor.total_conflicts,
+                      "geofence_active": set(self.geofence.active), "geofence_violations": list(self.geofence.violations)},
+            planner_blocked=self.planner.blocked.copy(),
+            revisit=copy.deepcopy(self.revisit),
+            coverage_grid=copy.deepcopy(self.coverage_grid),
+            coverage_bits=self.coverage_bits.bits.copy(),
+            logs=SIMULATION_LOGS[self.log_start:],
+        )
+    
+    def restore(self, snapshot: SimulationSnapshot):
+        """Restaura um estado salvo por `snapshot()` desta mesma simulação (mesma configuração)."""
+        self.t = snapshot.tick
+        state = copy.deepcopy(snapshot.interface)
+        self.interface.routes, self.interface.states, self.interface.missions = state["routes"], state["states"], state["missions"]
+        self.interface.energy_model = copy.deepcopy(snapshot.energy)
+        if self.interface.energy_model is not None:
+            self.interface.return_energy = {d: self.interface.energy_model.return_table(r) for d, r in self.interface.routes.items()}
+        # O índice espacial é derivado das posições: reconstruído do zero
+        self.spatial_index = SpatialHashIndex(cell_size=self.spatial_index.cell_size)
+        for drone_id, s in self.interface.states.items():
+            self.spatial_index.update(drone_id, s['position'])
+        self.interface.spatial_index = self.separation_monitor.index = self.spatial_index
+        for drone_id, tree in self.drone_trees.items():
+            restore_tree_state(tree, snapshot.trees[drone_id])
+        self.drone_resources = copy.deepcopy(snapshot.resources)
+        self.resource_by_id = {res.id: res for res in self.drone_resources}
+        self.failed_until = dict(snapshot.failures["failed_until"])
+        self.recovery = copy.deepcopy(snapshot.failures["recovery"])
+        self.fresh_coverage = snapshot.failures["fresh_coverage"]
+        self.redistributor = copy.deepcopy(snapshot.failures["redistributor"])
+        self.ypa.records = copy.deepcopy(snapshot.mas["ypa_records"])
+        self.cla.coalitions = copy.deepcopy(snapshot.mas["cla_coalitions"])
+        self.coalition_id = snapshot.mas["coalition_id"]
+        self.configure_events(**snapshot.events)
+        restore_rng_state(snapshot.rng)
+        self.trajectory_data = {d: list(v) for d, v in snapshot.trajectory_data.items()}
+        self.battery_data = {d: list(v) for d, v in snapshot.battery_data.items()}
+        self.separation_monitor.active_pairs = set(snapshot.monitors["separation_active"])
+        self.separation_monitor.total_conflicts = snapshot.monitors["separation_total"]
+        self.geofence.active = set(snapshot.monitors["geofence_active"])
+        self.geofence.violations = list(snapshot.monitors["geofence_violations"])
+        if not np.array_equal(self.planner.blocked, snapshot.planner_blocked):
+            self.planner.blocked = snapshot.planner_blocked.copy()
+            self.planner.invalidate()
+        self.revisit = copy.deepcopy(snapshot.revisit)
+        self.coverage_grid = copy.deepcopy(snapshot.coverage_grid)
+        self.coverage_bits.bits = snapshot.coverage_bits.copy()
+        SIMULATION_LOGS[self.log_start:] = snapshot.logs
+        if self.shared_state is not None:
+            self.shared_state.publish(self.t, self.interface.states)
+    
+    def close(self):
+        """Encerra o MockPyFly e libera o estado compartilhado e a telemetria, se houver."""
+        self.skywalker.close()
+        if self.shared_state is not None:
+            self.shared_state.close()
+            self.shared_state = self.interface.shared_state = None
+        if self.telemetry is not None:
+            self.telemetry.close()
+            self.telemetry = None
+
+
+def run_simulation(config_path="mission_config.json", disable_visual=False, return_metrics=False, time_series=None,
+                   pool: Optional[SimulationPool] = None):
+    """
+    Executa a simulação do Case Study 2 com eventos dinâmicos (ver `MissionSimulation`):
+    - Falha de drone (D2) no tick 100
+    - Novo POI e missão de resgate no tick 150 (replanejamento dinâmico)
+    `config_path` também pode ser o dicionário de configuração já carregado.
+    Se `time_series` for um dicionário, ele recebe as colunas da série temporal por drone
+    (posição e bateria a cada tick).
+    Com `pool` (`SimulationPool`), os objetos da simulação são reutilizados entre execuções.
+    """
+    log_event("Iniciando simulação (Case Study 2)...")
+    
+    if isinstance(config_path, dict):
+        # Configuração já carregada (ex.: pontos de uma varredura de parâmetros)
+        config = config_path
+    else:
+        try:
+            with open(config_path, 'r') as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            log_event(f"Erro: Arquivo de configuração não encontrado em {config_path}")
+            return
+    
+    sim = MissionSimulation(config, disable_visual=disable_visual, record_battery=time_series is not None, pool=pool)
+    sim.run_until(sim.ticks)
+    sim.close()
+    
+    trace_path = config.get("profiling", {}).get("trace_path")
+    if sim.timer.trace and trace_path:
+        sim.timer.export_chrome_trace(trace_path)
+        log_event(f"Trace de execução exportado: {trace_path}")
+    
+    # === MÉTRICAS ===
+    metrics = sim.metrics()
+    heatmap_path = config.get("revisit_heatmap_path")
+    if heatmap_path:
+        sim.revisit.export_heatmap(heatmap_path)
+        log_event(f"Mapa de calor de revisita exportado: {heatmap_path}")
+    
+    if time_series is not None:
+        time_series.update(build_time_series(0, sim.trajectory_data, sim.battery_data))
+    
+    if return_metrics:
         return metrics
     
     # === RELATÓRIO ===
@@ -206,28 +607,42 @@ def run_simulation(config_path="mission_config.json", disable_visual=False, retu
 
 | Métrica | Valor |
 | :--- | :--- |
-| **Cobertura Média da Área (%)** | {area_coverage:.2f} |
-| **Redundância de Rota (%)** | {route_redundancy:.2f} |
+| **Cobertura Média da Área (%)** | {metrics['area_coverage']:.2f} |
+| **Redundância de Rota (%)** | {metrics['route_redundancy']:.2f} |
+| **Intervalo Médio de Revisita (ticks)** | {metrics['revisit_gap_mean']:.2f} |
+| **Maior Intervalo sem Observação (ticks)** | {metrics['revisit_gap_max']} |
+| **Maior Sobreposição entre Pares (%)** | {metrics['pairwise_overlap_max']:.2f} |
 """
+    splits = sim.cla.suggest_splits(list(sim.trajectory_data), CoverageBitsets.overlap_fraction(sim.coverage_bits.overlap()))
+    if splits:
+        report += "\n## Pares com Patrulha Sobreposta (sugestões do CLA)\n\n| Drone A | Drone B | Cobertura Compartilhada (%) |\n| :--- | :--- | :--- |\n"
+        report += "".join(f"| {a} | {b} | {f:.2f} |\n" for a, b, f in splits)
     with open("relatorio_case2.md", "w") as f:
         f.write(report)
     
-    frames = [imageio.v2.imread(f"debug_frames/frame_{t:03d}.png") for t in range(SIMULATION_TICKS) if os.path.exists(f"debug_frames/frame_{t:03d}.png")]
+    import imageio
+    
+    frames = [imageio.v2.imread(f"debug_frames/frame_{t:03d}.png") for t in range(sim.ticks) if os.path.exists(f"debug_frames/frame_{t:03d}.png")]
     if frames:
-        imageio.mimsave("simulacao_case2.gif", frames, duration=TICK_DELAY)
+        imageio.mimsave("simulacao_case2.gif", frames, duration=sim.tick_delay)
     
     return "simulacao_case2.gif"
 
 
 # === FUNÇÕES DE BATCH ===
-def generate_random_patrol_config(num_drones: int, num_points: int, area_bounds: Tuple[int, int, int, int] = (1, 9, 1, 9)) -> List[Dict]:
-    min_coord, max_coord = area_bounds[0], area_bounds[1]
+def generate_random_patrol_config(num_drones: int, num_points: int, area_bounds: Tuple[int, int, int, int] = (1, 9, 1, 9),
+                                  sampler: str = "uniform", rng: Optional[np.random.Generator] = None) -> List[Dict]:
+    """
+    Gera rotas de patrulha aleatórias. `sampler` escolhe o amostrador dos pontos ("uniform",
+    "lhs" ou "sobol", ver `sampling.py`); sem `rng`, o gerador numpy é semeado a partir do
+    `random` global, então `random.seed` continua tornando a geração reprodutível.
+    """
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    routes = sample_routes(num_drones, num_points, area_bounds, rng, sampler)
     drone_configs = []
     for i in range(num_drones):
-        patrol_points = [
-            [random.uniform(min_coord, max_coord), random.uniform(min_coord, max_coord)]
-            for _ in range(num_points)
-        ]
+        patrol_points = routes[i].tolist()
         drone_configs.append({
             "id": f"D{i+1}",
             "skills": ["search"],
@@ -242,8 +657,25 @@ def generate_random_patrol_config(num_drones: int, num_points: int, area_bounds:
     return drone_configs
 
 
-def run_batch_simulation(num_batches: int = 10, num_drones: int = 3, num_points: int = 5, config_path: str = "mission_config.json"):
-    log_event(f"Iniciando Batch de {num_batches} Simulações (Case Study 2).")
+def run_batch_simulation(num_batches: int = 10, num_drones: int = 3, num_points: int = 5, config_path: str = "mission_config.json",
+                         keep_rows: bool = False, results_path: str = "batch_results_case2", record_time_series: bool = False,
+                         report_runs: bool = False, ci_targets: Optional[Dict[str, float]] = None,
+                         max_batches: int = 200, min_batches: int = 5, confidence: float = 0.95,
+                         sampler: str = "uniform", seed: Optional[int] = None):
+    """
+    Executa `num_batches` simulações do Case Study 2 e gera o relatório estatístico.
+    As estatísticas são incrementais (memória constante, qualquer tamanho de frota);
+    as linhas individuais só são guardadas em memória com `keep_rows=True`.
+    Cada execução é anexada ao armazenamento colunar `results_path` assim que termina, e o
+    relatório markdown é gerado a partir dos dados armazenados.
+    Com `ci_targets` (ex.: `DEFAULT_CI_TARGETS`), o modo é sequencial; `sampler` e `seed`
+    controlam a geração das rotas (com a mesma `seed`, o Case 1 vê as mesmas rotas): ver o Case 1.
+    """
+    sequential = ci_targets is not None
+    if sequential:
+        log_event(f"Iniciando Batch sequencial (Case Study 2, alvos de IC {ci_targets}, máx. {max_batches}).")
+    else:
+        log_event(f"Iniciando Batch de {num_batches} Simulações (Case Study 2).")
     
     try:
         with open(config_path, 'r') as f:
@@ -252,34 +684,75 @@ def run_batch_simulation(num_batches: int = 10, num_drones: int = 3, num_points:
         log_event(f"Erro: Arquivo de configuração não encontrado em {config_path}")
         return
     
-    results = []
-    for b in range(1, num_batches + 1):
-        log_event(f"\n--- Simulação Batch {b}/{num_batches} ---")
-        new_drones = generate_random_patrol_config(num_drones, num_points)
-        config_copy = base_config.copy()
-        config_copy["drones"] = new_drones
-        temp_path = f"temp_config_batch_{b}.json"
-        with open(temp_path, "w") as f:
-            json.dump(config_copy, f, indent=4)
-        metrics = run_simulation(temp_path, disable_visual=True, return_metrics=True)
-        metrics["batch_id"] = b
-        results.append(metrics)
-    
-    df = pd.DataFrame(results)
-    summary = df.describe().loc[["mean", "std", "min", "max"]]
+    aggregator = BatchAggregator(keep_rows=keep_rows)
+    if sequential:
+        aggregator.converged = False
+    limit = max_batches if sequential else num_batches
+    # Os objetos da simulação (interface, agentes, árvores) são reaproveitados entre os cenários
+    pool = SimulationPool()
+    with ResultsSink(results_path) as sink:
+        for b in range(1, limit + 1):
+            log_event(f"\n--- Simulação Batch {b}/{limit} ---")
+            rng = scenario_rng(seed, b) if seed is not None else None
+            new_drones = generate_random_patrol_config(num_drones, num_points, sampler=sampler, rng=rng)
+            if rng is not None:
+                # Sorteios internos da simulação também vêm do fluxo do cenário
+                random.seed(int(rng.integers(2 ** 63)))
+            config_copy = base_config.copy()
+            config_copy["drones"] = new_drones
+            temp_path = f"temp_config_batch_{b}.json"
+            with open(temp_path, "w") as f:
+                json.dump(config_copy, f, indent=4)
+            series = {} if record_time_series else None
+            metrics = run_simulation(temp_path, disable_visual=True, return_metrics=True, time_series=series, pool=pool)
+            metrics["batch_id"] = b
+            aggregator.add(metrics)
+            if series is not None:
+                series["batch_id"][:] = b
+            sink.append(metrics, series)
+            # Os logs de cada execução já foram consumidos pelas métricas
+            del SIMULATION_LOGS[:]
+            if sequential and b >= min_batches and aggregator.meets_targets(ci_targets, confidence):
+                aggregator.converged = True
+                break
+        if sequential and not aggregator.converged:
+            log_event(f"⚠️ Alvos de IC não atingidos em {limit} simulações.")
+        elif sequential:
+            log_event(f"Alvos de IC atingidos após {aggregator.num_runs} simulações.")
     
+    stored = aggregate_results(sink.path)
     final_report = f"""
 # Relatório de Batch - Case Study 2 (Eventos Dinâmicos)
 
-| Métrica | Média | Desvio Padrão | Mínimo | Máximo |
-| :--- | :--- | :--- | :--- | :--- |
-| **Cobertura Média da Área (%)** | {summary.loc['mean', 'area_coverage']:.2f} | {summary.loc['std', 'area_coverage']:.2f} | {summary.loc['min', 'area_coverage']:.2f} | {summary.loc['max', 'area_coverage']:.2f} |
-| **Redundância de Rota (%)** | {summary.loc['mean', 'route_redundancy']:.2f} | {summary.loc['std', 'route_redundancy']:.2f} | {summary.loc['min', 'route_redundancy']:.2f} | {summary.loc['max', 'route_redundancy']:.2f} |
+Amostrador de rotas: `{sampler}`{f', semente {seed} (números aleatórios comuns)' if seed is not None else ''}.
+
+{stored.summary_markdown()}
+"""
+    if sequential:
+        status = "atingidos" if aggregator.converged else f"não atingidos (limite de {max_batches})"
+        final_report += f"""
+## Critério de Parada Sequencial
+
+Execuções usadas: **{aggregator.num_runs}** (mínimo {min_batches}, máximo {max_batches}); alvos {status}.
+
+{aggregator.ci_markdown(ci_targets, confidence)}
+"""
+    if report_runs:
+        headers = ['ID', 'Cobertura (%)', 'Redundância (%)', 'Recargas (Total)']
+        rows = [
+            [r['batch_id'], r['area_coverage'], r['route_redundancy'], r['recharge_count_total']]
+            for r in iter_rows(sink.path)
+        ]
+        final_report += f"""
+## Resultados Individuais por Simulação
+
+{markdown_table(headers, rows)}
 """
+    final_report += f"\nDados brutos (formato colunar): `{sink.path}`.\n"
     with open("relatorio_batch_case2.md", "w") as f:
         f.write(final_report)
     log_event("✅ Relatório de Batch gerado: relatorio_batch_case2.md")
-    return df
+    return aggregator
 
 
 # === EXECUÇÃO DIRETA ===
@@ -0,0 +1,158 @@
+# src/core/snapshot.py
+
+import copy
+import os
+import pickle
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import py_trees
+
+from behaviors import Action_Patrol
+from contracts import log_event
+
+
+@dataclass
+class SimulationSnapshot:
+    """
+    Estado completo de uma simulação num tick: tudo o que `MissionSimulation.restore` precisa
+    para continuar a execução exatamente como se ela não tivesse sido interrompida.
+    """
+    tick: int
+    interface: Dict[str, Dict]        # routes, states e missions do DroneMissionInterface
+    trees: Dict[str, Dict]            # estado dos nós de cada Behavior Tree
+    resources: List[Any]              # CandidateResource do MAS
+    mas: Dict[str, Any]               # registros do YPA, coalizões do CLA e coalizão corrente
+    events: Dict[str, Any]            # eventos dinâmicos configurados
+    failures: Dict[str, Any]          # reparos pendentes e medição de recuperação (processo de falhas)
+    energy: Any                       # EnergyModel (vagas, filas e eventos das bases), None sem modelo
+    rng: Dict[str, Any]               # estados do `random` e do `numpy.random` globais
+    trajectory_data: Dict[str, List]
+    battery_data: Dict[str, List]
+    monitors: Dict[str, Any]          # separação e geofence (pares/violações ativos e totais)
+    planner_blocked: np.ndarray
+    revisit: Any                      # RevisitTracker (últimas visitas e histograma de intervalos)
+    coverage_grid: Any                # SparseCoverageGrid (None com a grade densa)
+    coverage_bits: np.ndarray         # bitsets de cobertura por drone
+    logs: List[str]                   # logs da execução (usados nas métricas de recarga)
+
+
+def tree_state(tree: py_trees.trees.BehaviourTree) -> Dict:
+    """Estado mutável de uma BT: status de cada nó, filho corrente dos compostos e estado da patrulha."""
+    nodes = []
+    for node in tree.root.iterate():
+        entry = {"status": node.status}
+        if isinstance(node, py_trees.composites.Composite):
+            entry["current_child"] = node.children.index(node.current_child) if node.current_child is not None else None
+        if isinstance(node, Action_Patrol):
+            entry["index"] = node.index
+            entry["pid"] = (node.pid_controller.integral_course, node.pid_controller.error_previous_course)
+        nodes.append(entry)
+    return {"count": tree.count, "nodes": nodes}
+
+
+def restore_tree_state(tree: py_trees.trees.BehaviourTree, state: Dict):
+    """Aplica em `tree` (com a mesma estrutura) um estado obtido por `tree_state`."""
+    tree.count = state["count"]
+    for node, entry in zip(tree.root.iterate(), state["nodes"]):
+        node.status = entry["status"]
+        if "current_child" in entry:
+            k = entry["current_child"]
+            node.current_child = node.children[k] if k is not None else None
+        if "index" in entry:
+            node.index = entry["index"]
+            node.pid_controller.integral_course, node.pid_controller.error_previous_course = entry["pid"]
+
+
+def rng_state() -> Dict[str, Any]:
+    return {"random": random.getstate(), "numpy": np.random.get_state()}
+
+
+def restore_rng_state(state: Dict[str, Any]):
+    random.setstate(state["random"])
+    np.random.set_state(state["numpy"])
+
+
+Branch = Union[Dict[str, Any], Callable]
+
+
+def apply_branch(simulation, branch: Branch):
+    """Um ramo é um dicionário de eventos (`configure_events`) ou uma função que recebe a simulação."""
+    if callable(branch):
+        branch(simulation)
+    else:
+        simulation.configure_events(**branch)
+
+
+def _run_branch(simulation, branch: Branch) -> Dict:
+    apply_branch(simulation, branch)
+    simulation.run_until(simulation.ticks)
+    return simulation.metrics()
+
+
+def run_branches(simulation, branches: Sequence[Branch], use_fork: bool = False,
+                 max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Executa vários ramos "e se" a partir do estado atual de `simulation` (o prefixo comum já
+    executado) e retorna as métricas de cada ramo, na ordem de `branches`.
+
+    Sem `use_fork`, o estado é salvo uma vez e restaurado antes de cada ramo, no mesmo processo.
+    Com `use_fork` (POSIX), cada ramo roda num processo filho criado com `os.fork`: o filho herda
+    o estado por cópia-na-escrita, sem serializá-lo, e devolve só as métricas por um pipe. Até
+    `max_workers` filhos (padrão: número de CPUs) rodam ao mesmo tempo. Ao final, `simulation`
+    continua no ponto de ramificação.
+    """
+    if not use_fork or not hasattr(os, "fork"):
+        snapshot = simulation.snapshot()
+        results = []
+        for branch in branches:
+            simulation.restore(snapshot)
+            results.append(_run_branch(simulation, branch))
+        simulation.restore(snapshot)
+        return results
+
+    max_workers = max_workers or os.cpu_count() or 1
+    results: List[Optional[Dict]] = [None] * len(branches)
+    running = []
+    for k, branch in enumerate(branches):
+        if len(running) >= max_workers:
+            _collect_child(running.pop(0), results)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            # O estado compartilhado e a telemetria pertencem ao processo pai: os ramos não publicam neles
+            simulation.shared_state = simulation.interface.shared_state = None
+            simulation.telemetry = None
+            status = 0
+            try:
+                payload = ("ok", _run_branch(simulation, branch))
+            except Exception as e:
+                payload = ("error", repr(e))
+                status = 1
+            with os.fdopen(write_fd, "wb") as pipe:
+                pickle.dump(payload, pipe)
+            os._exit(status)
+        os.close(write_fd)
+        running.append((k, pid, read_fd))
+    while running:
+        _collect_child(running.pop(0), results)
+    return results
+
+
+def _collect_child(child, results):
+    k, pid, read_fd = child
+    with os.fdopen(read_fd, "rb") as pipe:
+        data = pipe.read()
+    os.waitpid(pid, 0)
+    status, value = pickle.loads(data) if data else ("error", "processo filho terminou sem resultado")
+    if status != "ok":
+        log_event(f"FORK: ramo {k} falhou: {value}")
+        raise RuntimeError(f"Ramo {k} falhou no processo filho: {value}")
+    results[k] = value
+
+
+def copy_interface_state(interface) -> Dict[str, Dict]:
+    return copy.deepcopy({"routes": interface.routes, "states": interface.states, "missions": interface.missions})
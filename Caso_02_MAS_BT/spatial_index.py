@@ -0,0 +1,256 @@
+# src/core/spatial_index.py
+
+import math
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from contracts import log_event
+
+Point = Tuple[float, float]
+
+
+class SpatialHashIndex:
+    """
+    Índice espacial por hash de grade uniforme sobre as posições vivas dos drones.
+
+    Cada drone é guardado no balde (célula) que contém sua posição. A atualização é
+    incremental: só move o drone de balde quando ele troca de célula, de modo que o
+    custo por tick é O(1) por drone. As consultas só visitam as células vizinhas,
+    evitando o laço O(n²) sobre `interface.states`.
+    """
+    def __init__(self, cell_size: float = 1.0):
+        if cell_size <= 0:
+            raise ValueError("cell_size deve ser positivo")
+        self.cell_size = float(cell_size)
+        # {drone_id: (x, y)}
+        self.positions: Dict[Hashable, Point] = {}
+        # {(cx, cy): {drone_id, ...}}
+        self.cells: Dict[Tuple[int, int], Set[Hashable]] = {}
+        # {drone_id: (cx, cy)}
+        self._cell_of: Dict[Hashable, Tuple[int, int]] = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, drone_id):
+        return drone_id in self.positions
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def update(self, drone_id: Hashable, position: Point):
+        """Insere ou move um drone no índice."""
+        x, y = float(position[0]), float(position[1])
+        cell = self._cell(x, y)
+        old_cell = self._cell_of.get(drone_id)
+        if old_cell != cell:
+            if old_cell is not None:
+                bucket = self.cells[old_cell]
+                bucket.discard(drone_id)
+                if not bucket:
+                    del self.cells[old_cell]
+            self.cells.setdefault(cell, set()).add(drone_id)
+            self._cell_of[drone_id] = cell
+        self.positions[drone_id] = (x, y)
+
+    def remove(self, drone_id: Hashable):
+        """Remove um drone do índice (ignora IDs desconhecidos)."""
+        cell = self._cell_of.pop(drone_id, None)
+        if cell is None:
+            return
+        bucket = self.cells[cell]
+        bucket.discard(drone_id)
+        if not bucket:
+            del self.cells[cell]
+        del self.positions[drone_id]
+
+    def clear(self):
+        """Remove todos os drones (reuso do índice entre execuções)."""
+        self.positions.clear()
+        self.cells.clear()
+        self._cell_of.clear()
+
+    def query_radius(self, point: Point, radius: float,
+                     predicate: Optional[Callable[[Hashable], bool]] = None) -> List[Tuple[Hashable, float]]:
+        """Retorna [(drone_id, distância)] dentro do raio, ordenado por distância."""
+        px, py = float(point[0]), float(point[1])
+        cx0, cy0 = self._cell(px - radius, py - radius)
+        cx1, cy1 = self._cell(px + radius, py + radius)
+        found = []
+        # Se a caixa de busca tiver mais células do que as ocupadas, varre só as ocupadas
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            cells = [c for c in self.cells if cx0 <= c[0] <= cx1 and cy0 <= c[1] <= cy1]
+        else:
+            cells = [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+        for cell in cells:
+            for did in self.cells.get(cell, ()):
+                if predicate is not None and not predicate(did):
+                    continue
+                x, y = self.positions[did]
+                d = math.hypot(x - px, y - py)
+                if d <= radius:
+                    found.append((did, d))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def k_nearest(self, point: Point, k: int = 1,
+                  predicate: Optional[Callable[[Hashable], bool]] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Retorna os k drones mais próximos [(drone_id, distância)].
+        A busca expande anéis de células até que o k-ésimo candidato esteja garantido.
+        """
+        if k <= 0 or not self.positions:
+            return []
+        px, py = float(point[0]), float(point[1])
+        ccx, ccy = self._cell(px, py)
+        best: List[Tuple[Hashable, float]] = []
+        seen = 0
+        ring = 0
+        while True:
+            for cell in self._ring_cells(ccx, ccy, ring):
+                for did in self.cells.get(cell, ()):
+                    seen += 1
+                    if predicate is not None and not predicate(did):
+                        continue
+                    x, y = self.positions[did]
+                    best.append((did, math.hypot(x - px, y - py)))
+            best.sort(key=lambda item: item[1])
+            del best[k:]
+            # Após varrer o anel r, todos os pontos a menos de r*cell_size já foram vistos
+            if len(best) == k and best[-1][1] <= ring * self.cell_size:
+                return best
+            if seen >= len(self.positions):
+                return best
+            ring += 1
+            # Frota muito esparsa: anéis maiores que as células ocupadas não compensam
+            if (2 * ring + 1) ** 2 > 4 * len(self.cells):
+                return self._k_nearest_scan(px, py, k, predicate)
+
+    def _k_nearest_scan(self, px, py, k, predicate):
+        found = [(did, math.hypot(x - px, y - py)) for did, (x, y) in self.positions.items()
+                 if predicate is None or predicate(did)]
+        found.sort(key=lambda item: item[1])
+        return found[:k]
+
+    def pairs_within(self, distance: float,
+                     predicate: Optional[Callable[[Hashable], bool]] = None) -> List[Tuple[Hashable, Hashable, float]]:
+        """
+        Retorna todos os pares (a, b, d) com d <= distance.
+        Usa meio estêncil de vizinhança para que cada par de células seja visitado uma única vez.
+        """
+        reach = max(1, math.ceil(distance / self.cell_size))
+        offsets = [(dx, dy) for dx in range(0, reach + 1) for dy in range(-reach, reach + 1)
+                   if dx > 0 or dy > 0]
+        pairs = []
+        for (cx, cy), bucket in self.cells.items():
+            members = [d for d in bucket if predicate is None or predicate(d)]
+            if not members:
+                continue
+            # Pares dentro da mesma célula
+            for i in range(len(members)):
+                ax, ay = self.positions[members[i]]
+                for j in range(i + 1, len(members)):
+                    bx, by = self.positions[members[j]]
+                    d = math.hypot(ax - bx, ay - by)
+                    if d <= distance:
+                        pairs.append(self._ordered_pair(members[i], members[j], d))
+            # Pares com as células vizinhas "à frente"
+            for dx, dy in offsets:
+                other = self.cells.get((cx + dx, cy + dy))
+                if not other:
+                    continue
+                for a in members:
+                    ax, ay = self.positions[a]
+                    for b in other:
+                        if predicate is not None and not predicate(b):
+                            continue
+                        bx, by = self.positions[b]
+                        d = math.hypot(ax - bx, ay - by)
+                        if d <= distance:
+                            pairs.append(self._ordered_pair(a, b, d))
+        return pairs
+
+    @staticmethod
+    def _ordered_pair(a, b, d):
+        return (a, b, d) if str(a) <= str(b) else (b, a, d)
+
+    @staticmethod
+    def _ring_cells(cx: int, cy: int, ring: int):
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
+
+
+def pairs_within_arrays(points: np.ndarray, distance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Versão vetorizada de `SpatialHashIndex.pairs_within` para pontos em array (N, 2): retorna
+    os índices (i, j), i < j, dos pares a até `distance`. Os pontos são ordenados pela chave da
+    célula (lado `distance`); cada célula ocupada é comparada com ela mesma e com as quatro
+    vizinhas "à frente" (meio estêncil), localizadas por busca binária na lista ordenada de
+    células, sem laço em Python sobre os pontos.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    empty = np.zeros(0, dtype=np.int64)
+    if n < 2 or distance <= 0:
+        return empty, empty
+    cells = np.floor(points / distance).astype(np.int64)
+    cx = cells[:, 0] - cells[:, 0].min() + 1
+    cy = cells[:, 1] - cells[:, 1].min() + 1
+    width = int(cy.max()) + 2
+    order = np.argsort(cx * width + cy, kind="stable")
+    occupied, start, count = np.unique((cx * width + cy)[order], return_index=True, return_counts=True)
+    first, second = [], []
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        neighbour = occupied + dx * width + dy
+        k = np.minimum(np.searchsorted(occupied, neighbour), len(occupied) - 1)
+        a = np.flatnonzero(occupied[k] == neighbour)
+        b = k[a]
+        # Todos os pares (membro de a, membro de b) de cada par de células
+        per_cell = count[a] * count[b]
+        cell = np.repeat(np.arange(len(a)), per_cell)
+        rank = np.arange(len(cell)) - np.repeat(np.cumsum(per_cell) - per_cell, per_cell)
+        i = start[a][cell] + rank // count[b][cell]
+        j = start[b][cell] + rank % count[b][cell]
+        if dx == 0 and dy == 0:
+            keep = i < j
+            i, j = i[keep], j[keep]
+        first.append(order[i])
+        second.append(order[j])
+    i, j = np.concatenate(first), np.concatenate(second)
+    close = np.hypot(points[i, 0] - points[j, 0], points[i, 1] - points[j, 1]) <= distance
+    i, j = i[close], j[close]
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+class SeparationMonitor:
+    """
+    Detector de conflitos de separação entre drones.
+    Um conflito é registrado quando um par entra na distância mínima; o par só volta a
+    contar depois de se separar novamente.
+    """
+    def __init__(self, index: SpatialHashIndex, min_separation: float,
+                 predicate: Optional[Callable[[Hashable], bool]] = None):
+        self.index = index
+        self.min_separation = min_separation
+        self.predicate = predicate
+        self.active_pairs: Set[Tuple[Hashable, Hashable]] = set()
+        self.total_conflicts = 0
+
+    def check(self, tick: int) -> List[Tuple[Hashable, Hashable, float]]:
+        """Verifica o tick atual e retorna apenas os conflitos novos."""
+        pairs = self.index.pairs_within(self.min_separation, self.predicate)
+        current = {(a, b) for a, b, _ in pairs}
+        new_conflicts = [p for p in pairs if (p[0], p[1]) not in self.active_pairs]
+        for a, b, d in new_conflicts:
+            log_event(f"SEPARAÇÃO: Conflito entre {a} e {b} no tick {tick} (distância {d:.2f}).")
+        self.total_conflicts += len(new_conflicts)
+        self.active_pairs = current
+        return new_conflicts
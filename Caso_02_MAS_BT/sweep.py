@@ -0,0 +1,185 @@
+# src/sweep.py
+
+import copy
+import hashlib
+import itertools
+import json
+import os
+import random
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from aggregation import BatchAggregator, markdown_table, METRIC_LABELS
+from contracts import log_event, SIMULATION_LOGS
+from sampling import scenario_rng
+
+# Identifica o caso de estudo na chave de cache: a mesma configuração gera métricas
+# diferentes no Case 1 e no Case 2.
+CASE_ID = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+
+# Parâmetros que controlam a geração das rotas (os demais são caminhos na configuração)
+ROUTE_PARAMS = ("num_drones", "num_points", "sampler")
+
+
+def _json_default(value):
+    """Converte escalares numpy (np.float64, np.int64, ...) para tipos nativos do JSON."""
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def content_hash(config: Dict, seed: int, namespace: str = CASE_ID) -> str:
+    """Chave de conteúdo de um ponto (configuração completa + semente + caso de estudo)."""
+    payload = json.dumps({"namespace": namespace, "seed": seed, "config": config},
+                         sort_keys=True, default=_json_default)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def set_config_value(config: Dict, dotted_key: str, value: Any):
+    """Atribui `value` em `config` seguindo um caminho pontuado (ex.: 'mas_config.contract_frequency')."""
+    node = config
+    parts = dotted_key.split(".")
+    for part in parts[:-1]:
+        node = node.setdefault(part, {})
+    node[parts[-1]] = value
+
+
+class ResultCache:
+    """
+    Cache local de resultados: um arquivo JSON por chave de conteúdo.
+    A escrita é atômica (arquivo temporário + rename), então uma varredura interrompida
+    nunca deixa entradas corrompidas e pode ser retomada.
+    """
+    def __init__(self, cache_dir: str = ".sweep_cache"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, entry: Dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f, default=_json_default)
+        os.replace(tmp_path, path)
+
+
+class ParameterSweep:
+    """
+    Varredura sobre uma grade declarada de parâmetros.
+
+    `grid` mapeia nomes de parâmetros para listas de valores. `num_drones`, `num_points` e
+    `sampler` ("uniform", "lhs" ou "sobol") controlam a geração aleatória das rotas; qualquer outro nome é um caminho pontuado na
+    configuração (ex.: `mas_config.contract_frequency`, `simulation_ticks`). Cada combinação
+    é executada para cada semente em `seeds`.
+    """
+    def __init__(self, grid: Dict[str, Sequence], seeds: Sequence[int] = (0,),
+                 base_config: Optional[Dict] = None, namespace: str = CASE_ID):
+        self.grid = {k: list(v) for k, v in grid.items()}
+        self.seeds = list(seeds)
+        self.base_config = base_config or {}
+        self.namespace = namespace
+
+    def points(self) -> Iterator[Dict[str, Any]]:
+        """Itera sobre as combinações da grade, em ordem determinística."""
+        names = sorted(self.grid)
+        for values in itertools.product(*(self.grid[n] for n in names)):
+            yield dict(zip(names, values))
+
+    def build_config(self, params: Dict[str, Any], seed: int) -> Dict:
+        """
+        Materializa a configuração completa de um ponto. As rotas vêm do fluxo aleatório da
+        semente, então pontos da grade com a mesma semente compartilham os números aleatórios.
+        """
+        from simulation import generate_random_patrol_config
+
+        config = copy.deepcopy(self.base_config)
+        for key, value in params.items():
+            if key not in ROUTE_PARAMS:
+                set_config_value(config, key, value)
+        if any(k in params for k in ROUTE_PARAMS) or "drones" not in config:
+            config["drones"] = generate_random_patrol_config(params.get("num_drones", 3), params.get("num_points", 5),
+                                                             sampler=params.get("sampler", "uniform"), rng=scenario_rng(seed))
+        return config
+
+    def tasks(self) -> Iterator[Dict]:
+        """Itera sobre as tarefas (params, seed, config, key) da varredura."""
+        for params in self.points():
+            for seed in self.seeds:
+                config = self.build_config(params, seed)
+                yield {"params": params, "seed": seed, "config": config,
+                       "key": content_hash(config, seed, self.namespace)}
+
+    def run(self, cache: Optional[ResultCache] = None, runner: Optional[Callable] = None) -> List[Dict]:
+        """
+        Executa a varredura. Pontos já presentes no cache não são reexecutados, então rodar
+        novamente uma varredura interrompida retoma de onde parou.
+        Retorna uma lista de entradas {key, params, seed, metrics, cached}.
+        """
+        if runner is None:
+            from simulation import run_simulation
+            runner = run_simulation
+        cache = cache or ResultCache()
+        results = []
+        for task in self.tasks():
+            entry = cache.get(task["key"])
+            if entry is not None:
+                results.append(dict(entry, cached=True))
+                continue
+            random.seed(task["seed"])
+            metrics = runner(task["config"], disable_visual=True, return_metrics=True)
+            # Os logs de cada execução já foram consumidos pelas métricas
+            del SIMULATION_LOGS[:]
+            entry = {"key": task["key"], "params": task["params"], "seed": task["seed"], "metrics": metrics}
+            cache.put(task["key"], entry)
+            results.append(dict(entry, cached=False))
+        hits = sum(1 for r in results if r["cached"])
+        log_event(f"SWEEP: {len(results)} pontos ({hits} do cache, {len(results) - hits} executados).")
+        return results
+
+
+def aggregate_by_point(results: List[Dict], keep_rows: bool = False) -> Dict[str, BatchAggregator]:
+    """Agrupa os resultados por combinação de parâmetros (todas as sementes juntas)."""
+    groups: Dict[str, BatchAggregator] = {}
+    for entry in results:
+        label = ", ".join(f"{k}={v}" for k, v in sorted(entry["params"].items()))
+        groups.setdefault(label, BatchAggregator(keep_rows=keep_rows)).add(entry["metrics"])
+    return groups
+
+
+def sweep_markdown(groups: Dict[str, BatchAggregator], metrics: Sequence[str] = ("area_coverage", "route_redundancy", "recharge_count_total")) -> str:
+    """Tabela markdown com a média ± desvio de cada métrica por ponto da grade."""
+    headers = ["Parâmetros", "Execuções"] + [METRIC_LABELS.get(m, m) for m in metrics]
+    rows = []
+    for label, agg in groups.items():
+        row = [label, agg.num_runs]
+        for m in metrics:
+            s = agg.stats.get(m)
+            row.append("-" if s is None else f"{s.mean:.2f} ± {0.0 if s.count < 2 else s.std:.2f}")
+        rows.append(row)
+    return markdown_table(headers, rows)
+
+
+def run_sweep(grid: Dict[str, Sequence], seeds: Sequence[int] = (0,), config_path: str = "mission_config.json",
+              cache_dir: str = ".sweep_cache", report_path: Optional[str] = None) -> Dict[str, BatchAggregator]:
+    """Atalho: carrega a configuração base, executa a varredura com cache e (opcionalmente) grava o relatório."""
+    with open(config_path, "r") as f:
+        base_config = json.load(f)
+    sweep = ParameterSweep(grid, seeds, base_config)
+    groups = aggregate_by_point(sweep.run(ResultCache(cache_dir)))
+    if report_path:
+        with open(report_path, "w") as f:
+            f.write(f"# Relatório de Varredura de Parâmetros - {CASE_ID}\n\n{sweep_markdown(groups)}\n")
+        log_event(f"✅ Relatório de varredura gerado: {report_path}")
+    return groups
@@ -0,0 +1,276 @@
+# benchmarks/benchmark_hotpaths.py
+"""
+Microbenchmarks dos caminhos críticos da simulação, em frotas crescentes (3 → 10.000 drones).
+
+Mede:
+- ticks/s do laço de Behavior Trees;
+- custo de `calculate_area_coverage_and_redundancy` e `calculate_individual_autonomy`;
+- custo por rodada de `MRA.identify_candidates` + `CLA.recruit_members` e de `YPA.store_request_json`;
+- custo de `draw_frame`.
+
+Gera um relatório JSON, um gráfico de escalabilidade (PNG) e compara com um baseline salvo,
+sinalizando regressões. Uso:
+
+    python benchmarks/benchmark_hotpaths.py --case Caso_01_BT --baseline benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES = [3, 10, 100, 1000, 10000]
+DEFAULT_TICKS = [10, 100]
+
+
+def _load_case(case):
+    """Torna os módulos planos do caso importáveis (mesmo layout usado pelo main.py)."""
+    sys.path.insert(0, os.path.join(ROOT, case))
+    import behaviors, agents, contracts, interface, metrics
+    return behaviors, agents, contracts, interface, metrics
+
+
+def _timeit(fn, repeat):
+    """Executa `fn` `repeat` vezes com stdout silenciado e retorna a mediana (s)."""
+    samples = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+class HotPathBenchmarks:
+    """Conjunto de benchmarks de um caso (Caso_01_BT ou Caso_02_MAS_BT)."""
+    def __init__(self, case, repeat=3, seed=42):
+        self.case = case
+        self.repeat = repeat
+        self.rng = random.Random(seed)
+        self.behaviors, self.agents, self.contracts, self.interface_mod, self.metrics = _load_case(case)
+
+    def _clear_logs(self):
+        del self.contracts.SIMULATION_LOGS[:]
+
+    def _fleet(self, n, route_points=5):
+        interface = self.interface_mod.DroneMissionInterface()
+        skywalker = self.behaviors.MockPyFly()
+        trees = {}
+        for i in range(n):
+            drone_id = f"D{i + 1}"
+            route = [(self.rng.uniform(1, 9), self.rng.uniform(1, 9)) for _ in range(route_points)]
+            interface.assign_route(drone_id, route)
+            interface.update_drone_state(drone_id, 100, (5.0, 5.0), status='IDLE')
+            trees[drone_id] = self.behaviors.create_behavior_tree(drone_id, interface, skywalker)
+        return interface, trees
+
+    def _trajectories(self, n, ticks):
+        return {
+            f"D{i + 1}": [(self.rng.uniform(-1, 10), self.rng.uniform(-1, 10)) for _ in range(ticks + 1)]
+            for i in range(n)
+        }
+
+    def _resources(self, n):
+        CandidateResource = self.contracts.CandidateResource
+        return [
+            CandidateResource(id=f"D{i + 1}", skills=self.rng.choice([["search"], ["rescue"], ["search", "rescue"]]),
+                              cost=self.rng.uniform(1, 2), time=self.rng.uniform(1, 2), quality=self.rng.uniform(1, 2),
+                              battery=self.rng.uniform(30, 100), position=(5.0, 5.0), available=True)
+            for i in range(n)
+        ]
+
+    # --- Benchmarks individuais: retornam (segundos, unidades processadas, nome da unidade) ---
+    def bt_loop(self, n, ticks):
+        interface, trees = self._fleet(n)
+
+        def run():
+            for _ in range(ticks):
+                for tree in trees.values():
+                    tree.tick()
+        seconds = _timeit(run, self.repeat)
+        self._clear_logs()
+        return seconds, ticks, "ticks"
+
+    def coverage(self, n, ticks):
+        trajectory_data = self._trajectories(n, ticks)
+        seconds = _timeit(lambda: self.metrics.calculate_area_coverage_and_redundancy(
+            trajectory_data, (-1.0, 10.0, -1.0, 10.0)), self.repeat)
+        return seconds, 1, "calls"
+
+    def autonomy(self, n, ticks):
+        drone_ids = [f"D{i + 1}" for i in range(n)]
+        # Aproximadamente uma recarga por drone a cada 100 ticks, entre outros eventos de log
+        events = [f"[00:00:00] BT: Drone {self.rng.choice(drone_ids)} chegou ao ponto 1/5." for _ in range(n * ticks // 10)]
+        events += [f"[00:00:00] BT: Drone {self.rng.choice(drone_ids)} REABASTECIDO na base (0, 0)."
+                   for _ in range(max(1, n * ticks // 100))]
+        seconds = _timeit(lambda: self.metrics.calculate_individual_autonomy(events, drone_ids), self.repeat)
+        return seconds, 1, "calls"
+
+    def mas_round(self, n, ticks):
+        resources = self._resources(n)
+        with contextlib.redirect_stdout(io.StringIO()):
+            mra, cla = self.agents.MRA(), self.agents.CLA()
+
+        def run():
+            for res in resources:
+                res.available = True
+            candidates = mra.identify_candidates(resources, ["search", "rescue"])
+            contract = cla.create_coalition_contract(["search", "rescue"])
+            cla.recruit_members(candidates, contract)
+        seconds = _timeit(run, self.repeat)
+        self._clear_logs()
+        return seconds, 1, "rounds"
+
+    def ypa_store(self, n, ticks):
+        # `ticks` aqui é o número de rodadas já armazenadas antes da medição
+        with contextlib.redirect_stdout(io.StringIO()):
+            ypa = self.agents.YPA()
+            for k in range(ticks):
+                ypa.store_request_json(json.dumps({"id": str(k), "required_skills": ["search"]}))
+        payload = json.dumps({"id": "bench", "required_skills": ["search", "rescue"]})
+        seconds = _timeit(lambda: ypa.store_request_json(payload), self.repeat)
+        self._clear_logs()
+        return seconds, 1, "rounds"
+
+    def draw_frame(self, n, ticks):
+        import simulation
+        interface, _ = self._fleet(n)
+        trajectory_data = self._trajectories(n, ticks)
+        with tempfile.TemporaryDirectory() as output_dir:
+            seconds = _timeit(lambda: simulation.draw_frame(ticks, interface, "bench", trajectory_data,
+                                                            output_dir=output_dir), self.repeat)
+        return seconds, 1, "frames"
+
+
+BENCHMARKS = ["bt_loop", "coverage", "autonomy", "mas_round", "ypa_store", "draw_frame"]
+
+
+def run_suite(case, sizes, ticks_list, benchmarks=BENCHMARKS, repeat=3, max_seconds=30.0):
+    """
+    Executa os benchmarks em todas as combinações (drones, ticks).
+    Quando uma medição passa de `max_seconds`, os tamanhos maiores daquele benchmark são pulados.
+    """
+    suite = HotPathBenchmarks(case, repeat=repeat)
+    results = []
+    for name in benchmarks:
+        for ticks in ticks_list:
+            too_slow = False
+            for n in sizes:
+                entry = {"benchmark": name, "drones": n, "ticks": ticks}
+                if too_slow:
+                    entry["skipped"] = True
+                    results.append(entry)
+                    continue
+                seconds, units, unit = getattr(suite, name)(n, ticks)
+                entry.update({"seconds": seconds, "per_second": units / seconds if seconds > 0 else None, "unit": unit})
+                results.append(entry)
+                print(f"{name:<11} drones={n:<6} ticks={ticks:<5} {seconds * 1e3:10.3f} ms")
+                too_slow = seconds * repeat > max_seconds
+    return {
+        "meta": {
+            "case": case,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare_with_baseline(report, baseline, tolerance=0.25):
+    """Retorna as regressões: medições mais lentas que o baseline além da tolerância relativa."""
+    reference = {
+        (r["benchmark"], r["drones"], r["ticks"]): r["seconds"]
+        for r in baseline.get("results", []) if "seconds" in r
+    }
+    regressions = []
+    for r in report["results"]:
+        base = reference.get((r["benchmark"], r["drones"], r["ticks"]))
+        if base is None or "seconds" not in r or base <= 0:
+            continue
+        ratio = r["seconds"] / base
+        r["baseline_ratio"] = ratio
+        if ratio > 1.0 + tolerance:
+            regressions.append(r)
+    return regressions
+
+
+def plot_scaling(report, path):
+    """Gera o gráfico log-log de tempo por tamanho de frota para cada benchmark/run length."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    series = {}
+    for r in report["results"]:
+        if "seconds" in r:
+            series.setdefault((r["benchmark"], r["ticks"]), []).append((r["drones"], r["seconds"]))
+    plt.figure(figsize=(8, 6))
+    for (name, ticks), points in sorted(series.items()):
+        xs, ys = zip(*sorted(points))
+        plt.plot(xs, ys, marker="o", label=f"{name} (ticks={ticks})")
+    plt.xscale("log")
+    plt.yscale("log")
+    plt.xlabel("Drones")
+    plt.ylabel("Tempo (s)")
+    plt.title(f"Escalabilidade dos caminhos críticos - {report['meta']['case']}")
+    plt.grid(True, which="both", alpha=0.3)
+    plt.legend(fontsize=7)
+    plt.savefig(path)
+    plt.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--case", default="Caso_01_BT", choices=["Caso_01_BT", "Caso_02_MAS_BT"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--ticks", type=int, nargs="+", default=DEFAULT_TICKS)
+    parser.add_argument("--benchmarks", nargs="+", default=BENCHMARKS, choices=BENCHMARKS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=30.0)
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--chart", default="benchmark_scaling.png")
+    parser.add_argument("--baseline", help="Relatório JSON de referência para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update-baseline", action="store_true", help="Grava o relatório atual como baseline")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.case, args.sizes, args.ticks, args.benchmarks, args.repeat, args.max_seconds)
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("case") != args.case:
+            print(f"Aviso: baseline gerado para {baseline.get('meta', {}).get('case')}, não para {args.case}.")
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        report["regressions"] = [
+            {k: r[k] for k in ("benchmark", "drones", "ticks", "seconds", "baseline_ratio")} for r in regressions
+        ]
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.chart:
+        plot_scaling(report, args.chart)
+
+    for r in regressions:
+        print(f"REGRESSÃO: {r['benchmark']} drones={r['drones']} ticks={r['ticks']} "
+              f"{r['baseline_ratio']:.2f}x mais lento que o baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
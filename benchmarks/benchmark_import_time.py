@@ -0,0 +1,89 @@
+# benchmarks/benchmark_import_time.py
+"""
+Benchmark do tempo de importação do caminho headless da simulação.
+
+Para cada caso, importa `simulation` num interpretador novo (como faz um worker de batch
+por processo) e mede o tempo total de importação. Também verifica que as dependências de
+visualização/relatório (matplotlib, imageio, pandas, pyarrow) NÃO foram carregadas: elas só
+devem ser importadas quando os recursos visuais ou de relatório são usados.
+
+    python benchmarks/benchmark_import_time.py --max-ms 800
+
+Retorna código 1 se algum módulo pesado for carregado ou se o orçamento de tempo for excedido.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = ["Caso_01_BT", "Caso_02_MAS_BT"]
+
+# Dependências que só devem ser carregadas pelos caminhos visuais/de relatório
+HEAVY_MODULES = ["matplotlib", "imageio", "pandas", "pyarrow"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import simulation
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_case(case, heavy_modules=HEAVY_MODULES, module="simulation"):
+    """Importa `module` num processo novo, no diretório do caso, e retorna tempo e módulos pesados carregados."""
+    probe = _PROBE.format(heavy=list(heavy_modules)).replace("import simulation", f"import {module}")
+    out = subprocess.run([sys.executable, "-c", probe], cwd=os.path.join(ROOT, case),
+                         capture_output=True, text=True, check=True)
+    # A última linha é o JSON; linhas anteriores são logs eventualmente emitidos na importação
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(cases=CASES, repeat=5):
+    """Mede cada caso `repeat` vezes; retorna {caso: {"median_ms", "min_ms", "loaded"}}."""
+    report = {}
+    for case in cases:
+        samples, loaded = [], set()
+        for _ in range(repeat):
+            result = measure_case(case)
+            samples.append(result["seconds"])
+            loaded.update(result["loaded"])
+        report[case] = {
+            "median_ms": statistics.median(samples) * 1e3,
+            "min_ms": min(samples) * 1e3,
+            "loaded": sorted(loaded),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--case", nargs="+", default=CASES, choices=CASES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="Orçamento para a mediana do tempo de importação (ms)")
+    parser.add_argument("--output", help="Grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.case, args.repeat)
+    failures = []
+    for case, r in report.items():
+        print(f"{case:<15} import simulation: mediana {r['median_ms']:8.1f} ms (mín. {r['min_ms']:.1f} ms)")
+        if r["loaded"]:
+            failures.append(f"{case}: módulos pesados carregados no caminho headless: {', '.join(r['loaded'])}")
+        if args.max_ms is not None and r["median_ms"] > args.max_ms:
+            failures.append(f"{case}: {r['median_ms']:.1f} ms acima do orçamento de {args.max_ms:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    for failure in failures:
+        print(f"FALHA: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())